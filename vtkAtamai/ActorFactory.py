@@ -158,8 +158,28 @@ Public Methods:
 
     UnSchedule(*id*)    -- remove the specified item from the schedule
 
+    AddRendererObserver(*renderer*,*event*,*callback*,*priority*=0.0) --
+                           observe an event of a renderer, e.g. StartEvent,
+                           the observer is removed automatically by
+                           RemoveFromRenderer() and tearDown()
+
+    RemoveRendererObservers(*renderer*) -- remove all of the observers that
+                           were added to the renderer by this factory
+
+    GetCameraState(*renderer*) -- get the up-to-date CameraState for the
+                           renderer, which is shared by all factories
+
+Module Functions:
+
+    GetRendererObserverCount(*renderer*) -- the number of observers that
+                           ActorFactories currently have on the renderer,
+                           for diagnosing observers that are never removed
+
 Protected Methods:
 
+    _HasViewChanged(*renderer*,*args*) -- check whether the camera, or any
+                           of the extra *args*, changed since the last call
+
     _MakeActors()       -- generate a list of actors to be displayed in a
                            renderer (this method should overridden in
                            all ActorFactory sub-classes)
@@ -269,11 +289,25 @@ from zope import interface
 from vtkAtamai.interfaces import IActorFactory
 import EventHandler
 import PaneFrame
+import CameraState
 import vtk
 import logging
 
 #======================================
 
+# number of renderer observers added by all ActorFactories, keyed by
+# the address of the renderer so that the renderer is not kept alive
+_RendererObserverCounts = {}
+
+
+def _RendererKey(renderer):
+    return renderer.GetAddressAsString('vtkObject')
+
+
+def GetRendererObserverCount(renderer):
+    """Get the number of ActorFactory observers on the renderer."""
+    return _RendererObserverCounts.get(_RendererKey(renderer), 0)
+
 
 class PickInformation(object):
 
@@ -323,6 +357,13 @@ class ActorFactory(EventHandler.EventHandler):
         # ActorFactories which are children of this one
         self._Children = []
 
+        # observer tags for each renderer, see AddRendererObserver()
+        self._RendererObservers = {}
+
+        # shared camera states and view keys, see GetCameraState()
+        self._CameraStates = {}
+        self._ViewKeys = {}
+
         # the transform for all of the actors
         self._Transform = vtk.vtkTransform()
 
@@ -344,6 +385,12 @@ class ActorFactory(EventHandler.EventHandler):
             self.RemoveFromRenderer(renderer)
             del(self._ActorDict[renderer])
 
+        # remove observers from renderers that had no actors
+        for renderer in self._RendererObservers.keys():
+            self.RemoveRendererObservers(renderer)
+        for renderer in self._CameraStates.keys():
+            self._ReleaseCameraState(renderer)
+
         del(self._DummyTransform)
         del(self._Transform)
         del(self._RenderTime)
@@ -385,6 +432,9 @@ class ActorFactory(EventHandler.EventHandler):
         for child in self._Children[:]:
             child.RemoveFromRenderer(renderer)
 
+        self.RemoveRendererObservers(renderer)
+        self._ReleaseCameraState(renderer)
+
         if renderer in self._ActorDict:
             actors = self._ActorDict[renderer]
             if self._Renderers.count(renderer) > 0:
@@ -401,6 +451,75 @@ class ActorFactory(EventHandler.EventHandler):
                     renderer.RemoveActor(actor)
                     self._FreeActor(actor)
 
+    #--------------------------------------
+    def AddRendererObserver(self, renderer, event, callback, priority=0.0):
+        """Add an observer to a renderer, and keep track of it.
+
+        The observer is removed when the factory is removed from
+        the renderer, or when the factory is torn down.  Returns the
+        observer tag.
+        """
+        tag = renderer.AddObserver(event, callback, priority)
+        if renderer not in self._RendererObservers:
+            self._RendererObservers[renderer] = []
+        self._RendererObservers[renderer].append(tag)
+
+        key = _RendererKey(renderer)
+        _RendererObserverCounts[key] = \
+            _RendererObserverCounts.get(key, 0) + 1
+        return tag
+
+    def RemoveRendererObservers(self, renderer):
+        """Remove the observers that were added with AddRendererObserver."""
+        if renderer not in self._RendererObservers:
+            return
+        tags = self._RendererObservers[renderer]
+        del self._RendererObservers[renderer]
+        for tag in tags:
+            renderer.RemoveObserver(tag)
+
+        key = _RendererKey(renderer)
+        count = _RendererObserverCounts.get(key, 0) - len(tags)
+        if count > 0:
+            _RendererObserverCounts[key] = count
+        elif key in _RendererObserverCounts:
+            del _RendererObserverCounts[key]
+
+    #--------------------------------------
+    def GetCameraState(self, renderer):
+        """Get the shared CameraState for the renderer.
+
+        The state is brought up-to-date before it is returned, which
+        only costs a comparison if the camera has not changed.
+        """
+        try:
+            state = self._CameraStates[renderer]
+        except KeyError:
+            state = CameraState.GetCameraState(renderer)
+            self._CameraStates[renderer] = state
+        state.Update()
+        return state
+
+    def _ReleaseCameraState(self, renderer):
+        if renderer in self._CameraStates:
+            del self._CameraStates[renderer]
+            CameraState.ReleaseCameraState(renderer)
+        if renderer in self._ViewKeys:
+            del self._ViewKeys[renderer]
+
+    def _HasViewChanged(self, renderer, *args):
+        """Check whether the view changed since the last call.
+
+        The view has changed if the camera state for the renderer was
+        recomputed, or if any of the extra arguments differ from the
+        ones that were given in the previous call.
+        """
+        key = (self.GetCameraState(renderer).GetSerial(),) + args
+        if self._ViewKeys.get(renderer) == key:
+            return 0
+        self._ViewKeys[renderer] = key
+        return 1
+
     #--------------------------------------
     def AddChild(self, child):
         """Add another ActorFactory as part of this ActorFactory.
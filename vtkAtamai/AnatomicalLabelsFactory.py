@@ -96,7 +96,6 @@ Public Methods:
 
 #======================================
 from ActorFactory import *
-import math
 
 #======================================
 
@@ -119,6 +118,9 @@ class AnatomicalLabelsFactory(ActorFactory):
         self._offset = 0.
         self._volumeCenter = (0, 0, 0)
 
+        # reused for orienting the labels towards the camera
+        self._LabelTransform = vtk.vtkTransform()
+
     def SetScale(self, scale):
         self._Scale = scale
 
@@ -240,12 +242,14 @@ class AnatomicalLabelsFactory(ActorFactory):
 
     def AddToRenderer(self, renderer):
         ActorFactory.AddToRenderer(self, renderer)
-        try:
-            renderer.AddObserver('StartEvent', self.OnRenderEvent)
-        except AttributeError:
-            pass
+        self.AddRendererObserver(renderer, 'StartEvent', self.OnRenderEvent)
 
     def OnRenderEvent(self, renderer, event):
+        if not self._HasViewChanged(renderer, self._Transform.GetMTime(),
+                                    self._bounds, self._offset,
+                                    self._volumeCenter, self._Scale):
+            return
+
         actors = self._ActorDict[renderer]
         xmin, xmax, ymin, ymax, zmin, zmax = self._bounds
         offset = self._offset
@@ -284,28 +288,21 @@ class AnatomicalLabelsFactory(ActorFactory):
         actors[4].SetPosition(coords[2 * k + (1 - ksign) / 2])
         actors[5].SetPosition(coords[2 * k + (1 + ksign) / 2])
 
-        width, height = renderer.GetSize()
+        state = self.GetCameraState(renderer)
+        width, height = state.GetSize()
         if height > 0:
-            matrix = self._Transform.GetMatrix()
-            # x = matrix.GetElement(0,3)
-            # y = matrix.GetElement(1,3)
-            # z = matrix.GetElement(2,3)
-            x = xc
-            y = yc
-            z = zc
-            camera = renderer.GetActiveCamera()
-            if camera.GetParallelProjection():
-                worldsize = camera.GetParallelScale()
+            if state.GetParallelProjection():
+                worldsize = state.GetWorldSize()
             else:
-                cx, cy, cz = camera.GetPosition()
-                worldsize = math.sqrt((x - cx) ** 2 +
-                                      (y - cy) ** 2 +
-                                      (z - cz) ** 2)
-
-            transform = vtk.vtkTransform()
-            transform.Concatenate(camera.GetViewTransformMatrix())
-            transform.Concatenate(matrix)
-            rx, ry, rz = transform.GetInverse().GetOrientation()
+                worldsize = state.GetDistance((xc, yc, zc))
+
+            # the inverse of (view * matrix), without inverting it here
+            transform = self._LabelTransform
+            transform.Identity()
+            transform.Concatenate(
+                self._Transform.GetLinearInverse().GetMatrix())
+            transform.Concatenate(state.GetInverseViewTransformMatrix())
+            rx, ry, rz = transform.GetOrientation()
 
             for actor in actors:
                 actor.SetOrientation(rx, ry, rz)
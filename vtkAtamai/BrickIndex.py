@@ -0,0 +1,353 @@
+# =========================================================================
+#
+# Copyright (c) 2000 Atamai, Inc.
+#
+# Use, modification and redistribution of the software, in source or
+# binary forms, are permitted provided that the following terms and
+# conditions are met:
+#
+# 1) Redistribution of the source code, in verbatim or modified
+#    form, must retain the above copyright notice, this license,
+#    the following disclaimer, and any notices that refer to this
+#    license and/or the following disclaimer.
+#
+# 2) Redistribution in binary form must include the above copyright
+#    notice, a copy of this license and the following disclaimer
+#    in the documentation or with other materials provided with the
+#    distribution.
+#
+# 3) Modified copies of the source code must be clearly marked as such,
+#    and must not be misrepresented as verbatim copies of the source code.
+#
+# THE COPYRIGHT HOLDERS AND/OR OTHER PARTIES PROVIDE THE SOFTWARE "AS IS"
+# WITHOUT EXPRESSED OR IMPLIED WARRANTY INCLUDING, BUT NOT LIMITED TO,
+# THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR
+# PURPOSE.  IN NO EVENT SHALL ANY COPYRIGHT HOLDER OR OTHER PARTY WHO MAY
+# MODIFY AND/OR REDISTRIBUTE THE SOFTWARE UNDER THE TERMS OF THIS LICENSE
+# BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL OR CONSEQUENTIAL DAMAGES
+# (INCLUDING, BUT NOT LIMITED TO, LOSS OF DATA OR DATA BECOMING INACCURATE
+# OR LOSS OF PROFIT OR BUSINESS INTERRUPTION) ARISING IN ANY WAY OUT OF
+# THE USE OR INABILITY TO USE THE SOFTWARE, EVEN IF ADVISED OF THE
+# POSSIBILITY OF SUCH DAMAGES.
+#
+# =========================================================================
+
+#
+# This file represents a derivative work by Parallax Innovations Inc.
+#
+
+"""
+BrickIndex - the range of the voxel values within blocks of a volume
+
+  The BrickIndex divides a volume into bricks, 16x16x16 voxels by
+  default, and records the minimum and maximum voxel value of each
+  brick.  Given the opacity of each value, e.g. from an opacity
+  transfer function or from the alpha of a lookup table, it can then
+  find the bricks that are completely transparent.  Rendering and
+  picking can skip over those bricks.
+
+  The range of each brick is widened to include its neighbours, so
+  that values interpolated between bricks, or averaged when the volume
+  is downsampled, stay within the range of the brick that contains
+  them.
+
+  The index is built with numpy when the input is modified, which is
+  much more expensive than finding the transparent bricks, so a change
+  to the transfer function only costs a few array operations.
+
+  Indexes are shared: GetBrickIndex(*input*) returns the same index for
+  every caller that shows the same vtkImageData, and
+  ReleaseBrickIndex(*input*) must be called once for every call to
+  GetBrickIndex().
+
+Public Methods:
+
+  GetInput()                   -- get the image that is indexed
+
+  GetBrickSize()               -- get the brick size, in voxels
+
+  Update()                     -- rebuild the index if the input changed
+
+  GetBuildCount()              -- a number that increases whenever the
+                                  index is rebuilt
+
+  ComputeVisibleBricks(*alpha*,*range*,*shift*=0.0) -- get a boolean
+                                  array, indexed by (z,y,x) brick, that is
+                                  false for transparent bricks, given an
+                                  opacity table that covers *range*, and a
+                                  *shift* that is added to the voxel values
+                                  before they are looked up
+
+  GetVisibleExtent(*visible*)  -- the voxel extent of the visible bricks,
+                                  or None if all bricks are transparent
+
+  GetVisibleBounds(*visible*)  -- the bounds of the visible bricks in data
+                                  coordinates, or None
+
+  GetVisibleSlices(*visible*,*axis*) -- a boolean array with one element
+                                  per voxel slice along the axis
+
+  IsVisibleAt(*visible*,*points*) -- a boolean array for an N x 3 array
+                                  of points in data coordinates, points
+                                  outside of the volume are visible
+
+  GetVisibleSteps(*visible*,*transform*,*point*,*step*,*n*) -- the numbers
+                                  of the steps along a ray that might be
+                                  visible, for a linear *transform* from
+                                  the ray coordinates to data coordinates
+
+Module Functions:
+
+  GetBrickIndex(*input*)       -- get the shared index for *input*
+
+  ReleaseBrickIndex(*input*)   -- release an index from GetBrickIndex()
+
+  GetOpacityTable(*func*,*n*=1024) -- sample a vtkPiecewiseFunction, and
+                                  return the table and its range
+
+  GetLookupTableAlpha(*table*) -- get the alpha of a vtkLookupTable, and
+                                  its range
+
+"""
+
+#======================================
+import math
+import numpy
+from vtk.util import numpy_support
+import vtk
+
+#======================================
+
+# shared indexes, keyed by input: each value is [index, refcount]
+_BrickIndexes = {}
+
+
+def GetBrickIndex(input):
+    """Get the index for *input*, creating it if necessary."""
+    try:
+        item = _BrickIndexes[input]
+    except KeyError:
+        item = [BrickIndex(input), 0]
+        _BrickIndexes[input] = item
+    item[1] = item[1] + 1
+    return item[0]
+
+
+def ReleaseBrickIndex(input):
+    """Release an index that was obtained through GetBrickIndex()."""
+    try:
+        item = _BrickIndexes[input]
+    except KeyError:
+        return
+    item[1] = item[1] - 1
+    if item[1] <= 0:
+        item[0].tearDown()
+        del _BrickIndexes[input]
+
+
+def GetOpacityTable(func, n=1024):
+    """Sample an opacity transfer function into a table.
+
+    The entries on either side of each node are raised to the opacity of
+    the node, so that narrow peaks between the samples are not lost.
+    """
+    lo, hi = func.GetRange()
+    if n < 2 or hi <= lo:
+        return numpy.array([func.GetValue(lo)]), (lo, lo)
+    alpha = numpy.zeros(n, numpy.float32)
+    func.GetTable(lo, hi, n, alpha)
+
+    # the function is monotonic between nodes, so its peaks are at nodes
+    scale = (n - 1.0) / (hi - lo)
+    node = [0.0, 0.0, 0.0, 0.0]
+    for i in range(func.GetSize()):
+        func.GetNodeValue(i, node)
+        x = (node[0] - lo) * scale
+        for j in (int(math.floor(x)), int(math.ceil(x))):
+            if 0 <= j < n:
+                alpha[j] = max(alpha[j], node[1])
+    return alpha, (lo, hi)
+
+
+def GetLookupTableAlpha(table):
+    """Get the alpha column of a lookup table."""
+    colors = numpy_support.vtk_to_numpy(table.GetTable()).reshape(-1, 4)
+    alpha = colors[:, 3] / 255.0
+    return alpha, tuple(table.GetTableRange())
+
+
+def _Dilate(a, func):
+    # combine each brick with its neighbours along every axis
+    for axis in range(3):
+        b = a.copy()
+        lower = [slice(None)] * 3
+        upper = [slice(None)] * 3
+        lower[axis] = slice(None, -1)
+        upper[axis] = slice(1, None)
+        lower = tuple(lower)
+        upper = tuple(upper)
+        b[lower] = func(b[lower], a[upper])
+        b[upper] = func(b[upper], a[lower])
+        a = b
+    return a
+
+
+class BrickIndex(object):
+
+    """The minimum and maximum value within each brick of a volume."""
+
+    def __init__(self, input, size=16):
+        self._Input = input
+        self._BrickSize = size
+        self._Key = None
+        self._BuildCount = 0
+        self._Extent = (0, -1, 0, -1, 0, -1)
+        self._Origin = (0.0, 0.0, 0.0)
+        self._Spacing = (1.0, 1.0, 1.0)
+        self._Min = numpy.zeros((0, 0, 0))
+        self._Max = numpy.zeros((0, 0, 0))
+
+    def tearDown(self):
+        self._Input = None
+        self._Min = None
+        self._Max = None
+
+    def GetInput(self):
+        return self._Input
+
+    def GetBrickSize(self):
+        return self._BrickSize
+
+    def GetBuildCount(self):
+        return self._BuildCount
+
+    def Update(self):
+        """Rebuild the index if the scalars or the extent have changed."""
+        input = self._Input
+        # VTK-6
+        if vtk.vtkVersion().GetVTKMajorVersion() <= 5:
+            input.UpdateInformation()
+            input.SetUpdateExtentToWholeExtent()
+            input.Update()
+
+        scalars = input.GetPointData().GetScalars()
+        if scalars is None:
+            return
+        extent = tuple(input.GetExtent())
+        key = (scalars, scalars.GetMTime(), extent)
+        if key == self._Key:
+            return
+        self._Key = key
+
+        shape = (extent[5] - extent[4] + 1,
+                 extent[3] - extent[2] + 1,
+                 extent[1] - extent[0] + 1,
+                 scalars.GetNumberOfComponents())
+        array = numpy_support.vtk_to_numpy(scalars).reshape(shape)[..., 0]
+
+        # reduce one axis at a time, each pass shrinks the data by the
+        # brick size so only the first pass touches every voxel
+        size = self._BrickSize
+        mins = array
+        maxs = array
+        for axis in (2, 1, 0):
+            starts = numpy.arange(0, array.shape[axis], size)
+            mins = numpy.minimum.reduceat(mins, starts, axis=axis)
+            maxs = numpy.maximum.reduceat(maxs, starts, axis=axis)
+
+        self._Min = _Dilate(mins.astype(numpy.float64), numpy.minimum)
+        self._Max = _Dilate(maxs.astype(numpy.float64), numpy.maximum)
+        self._Extent = extent
+        self._Origin = tuple(input.GetOrigin())
+        self._Spacing = tuple(input.GetSpacing())
+        self._BuildCount = self._BuildCount + 1
+
+    def ComputeVisibleBricks(self, alpha, range, shift=0.0):
+        """Find the bricks that contain at least one non-zero opacity."""
+        alpha = numpy.asarray(alpha)
+        n = len(alpha)
+        lo, hi = range
+        if n < 2 or hi <= lo:
+            scale = 0.0
+        else:
+            scale = (n - 1.0) / (hi - lo)
+
+        # count the non-transparent entries below each table index, so
+        # that every value range can be checked with one subtraction
+        counts = numpy.concatenate(([0], numpy.cumsum(alpha > 0)))
+        first = numpy.floor((self._Min + (shift - lo)) * scale)
+        last = numpy.ceil((self._Max + (shift - lo)) * scale)
+        first = numpy.clip(first, 0, n - 1).astype(numpy.intp)
+        last = numpy.clip(last, 0, n - 1).astype(numpy.intp)
+
+        return (counts[last + 1] - counts[first]) > 0
+
+    def GetVisibleExtent(self, visible):
+        """Get the voxel extent that contains all of the visible bricks."""
+        if not visible.any():
+            return None
+        size = self._BrickSize
+        extent = list(self._Extent)
+        for axis in range(3):
+            # the array is indexed (z,y,x)
+            other = tuple([a for a in range(3) if a != 2 - axis])
+            bricks = numpy.nonzero(visible.any(axis=other))[0]
+            lo = extent[2 * axis]
+            hi = extent[2 * axis + 1]
+            extent[2 * axis] = int(lo + bricks[0] * size)
+            extent[2 * axis + 1] = int(min(lo + (bricks[-1] + 1) * size, hi))
+        return tuple(extent)
+
+    def GetVisibleBounds(self, visible):
+        """Get the bounds of the visible bricks, in data coordinates."""
+        extent = self.GetVisibleExtent(visible)
+        if extent is None:
+            return None
+        bounds = []
+        for axis in range(3):
+            a = self._Origin[axis] + self._Spacing[axis] * \
+                (extent[2 * axis] - 0.5)
+            b = self._Origin[axis] + self._Spacing[axis] * \
+                (extent[2 * axis + 1] + 0.5)
+            bounds = bounds + [min(a, b), max(a, b)]
+        return tuple(bounds)
+
+    def GetVisibleSlices(self, visible, axis):
+        """Get the visibility of each voxel slice along the axis."""
+        other = tuple([a for a in range(3) if a != 2 - axis])
+        bricks = visible.any(axis=other)
+        n = self._Extent[2 * axis + 1] - self._Extent[2 * axis] + 1
+        return bricks[numpy.arange(n) // self._BrickSize]
+
+    def IsVisibleAt(self, visible, points):
+        """Check whether points, in data coordinates, are visible."""
+        points = numpy.asarray(points, numpy.float64).reshape(-1, 3)
+        result = numpy.ones(len(points), bool)
+        if visible.size == 0:
+            return result
+        origin = numpy.array(self._Origin)
+        spacing = numpy.array(self._Spacing)
+        lo = numpy.array(self._Extent[0::2])
+        hi = numpy.array(self._Extent[1::2])
+        idx = numpy.floor((points - origin) / spacing + 0.5).astype(
+            numpy.intp)
+        inside = numpy.logical_and(idx >= lo, idx <= hi).all(axis=1)
+        bricks = (idx[inside] - lo) // self._BrickSize
+        result[inside] = visible[bricks[:, 2], bricks[:, 1], bricks[:, 0]]
+        return result
+
+    def GetVisibleSteps(self, visible, transform, point, step, n):
+        """Get the steps along a ray whose centers might be visible.
+
+        The ray starts at *point* and takes *n* steps of size *step*,
+        and *transform* converts the ray to data coordinates.  A list
+        of step numbers is returned.
+        """
+        t = (numpy.arange(n) + 0.5).reshape(-1, 1)
+        points = numpy.asarray(point) + t * numpy.asarray(step)
+        if transform:
+            matrix = transform.GetMatrix()
+            m = numpy.array([[matrix.GetElement(i, j) for j in range(4)]
+                             for i in range(4)])
+            points = numpy.dot(points, m[0:3, 0:3].T) + m[0:3, 3]
+        return list(numpy.nonzero(self.IsVisibleAt(visible, points))[0])
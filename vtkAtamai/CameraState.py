@@ -0,0 +1,217 @@
+# =========================================================================
+#
+# Copyright (c) 2000 Atamai, Inc.
+#
+# Use, modification and redistribution of the software, in source or
+# binary forms, are permitted provided that the following terms and
+# conditions are met:
+#
+# 1) Redistribution of the source code, in verbatim or modified
+#    form, must retain the above copyright notice, this license,
+#    the following disclaimer, and any notices that refer to this
+#    license and/or the following disclaimer.
+#
+# 2) Redistribution in binary form must include the above copyright
+#    notice, a copy of this license and the following disclaimer
+#    in the documentation or with other materials provided with the
+#    distribution.
+#
+# 3) Modified copies of the source code must be clearly marked as such,
+#    and must not be misrepresented as verbatim copies of the source code.
+#
+# THE COPYRIGHT HOLDERS AND/OR OTHER PARTIES PROVIDE THE SOFTWARE "AS IS"
+# WITHOUT EXPRESSED OR IMPLIED WARRANTY INCLUDING, BUT NOT LIMITED TO,
+# THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR
+# PURPOSE.  IN NO EVENT SHALL ANY COPYRIGHT HOLDER OR OTHER PARTY WHO MAY
+# MODIFY AND/OR REDISTRIBUTE THE SOFTWARE UNDER THE TERMS OF THIS LICENSE
+# BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL OR CONSEQUENTIAL DAMAGES
+# (INCLUDING, BUT NOT LIMITED TO, LOSS OF DATA OR DATA BECOMING INACCURATE
+# OR LOSS OF PROFIT OR BUSINESS INTERRUPTION) ARISING IN ANY WAY OUT OF
+# THE USE OR INABILITY TO USE THE SOFTWARE, EVEN IF ADVISED OF THE
+# POSSIBILITY OF SUCH DAMAGES.
+#
+# =========================================================================
+
+#
+# This file represents a derivative work by Parallax Innovations Inc.
+#
+
+"""
+CameraState - view-dependent quantities shared by all factories
+
+  Several ActorFactories keep their actors at a fixed size on the
+  screen, or keep them facing the camera, and all of them need the
+  same quantities from the renderer's active camera.  The CameraState
+  computes these quantities once, and only recomputes them when the
+  camera has been modified or the renderer has been resized, so that
+  factories do not repeat the work for every render.
+
+  Each time the quantities are recomputed, GetSerial() is increased.
+  A factory can store the serial number from its last update and skip
+  its own work entirely until the serial number changes.
+
+  States are shared: GetCameraState(*renderer*) returns the same state
+  for every caller that uses the same renderer, and
+  ReleaseCameraState(*renderer*) must be called once for every call to
+  GetCameraState() so that unused states can be freed.
+
+Public Methods:
+
+  Update()                     -- recompute the quantities if the camera
+                                  has changed, return true if it did
+
+  GetSerial()                  -- a number that increases whenever the
+                                  quantities are recomputed
+
+  GetSize()                    -- the renderer size in pixels
+
+  GetParallelProjection()      -- true for a parallel projection
+
+  GetPosition()                -- the camera position
+
+  GetViewPlaneNormal()         -- the camera view plane normal
+
+  GetViewTransformMatrix()     -- the view transform, as a vtkMatrix4x4
+
+  GetInverseViewTransformMatrix() -- the inverse of the view transform
+
+  GetDistance(*point*=None)    -- distance from the camera to *point*,
+                                  or to the focal point
+
+  GetWorldSize(*point*=None)   -- half the height of the view in world
+                                  coordinates, at *point* or at the focal
+                                  point
+
+  GetPixelPitch(*point*=None)  -- the world size of a pixel, at *point*
+                                  or at the focal point
+
+Module Functions:
+
+  GetCameraState(*renderer*)     -- get the shared state for *renderer*
+
+  ReleaseCameraState(*renderer*) -- release a state from GetCameraState()
+
+"""
+
+#======================================
+import math
+import vtk
+
+#======================================
+
+# shared states, keyed by renderer: each value is [state, refcount]
+_CameraStates = {}
+
+
+def GetCameraState(renderer):
+    """Get the camera state for *renderer*, creating it if necessary."""
+    try:
+        item = _CameraStates[renderer]
+    except KeyError:
+        item = [CameraState(renderer), 0]
+        _CameraStates[renderer] = item
+    item[1] = item[1] + 1
+    return item[0]
+
+
+def ReleaseCameraState(renderer):
+    """Release a state that was obtained through GetCameraState()."""
+    try:
+        item = _CameraStates[renderer]
+    except KeyError:
+        return
+    item[1] = item[1] - 1
+    if item[1] <= 0:
+        item[0].tearDown()
+        del _CameraStates[renderer]
+
+
+class CameraState(object):
+
+    """Cached view-dependent quantities for one renderer."""
+
+    def __init__(self, renderer):
+        self._Renderer = renderer
+
+        # the camera, camera MTime and renderer size at the last update
+        self._Key = None
+        self._Serial = 0
+
+        self._Size = (0, 0)
+        self._ParallelProjection = 0
+        self._ParallelScale = 1.0
+        self._TanHalfAngle = 1.0
+        self._Position = (0.0, 0.0, 1.0)
+        self._FocalDistance = 1.0
+        self._ViewPlaneNormal = (0.0, 0.0, 1.0)
+        self._ViewMatrix = vtk.vtkMatrix4x4()
+        self._InverseViewMatrix = vtk.vtkMatrix4x4()
+
+    def tearDown(self):
+        self._Renderer = None
+        self._Key = None
+
+    def Update(self):
+        """Recompute the quantities if the camera or the size changed."""
+        renderer = self._Renderer
+        camera = renderer.GetActiveCamera()
+        size = tuple(renderer.GetSize())
+        key = (camera.GetAddressAsString('vtkObject'), camera.GetMTime(),
+               size)
+        if key == self._Key:
+            return 0
+        self._Key = key
+        self._Serial = self._Serial + 1
+
+        self._Size = size
+        self._ParallelProjection = camera.GetParallelProjection()
+        self._ParallelScale = camera.GetParallelScale()
+        self._TanHalfAngle = math.tan(0.5 * camera.GetViewAngle() / 57.296)
+        self._Position = camera.GetPosition()
+        self._FocalDistance = camera.GetDistance()
+        self._ViewPlaneNormal = camera.GetViewPlaneNormal()
+        self._ViewMatrix.DeepCopy(camera.GetViewTransformMatrix())
+        vtk.vtkMatrix4x4.Invert(self._ViewMatrix, self._InverseViewMatrix)
+        return 1
+
+    def GetSerial(self):
+        return self._Serial
+
+    def GetSize(self):
+        return self._Size
+
+    def GetParallelProjection(self):
+        return self._ParallelProjection
+
+    def GetPosition(self):
+        return self._Position
+
+    def GetViewPlaneNormal(self):
+        return self._ViewPlaneNormal
+
+    def GetViewTransformMatrix(self):
+        return self._ViewMatrix
+
+    def GetInverseViewTransformMatrix(self):
+        return self._InverseViewMatrix
+
+    def GetDistance(self, point=None):
+        """Get the distance from the camera to *point*."""
+        if point is None:
+            return self._FocalDistance
+        cx, cy, cz = self._Position
+        x, y, z = point
+        return math.sqrt((x - cx) ** 2 + (y - cy) ** 2 + (z - cz) ** 2)
+
+    def GetWorldSize(self, point=None):
+        """Get half the height of the view, in world coordinates."""
+        if self._ParallelProjection:
+            return self._ParallelScale
+        return self.GetDistance(point) * self._TanHalfAngle
+
+    def GetPixelPitch(self, point=None):
+        """Get the height of a pixel, in world coordinates."""
+        height = self._Size[1]
+        if height <= 0:
+            return 0.0
+        return self.GetWorldSize(point) / height
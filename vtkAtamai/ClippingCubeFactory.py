@@ -94,6 +94,14 @@ Public Methods:
 
   GetBounds()             -- get the maximum bounds
 
+Module Functions:
+
+  GetAxisAlignedBounds(*planes*) -- get the box that a vtkPlaneCollection
+                             keeps, as a 6-tuple with None for the sides
+                             that are not bounded, or None if there are
+                             no planes or if any of the planes are not
+                             perpendicular to an axis
+
 """
 
 #======================================
@@ -102,6 +110,38 @@ import math
 import vtk
 
 #======================================
+
+
+def GetAxisAlignedBounds(planes, tolerance=1e-6):
+    """Get the box kept by a collection of axis-aligned clipping planes.
+
+    Clipping keeps the side of each plane that its normal points to.
+    """
+    if planes.GetNumberOfItems() == 0:
+        return None
+    bounds = [None, None, None, None, None, None]
+    planes.InitTraversal()
+    plane = planes.GetNextItem()
+    while plane:
+        normal = plane.GetNormal()
+        origin = plane.GetOrigin()
+        n = map(abs, normal)
+        axis = n.index(max(n))
+        if n[axis] == 0 or n[axis - 1] > tolerance * n[axis] or \
+                n[axis - 2] > tolerance * n[axis]:
+            return None
+        if normal[axis] > 0:
+            i = 2 * axis
+            if bounds[i] is None or origin[axis] > bounds[i]:
+                bounds[i] = origin[axis]
+        else:
+            i = 2 * axis + 1
+            if bounds[i] is None or origin[axis] < bounds[i]:
+                bounds[i] = origin[axis]
+        plane = planes.GetNextItem()
+    return tuple(bounds)
+
+#======================================
 # helper class - not to be used outside this file
 
 
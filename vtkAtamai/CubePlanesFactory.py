@@ -254,6 +254,11 @@ class CubePlanesFactory(ActorFactory):
         else:
             pass
 
+        # pushing one face moves the cube, so reslice all of the faces
+        # at the interactive level of detail until the action ends
+        for plane in self._Planes:
+            plane.SetInteractive(1)
+
         self.Modified()
 
     def DoEndAction(self, event):
@@ -263,6 +268,9 @@ class CubePlanesFactory(ActorFactory):
             self._Plane.OutlineOff()
             self._Plane = None
 
+        for plane in self._Planes:
+            plane.SetInteractive(0)
+
         self.__UserAction = None
         self.__RotateAxis = None
         self.__RadiusVector = None
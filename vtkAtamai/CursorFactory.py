@@ -110,7 +110,6 @@ Protected Attributes:
 
 #======================================
 from ActorFactory import *
-import math
 
 #======================================
 
@@ -204,18 +203,11 @@ class CursorFactory(ActorFactory):
         y = matrix.GetElement(1, 3)
         z = matrix.GetElement(2, 3)
         actors = self._ActorDict[renderer]
-        if actors:
-            camera = renderer.GetActiveCamera()
-            if camera.GetParallelProjection():
-                worldsize = camera.GetParallelScale()
-            else:
-                cx, cy, cz = camera.GetPosition()
-                worldsize = math.sqrt((x - cx) ** 2 + (y - cy) ** 2 +
-                                      (z - cz) ** 2) * \
-                    math.tan(0.5 * camera.GetViewAngle() / 57.296)
-            windowWidth, windowHeight = renderer.GetSize()
+        if actors and self._HasViewChanged(renderer, x, y, z):
+            state = self.GetCameraState(renderer)
+            windowWidth, windowHeight = state.GetSize()
             if windowWidth > 0 and windowHeight > 0:
-                pitch = worldsize / windowHeight
+                pitch = state.GetPixelPitch((x, y, z))
                 for actor in actors:
                     actor.SetScale(pitch)
 
@@ -0,0 +1,274 @@
+# =========================================================================
+#
+# Copyright (c) 2000 Atamai, Inc.
+#
+# Use, modification and redistribution of the software, in source or
+# binary forms, are permitted provided that the following terms and
+# conditions are met:
+#
+# 1) Redistribution of the source code, in verbatim or modified
+#    form, must retain the above copyright notice, this license,
+#    the following disclaimer, and any notices that refer to this
+#    license and/or the following disclaimer.
+#
+# 2) Redistribution in binary form must include the above copyright
+#    notice, a copy of this license and the following disclaimer
+#    in the documentation or with other materials provided with the
+#    distribution.
+#
+# 3) Modified copies of the source code must be clearly marked as such,
+#    and must not be misrepresented as verbatim copies of the source code.
+#
+# THE COPYRIGHT HOLDERS AND/OR OTHER PARTIES PROVIDE THE SOFTWARE "AS IS"
+# WITHOUT EXPRESSED OR IMPLIED WARRANTY INCLUDING, BUT NOT LIMITED TO,
+# THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR
+# PURPOSE.  IN NO EVENT SHALL ANY COPYRIGHT HOLDER OR OTHER PARTY WHO MAY
+# MODIFY AND/OR REDISTRIBUTE THE SOFTWARE UNDER THE TERMS OF THIS LICENSE
+# BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL OR CONSEQUENTIAL DAMAGES
+# (INCLUDING, BUT NOT LIMITED TO, LOSS OF DATA OR DATA BECOMING INACCURATE
+# OR LOSS OF PROFIT OR BUSINESS INTERRUPTION) ARISING IN ANY WAY OUT OF
+# THE USE OR INABILITY TO USE THE SOFTWARE, EVEN IF ADVISED OF THE
+# POSSIBILITY OF SUCH DAMAGES.
+#
+# =========================================================================
+
+#
+# This file represents a derivative work by Parallax Innovations Inc.
+#
+
+"""
+DeformationField - a shared, cached sampling of a nonlinear transform
+
+  Nonlinear transforms such as vtkThinPlateSplineTransform are slow to
+  evaluate, because every point is compared against every landmark.
+  The DeformationField samples the inverse of an image transform once
+  over the whole volume, and stores the result as the displacement grid
+  of a vtkGridTransform.  Reslicing through the grid transform only
+  requires an interpolation, so moving a slice plane does not cause the
+  original transform to be evaluated again.
+
+  The grid covers the bounds of the image after it has been warped by
+  the transform, plus a margin.  Its spacing is four times the voxel
+  spacing of the image, or coarser if that would exceed the memory
+  limit.  The grid is recomputed when the MTime of the transform or the
+  geometry of the image changes.
+
+  Fields are shared: GetDeformationField(*transform*,*input*) returns
+  the same field for every caller that shows the same image through
+  the same transform, and ReleaseDeformationField(*transform*,*input*)
+  must be called once for every call to GetDeformationField().  Fields
+  that are no longer used are kept until the memory limit is exceeded,
+  so that switching back to a recent transform is cheap.
+
+Public Methods:
+
+  GetTransform()               -- the image transform that is sampled
+
+  GetInput()                   -- the image that the field covers
+
+  GetResliceTransform()        -- a vtkGridTransform that approximates
+                                  the inverse of the image transform
+
+  GetMemorySize()              -- the size of the grid in bytes
+
+  Update()                     -- recompute the grid if it is out of date
+
+Module Functions:
+
+  GetDeformationField(*transform*,*input*) -- get the shared field
+
+  ReleaseDeformationField(*transform*,*input*) -- release a field that
+                                  was obtained from GetDeformationField()
+
+  SetMemoryLimit(*bytes*)      -- the maximum size of one field, and of
+                                  all of the unused fields that are kept
+
+  GetMemoryLimit()             -- get the memory limit
+
+"""
+
+#======================================
+import math
+import vtk
+
+#======================================
+
+# shared fields, keyed by (transform, input): each value is [field, refcount]
+_DeformationFields = {}
+
+# fields that are no longer in use, oldest first: a list of (key, field)
+_UnusedFields = []
+
+_MemoryLimit = 64 * 1024 * 1024
+
+
+def SetMemoryLimit(nbytes):
+    global _MemoryLimit
+    _MemoryLimit = nbytes
+    _PruneUnusedFields()
+
+
+def GetMemoryLimit():
+    return _MemoryLimit
+
+
+def GetDeformationField(transform, input):
+    """Get the field for *transform* and *input*, creating it if needed."""
+    key = (transform, input)
+    try:
+        item = _DeformationFields[key]
+    except KeyError:
+        field = None
+        for i in range(len(_UnusedFields)):
+            if _UnusedFields[i][0] == key:
+                field = _UnusedFields[i][1]
+                del _UnusedFields[i]
+                break
+        if field is None:
+            field = DeformationField(transform, input)
+        item = [field, 0]
+        _DeformationFields[key] = item
+    item[1] = item[1] + 1
+    return item[0]
+
+
+def ReleaseDeformationField(transform, input):
+    """Release a field that was obtained through GetDeformationField()."""
+    key = (transform, input)
+    try:
+        item = _DeformationFields[key]
+    except KeyError:
+        return
+    item[1] = item[1] - 1
+    if item[1] <= 0:
+        del _DeformationFields[key]
+        _UnusedFields.append((key, item[0]))
+        _PruneUnusedFields()
+
+
+def _PruneUnusedFields():
+    total = 0
+    for key, field in _UnusedFields:
+        total = total + field.GetMemorySize()
+    while _UnusedFields and total > _MemoryLimit:
+        key, field = _UnusedFields.pop(0)
+        total = total - field.GetMemorySize()
+        field.tearDown()
+
+
+class DeformationField(object):
+
+    """A displacement grid that samples the inverse of a transform."""
+
+    def __init__(self, transform, input):
+        self._Transform = transform
+        self._Input = input
+
+        # the grid is computed from the inverse of the transform
+        self._TransformToGrid = vtk.vtkTransformToGrid()
+        self._TransformToGrid.SetInput(transform.GetInverse())
+        self._TransformToGrid.SetGridScalarTypeToFloat()
+        self._GridTransform = vtk.vtkGridTransform()
+        self._GridTransform.SetInterpolationModeToCubic()
+
+        # the image geometry and the transform MTime of the last update
+        self._Geometry = None
+        self._TransformMTime = None
+        self._MemorySize = 0
+
+        # VTK-6
+        if vtk.vtkVersion().GetVTKMajorVersion() > 5:
+            self._GridTransform.SetDisplacementGridConnection(
+                self._TransformToGrid.GetOutputPort())
+        else:
+            self._GridTransform.SetDisplacementGrid(
+                self._TransformToGrid.GetOutput())
+
+        self._UpdateGeometry()
+
+    def tearDown(self):
+        self._TransformToGrid = None
+        self._GridTransform = None
+        self._Transform = None
+        self._Input = None
+
+    def GetTransform(self):
+        return self._Transform
+
+    def GetInput(self):
+        return self._Input
+
+    def GetResliceTransform(self):
+        return self._GridTransform
+
+    def GetMemorySize(self):
+        return self._MemorySize
+
+    def Update(self):
+        """Recompute the grid if the transform or the image changed."""
+        self._UpdateGeometry()
+        mtime = self._Transform.GetMTime()
+        if mtime == self._TransformMTime:
+            return
+        self._TransformMTime = mtime
+        self._TransformToGrid.Update()
+
+    def _GetInputGeometry(self):
+        input = self._Input
+        # VTK-6
+        if vtk.vtkVersion().GetVTKMajorVersion() > 5:
+            extent = input.GetExtent()
+        else:
+            input.UpdateInformation()
+            extent = input.GetWholeExtent()
+        return (tuple(input.GetOrigin()), tuple(input.GetSpacing()),
+                tuple(extent))
+
+    def _UpdateGeometry(self):
+        """Lay out the grid over the warped bounds of the image."""
+        geometry = self._GetInputGeometry()
+        if geometry == self._Geometry:
+            return
+        self._Geometry = geometry
+        self._TransformMTime = None
+        origin, spacing, extent = geometry
+
+        # the warped image lies within the warped corners, plus a margin
+        transform = self._Transform
+        bounds = [1e300, -1e300, 1e300, -1e300, 1e300, -1e300]
+        for k in (4, 5):
+            for j in (2, 3):
+                for i in (0, 1):
+                    point = transform.TransformPoint(
+                        origin[0] + spacing[0] * extent[i],
+                        origin[1] + spacing[1] * extent[j],
+                        origin[2] + spacing[2] * extent[k])
+                    for a in range(3):
+                        bounds[2 * a] = min(bounds[2 * a], point[a])
+                        bounds[2 * a + 1] = max(bounds[2 * a + 1], point[a])
+
+        gridSpacing = map(lambda x: 4 * abs(x), spacing)
+        size = []
+        for a in range(3):
+            margin = 0.1 * (bounds[2 * a + 1] - bounds[2 * a])
+            bounds[2 * a] = bounds[2 * a] - margin
+            bounds[2 * a + 1] = bounds[2 * a + 1] + margin
+            size.append(bounds[2 * a + 1] - bounds[2 * a])
+
+        # coarsen the grid until it fits within the memory limit,
+        # each point holds a three-component float displacement
+        while 1:
+            dims = []
+            for a in range(3):
+                dims.append(int(math.ceil(size[a] / gridSpacing[a])) + 1)
+            nbytes = dims[0] * dims[1] * dims[2] * 12
+            if nbytes <= _MemoryLimit:
+                break
+            factor = math.pow(float(nbytes) / _MemoryLimit, 1.0 / 3.0)
+            gridSpacing = map(lambda x: x * max(factor, 1.01), gridSpacing)
+        self._MemorySize = nbytes
+
+        tgrid = self._TransformToGrid
+        tgrid.SetGridOrigin(bounds[0], bounds[2], bounds[4])
+        tgrid.SetGridSpacing(gridSpacing)
+        tgrid.SetGridExtent(0, dims[0] - 1, 0, dims[1] - 1, 0, dims[2] - 1)
@@ -67,11 +67,34 @@ ImagePane - high-quality image viewer
   RenderPane2D) is that the coordinate system in the window is a 2D
   coordinate system where horizontal is X, vertical is Y, and Z is always
   zero.
+
+  Several ImagePanes can be linked with an ImagePaneSyncGroup, so that
+  panning or slicing in one pane moves all of the others.  The group
+  updates all of its panes in a single transaction, and schedules one
+  render of all of the affected windows for when the application is idle.
+
+  Line profiles and region-of-interest statistics can be measured with
+  shapes that are drawn in display coordinates, see GetLineProfile(),
+  GetCircleStatistics() and GetPolygonStatistics().
+
+  SetSlabThickness() turns the view into a thick-slab MIP, MinIP or
+  average, see SetSlabMode().
+
+  StartCine() plays through the slices at a fixed frame rate that is
+  paced by the PaneFrame scheduler rather than by key repeat.  For a
+  4D image given with SetTimeSeries(), cine can instead play through
+  the time points, see SetCineMode().  The 'c' key starts and stops
+  cine playback.
 """
 
 import vtk
+import PaneFrame
 import RenderPane
 import EventHandler
+import ImagePyramid
+import ImageSampler
+import ImageROI
+import numpy
 import math
 import time
 
@@ -93,6 +116,89 @@ class newImageBlend(vtk.vtkImageBlend):
 vtkImageBlend = newImageBlend
 
 
+class ImageLayerBlend(object):
+
+    """Blend a stack of image layers, one layer at a time.
+
+    This class provides the parts of the vtkImageBlend interface that
+    the ImagePane uses, but it blends the layers through a chain of
+    two-input vtkImageBlend filters.  Each filter in the chain holds the
+    composite of all the layers beneath it, so when the opacity or the
+    lookup table of one layer is changed, only the filters from that
+    layer upwards are re-executed.
+    """
+
+    def __init__(self):
+        self._Layers = []
+        self._Opacities = {}
+        # the blend filter that adds each layer to the layers below it
+        self._Stages = {}
+        # pass-through filter, to provide an output that doesn't change
+        # when the chain is rebuilt
+        self._Output = vtk.vtkImageChangeInformation()
+
+    def SetInput(self, i, input):
+        n = len(self._Layers)
+        if input is None and i == n - 1:
+            del self._Layers[i]
+        elif i >= n:
+            self._Layers = self._Layers + [None] * (i - n + 1)
+            self._Layers[i] = input
+        else:
+            self._Layers[i] = input
+        self._UpdateStages()
+
+    def GetInput(self, i=0):
+        try:
+            return self._Layers[i]
+        except IndexError:
+            return None
+
+    def GetNumberOfInputs(self):
+        return len(self._Layers)
+
+    def SetOpacity(self, i, opacity):
+        self._Opacities[i] = opacity
+        if i in self._Stages:
+            self._Stages[i].SetOpacity(1, opacity)
+
+    def GetOpacity(self, i):
+        return self._Opacities.get(i, 1.0)
+
+    def GetOutput(self):
+        return self._Output.GetOutput()
+
+    def GetMTime(self):
+        mtime = self._Output.GetMTime()
+        for stage in self._Stages.values():
+            mtime = max(mtime, stage.GetMTime())
+        return mtime
+
+    def _UpdateStages(self):
+        # the base layer is not blended, each layer above it is blended
+        # with the composite of all the layers below it
+        below = None
+        stages = {}
+        for i in range(len(self._Layers)):
+            layer = self._Layers[i]
+            if layer is None:
+                continue
+            if below is None:
+                below = layer
+                continue
+            try:
+                stage = self._Stages[i]
+            except KeyError:
+                stage = vtk.vtkImageBlend()
+            stage.SetInput(0, below)
+            stage.SetInput(1, layer)
+            stage.SetOpacity(1, self.GetOpacity(i))
+            stages[i] = stage
+            below = stage.GetOutput()
+        self._Stages = stages
+        self._Output.SetInput(below)
+
+
 class vtkImageActor2(vtk.vtkActor):
 
     """This class is a special ImageActor substitute that uses a
@@ -205,10 +311,34 @@ class ImagePane(RenderPane.RenderPane):
         self._Executing = 0
         self._SyncScalePanes = []
         self._SyncPanes = []
+        self._SyncGroup = None
 
         # whether slicing is limited to image bounds
         self._SliceLimits = 1
 
+        # whether to reslice from reduced-resolution copies of the
+        # inputs when zoomed out, and which level is used for each input
+        self._UseImagePyramid = 0
+        self._ImagePyramids = {}
+        self._ImagePyramidLevels = {}
+
+        # cached (bounds, spacing) for each input, see
+        # _GetTransformedGeometry()
+        self._TransformedGeometry = {}
+
+        # point samplers for GetImageValues(), keyed by input index
+        self._ImageSamplers = {}
+
+        # ImageTimeSeries that provide the inputs, keyed by input index
+        self._TimeSeries = {}
+
+        # thick slab settings, the slab is sampled more coarsely while
+        # the pane is in dynamic (interactive) mode
+        self._SlabThickness = 0.0
+        self._SlabMode = 'Max'
+        self._SlabSampleSpacing = None
+        self._SlabInteractiveFactor = 4.0
+
         self._RenderingModes = {'DrawPixels': 0,
                                 'Texture': 1}
         self._RenderingMode = 0
@@ -225,6 +355,22 @@ class ImagePane(RenderPane.RenderPane):
         self._AccelerationFactor = 1.0
         self._AccelerationTime = 0.0
         self._LastRenderTimeInSeconds = 0.0
+
+        # cine playback, see StartCine()
+        self._CineScheduleId = None
+        self._CineReadAheadId = None
+        self._CineFrameRate = 10.0
+        self._CineMode = 'Slice'
+        self._CineRange = None
+        self._CineLoop = 1
+        self._CineStartTime = 0.0
+        self._CineStartFrame = 0
+        self._CineFrame = None
+        self._CineFrameTimes = []
+        self._CineDroppedFrames = 0
+        self._CineRingSize = 4
+        self._CineRing = []
+        self._CineReslices = []
         self._OriginalColorWindow = 1.0
         self._OriginalColorLevel = 0.5
         self._LastX = 0
@@ -273,7 +419,7 @@ class ImagePane(RenderPane.RenderPane):
         # ImageColor performs color mapping operations on each volume
         self._ImageColor = []
 
-        reslice = vtk.vtkImageReslice()
+        reslice = vtk.vtkImageSlabReslice()
         reslice.SetInput(0, self.MakeDefaultImage())
         reslice.SetInterpolationMode(self._InterpolationMode)
         reslice.SetResliceAxes(vtk.vtkMatrix4x4())
@@ -298,7 +444,7 @@ class ImagePane(RenderPane.RenderPane):
         self._ImageReslice.append(reslice)
         self._ImageColor.append(color)
 
-        self._ImageBlend = vtk.vtkImageBlend()
+        self._ImageBlend = ImageLayerBlend()
         self._ImageBlend.SetInput(0, self._ImageColor[0].GetOutput())
 
         # the ImageChangeInformation adjusts the image so that the
@@ -335,7 +481,7 @@ class ImagePane(RenderPane.RenderPane):
         self._ImageChangeInformation2 = []
         self._ImageActor2 = []
 
-        reslice2 = vtk.vtkImageReslice()
+        reslice2 = vtk.vtkImageSlabReslice()
         reslice2.SetInput(self.MakeDefaultImage())
         reslice2.SetInterpolationModeToNearestNeighbor()
         reslice2.SetResliceAxes(self._ImageReslice[0].GetResliceAxes())
@@ -367,29 +513,33 @@ class ImagePane(RenderPane.RenderPane):
 
     def DynamicOff(self):
         if self._Dynamic != 0:
+            self._Dynamic = 0
             for reslice in self._ImageReslice:
                 if reslice:
                     reslice.SetInterpolationMode(self._InterpolationMode)
+            if self._SlabThickness > 0:
+                self._UpdateSlab()
             if self._RenderingMode == 1:
                 self._ImageActor.SetVisibility(1)
                 for actor2 in self._ImageActor2:
                     if actor2:
                         actor2.SetVisibility(0)
-            self._Dynamic = 0
             self.Modified()
 
     def DynamicOn(self):
         if self._Dynamic == 0:
+            self._Dynamic = 1
             for reslice in self._ImageReslice:
                 if reslice:
                     reslice.SetInterpolationMode(
                         self._DynamicInterpolationMode)
+            if self._SlabThickness > 0:
+                self._UpdateSlab()
             if self._RenderingMode == 1 and not self.IsOblique():
                 self._ImageActor.SetVisibility(0)
                 for actor2 in self._ImageActor2:
                     if actor2:
                         actor2.SetVisibility(1)
-            self._Dynamic = 1
             self.Modified()
 
     def IsOblique(self):
@@ -491,6 +641,7 @@ class ImagePane(RenderPane.RenderPane):
         self.BindEvent('<KeyPress-r>', self.DoReset)
         self.BindEvent('<KeyPress-p>', self.DoPrintPixel)
         self.BindEvent('<KeyPress-t>', self.DoSwitchRenderingMode)
+        self.BindEvent('<KeyPress-c>', self.DoToggleCine)
 
         self.BindEvent('<Shift-KeyPress-Left>', self.DoCameraPanLeft)
         self.BindEvent('<Shift-KeyPress-Right>', self.DoCameraPanRight)
@@ -508,6 +659,10 @@ class ImagePane(RenderPane.RenderPane):
         self.BindEvent('<Control-KeyPress-Down>', self.DoDecreaseWindow)
         self.BindEvent('<Control-KeyPress-Up>', self.DoIncreaseWindow)
 
+    def tearDown(self):
+        self.StopCine()
+        RenderPane.RenderPane.tearDown(self)
+
     def MakeDefaultImage(self):
         """w.MakeDefaultImage()  -- create the default image
 
@@ -672,6 +827,8 @@ class ImagePane(RenderPane.RenderPane):
         if input == ImagePane.GetInput(self, i):
             return
 
+        self._ReleaseImagePyramid(i)
+
         if input is None:
             if i == 0:
                 self._ImageReslice[i].SetInput(self.MakeDefaultImage())
@@ -706,7 +863,7 @@ class ImagePane(RenderPane.RenderPane):
             self._ImageActor2 = self._ImageActor2 + [None] * (i - n + 1)
 
         if self._ImageReslice[i] is None:
-            reslice = vtk.vtkImageReslice()
+            reslice = vtk.vtkImageSlabReslice()
             reslice.SetResliceAxes(self._ImageReslice[0].GetResliceAxes())
             reslice.SetResliceTransform(self._ImageReslice[0].
                                         GetResliceTransform())
@@ -717,7 +874,7 @@ class ImagePane(RenderPane.RenderPane):
                                          GetInterpolationMode())
             reslice.SetBackgroundLevel(0)
             reslice.SetOptimization(2)
-            reslice2 = vtk.vtkImageReslice()
+            reslice2 = vtk.vtkImageSlabReslice()
             reslice2.SetInterpolationModeToNearestNeighbor()
             reslice2.SetResliceAxes(self._ImageReslice[0].GetResliceAxes())
             reslice2.SetResliceTransform(self._ImageReslice[0].
@@ -768,6 +925,12 @@ class ImagePane(RenderPane.RenderPane):
         reslice2 = self._ImageReslice2[i]
         reslice2.SetInput(input)
 
+        if self._UseImagePyramid:
+            self._ImagePyramids[i] = ImagePyramid.GetImagePyramid(input)
+            self._ImagePyramidLevels[i] = 0
+
+        self._UpdateSlabReslice(i)
+
         """
         # rearrange pipeline as a test
         reslice = self._ImageReslice[i]
@@ -826,9 +989,34 @@ class ImagePane(RenderPane.RenderPane):
             cz = 1
         self._SetSlice(cz)
 
+    def SetTimeSeries(self, series, i=0):
+        """w.SetTimeSeries(series,i=0)  -- display an ImageTimeSeries
+
+        The output of the series becomes input *i*.  Changing the time
+        index of the series afterwards does not reset the view.
+        """
+        if series is None:
+            if i in self._TimeSeries:
+                del self._TimeSeries[i]
+            return
+        self._TimeSeries[i] = series
+        self.SetInput(series.GetOutput(), i)
+
+    def GetTimeSeries(self, i=0):
+        """w.GetTimeSeries(i=0)  -- get the ImageTimeSeries for input i
+        """
+        series = self._TimeSeries.get(i)
+        if series and series.GetOutput() is not ImagePane.GetInput(self, i):
+            # the input was replaced with SetInput()
+            del self._TimeSeries[i]
+            series = None
+        return series
+
     def GetInput(self, i=0):
         """w.GetInput(i=0)  -- get image input
         """
+        if i in self._ImagePyramids:
+            return self._ImagePyramids[i].GetInput()
         try:
             return self._ImageReslice[i].GetInput()
         except:
@@ -939,6 +1127,162 @@ class ImagePane(RenderPane.RenderPane):
             if pair[1] == self._DynamicInterpolationMode:
                 return pair[0]
 
+    def SetSlabThickness(self, thickness):
+        """w.SetSlabThickness(thickness)  -- display a thick slab
+
+        The slab is centered on the current slice and its thickness is
+        in world units.  A thickness of zero gives a normal slice.
+        """
+        self._SlabThickness = max(float(thickness), 0.0)
+        self._UpdateSlab()
+
+    def GetSlabThickness(self):
+        """w.GetSlabThickness()  -- get the slab thickness
+        """
+        return self._SlabThickness
+
+    def SetSlabMode(self, mode):
+        """w.SetSlabMode(mode)  -- 'Max', 'Min' or 'Mean' projection
+        """
+        if mode not in ('Max', 'Min', 'Mean'):
+            raise ValueError("unknown slab mode " + repr(mode))
+        self._SlabMode = mode
+        self._UpdateSlab()
+
+    def SetSlabModeToMax(self):
+        self.SetSlabMode('Max')
+
+    def SetSlabModeToMin(self):
+        self.SetSlabMode('Min')
+
+    def SetSlabModeToMean(self):
+        self.SetSlabMode('Mean')
+
+    def GetSlabMode(self):
+        """w.GetSlabMode()  -- get the slab projection mode
+        """
+        return self._SlabMode
+
+    def SetSlabSampleSpacing(self, spacing):
+        """w.SetSlabSampleSpacing(spacing)  -- distance between slab samples
+
+        The default, None, samples the slab at the voxel spacing along
+        the view direction.
+        """
+        self._SlabSampleSpacing = spacing
+        self._UpdateSlab()
+
+    def GetSlabSampleSpacing(self):
+        """w.GetSlabSampleSpacing()  -- get the slab sample spacing
+        """
+        return self._SlabSampleSpacing
+
+    def SetSlabInteractiveFactor(self, factor):
+        """w.SetSlabInteractiveFactor(factor)  -- coarser dynamic sampling
+
+        While the pane is in dynamic mode (pan, slice, zoom), the slab
+        is sampled this many times more coarsely.  The full sampling
+        is restored by DynamicOff().
+        """
+        self._SlabInteractiveFactor = max(float(factor), 1.0)
+        self._UpdateSlab()
+
+    def GetSlabInteractiveFactor(self):
+        """w.GetSlabInteractiveFactor()  -- get the dynamic coarsening
+        """
+        return self._SlabInteractiveFactor
+
+    def _UpdateSlab(self):
+        for i in range(len(self._ImageReslice)):
+            if self._ImageReslice[i]:
+                self._UpdateSlabReslice(i)
+        self.Modified()
+
+    def _UpdateSlabReslice(self, i):
+        thickness = self._SlabThickness
+        spacing = self._SlabSampleSpacing
+        if not spacing and thickness > 0:
+            spacing = abs(self.GetTransformedSpacing(i)[2])
+        if not spacing:
+            spacing = 1.0
+        if self._Dynamic and thickness > 0:
+            # keep at least two samples across the slab
+            spacing = max(min(spacing * self._SlabInteractiveFactor,
+                              0.5 * thickness), spacing)
+
+        for reslice in (self._ImageReslice[i], self._ImageReslice2[i]):
+            reslice.SetSlabThickness(thickness)
+            getattr(reslice, 'SetBlendModeTo' + self._SlabMode)()
+            reslice.SetSlabResolution(spacing)
+
+    def SetUseImagePyramid(self, onoff):
+        """w.SetUseImagePyramid(onoff)  -- reslice from reduced copies
+
+        If this is on, then whenever the view is zoomed out so that a
+        screen pixel is larger than a voxel, the image is resliced from
+        an averaged, reduced-resolution copy of the input.  The copies
+        are shared with any other pane or factory that shows the same
+        input, and are built when the application is idle.
+        """
+        if onoff == self._UseImagePyramid:
+            return
+        self._UseImagePyramid = onoff
+        if onoff:
+            for i in range(self.GetNumberOfInputs()):
+                input = ImagePane.GetInput(self, i)
+                if input and self._ImageReslice[i]:
+                    self._ImagePyramids[i] = \
+                        ImagePyramid.GetImagePyramid(input)
+                    self._ImagePyramidLevels[i] = 0
+            self._UpdateImagePyramidLevels()
+        else:
+            for i in self._ImagePyramids.keys():
+                self._ReleaseImagePyramid(i)
+        self.Modified()
+
+    def GetUseImagePyramid(self):
+        """w.GetUseImagePyramid()  -- is reslicing from reduced copies on?
+        """
+        return self._UseImagePyramid
+
+    def UseImagePyramidOn(self):
+        self.SetUseImagePyramid(1)
+
+    def UseImagePyramidOff(self):
+        self.SetUseImagePyramid(0)
+
+    def _ReleaseImagePyramid(self, i):
+        # reconnect input i to its full-resolution image and release
+        # the shared pyramid
+        if i not in self._ImagePyramids:
+            return
+        pyramid = self._ImagePyramids[i]
+        del self._ImagePyramids[i]
+        del self._ImagePyramidLevels[i]
+        if self._ImageReslice[i]:
+            self._ImageReslice[i].SetInput(pyramid.GetInput())
+        ImagePyramid.ReleaseImagePyramid(pyramid.GetInput())
+
+    def _UpdateImagePyramidLevels(self):
+        # choose the pyramid level to reslice from, according to the
+        # size of a screen pixel in data units
+        for i in self._ImagePyramids:
+            reslice = self._ImageReslice[i]
+            pyramid = self._ImagePyramids[i]
+            level = pyramid.FindLevel(min(reslice.GetOutputSpacing()[0:2]))
+            if not pyramid.IsLevelCurrent(level):
+                # use a finer level until the requested one is ready
+                pyramid.BuildLevelLater(level, self._OnImagePyramidLevelBuilt)
+                level = pyramid.GetCurrentLevel(level)
+            if level != self._ImagePyramidLevels[i]:
+                self._ImagePyramidLevels[i] = level
+                reslice.SetInput(pyramid.GetLevelOutput(level))
+
+    def _OnImagePyramidLevelBuilt(self):
+        self._UpdateImagePyramidLevels()
+        self.Modified()
+        self.Render()
+
     def GetImageCoords2D(self, *args):
         """w.GetImageCoords2D(x,y)  -- get 2D image coords for mouse (x,y)
 
@@ -1025,33 +1369,228 @@ class ImagePane(RenderPane.RenderPane):
         else:
             dx, dy = args
 
-        reslice = self._ImageReslice[0]
-        extent = reslice.GetOutputExtent()
-        reslice.UpdateWholeExtent()
-        data = reslice.GetOutput()
+        values = self.GetImageValues([self.GetImageCoords3D(dx, dy)])[0]
 
-        n = data.GetNumberOfScalarComponents()
-        val = []
-        dataType = data.GetScalarType()
+        dataType = ImagePane.GetInput(self).GetScalarType()
         is_float = (dataType == 10 or dataType == 11)
-        for i in range(n):
-            try:
-                c = data.GetScalarComponentAsDouble(extent[0] + dx,
-                                                    extent[2] + dy,
-                                                    extent[4], i)
-            except AttributeError:
-                c = data.GetScalarComponentAsFloat(extent[0] + dx,
-                                                   extent[2] + dy,
-                                                   extent[4], i)
-
-            if not is_float:
-                c = int(c)
-            val.append(c)
+        if is_float:
+            val = [float(c) for c in values]
+        else:
+            # round like vtkImageReslice does for integer output
+            val = [int(math.floor(c + 0.5)) for c in values]
         if len(val) == 1:
             return val[0]
         else:
             return tuple(val)
 
+    def GetImageValues(self, points, i=0):
+        """w.GetImageValues(points,i=0)  -- sample the image at many points
+
+        The *points* are an N x 3 array of coordinates in the same
+        coordinate system as GetImageCoords3D(), and the result is an
+        N x C numpy array of values, where C is the number of image
+        components.  The current display interpolation mode is used.
+        """
+        sampler = self.GetImageSampler(i)
+        sampler.SetInterpolationMode(
+            self._ImageReslice[i].GetInterpolationMode())
+        points = ImageSampler.TransformPoints(
+            self._ImageReslice[i].GetResliceTransform(), points)
+        return sampler.Sample(points)
+
+    def GetImageSampler(self, i=0):
+        """w.GetImageSampler(i=0)  -- get the point sampler for input i
+
+        The sampler works in the coordinate system of the input image,
+        i.e. after the ResliceTransform has been applied.
+        """
+        input = ImagePane.GetInput(self, i)
+        if input is None:
+            raise ValueError("no image for input " + repr(i))
+        try:
+            sampler = self._ImageSamplers[i]
+        except KeyError:
+            sampler = ImageSampler.ImageSampler()
+            self._ImageSamplers[i] = sampler
+        sampler.SetInput(input)
+        return sampler
+
+    def GetLineProfile(self, p1, p2, n=None, i=0):
+        """w.GetLineProfile(p1,p2,n=None,i=0)  -- sample along a line
+
+        Sample the image along the line between the mouse positions
+        *p1* and *p2* with the current display interpolation mode.
+        If *n* is not given, the line is sampled once per voxel.  The
+        result is a tuple (distances, values) of numpy arrays, where the
+        distances are measured from *p1* in world units.
+        """
+        x1, y1 = self.GetImageCoords2D(p1)
+        x2, y2 = self.GetImageCoords2D(p2)
+        length = math.sqrt((x2 - x1) ** 2 + (y2 - y1) ** 2)
+        if n is None:
+            spacing = self.GetTransformedSpacing(i)
+            n = int(length / min(abs(spacing[0]), abs(spacing[1]))) + 1
+        n = max(int(n), 2)
+
+        t = numpy.linspace(0.0, 1.0, n)
+        points = numpy.empty((n, 3))
+        points[:, 0] = x1 + t * (x2 - x1)
+        points[:, 1] = y1 + t * (y2 - y1)
+        points[:, 2] = self._GetROISliceCoords(None, i)[0]
+        points = self._ResliceAxesToImageCoords(points)
+
+        values = self.GetImageValues(points, i)
+        component = min(self.GetActiveComponent(i), values.shape[1] - 1)
+        return (t * length, values[:, component])
+
+    def GetCircleStatistics(self, center, radius, i=0, slices=None):
+        """w.GetCircleStatistics(center,radius,i=0,slices=None)  -- ROI stats
+
+        Compute statistics for the voxels inside a circle that is given
+        in mouse coordinates, i.e. a center (x,y) and a radius in
+        display pixels.  See GetPolygonStatistics() for the meaning of
+        the *slices* argument and for the result.
+        """
+        cx, cy = self.GetImageCoords2D(center)
+        r = radius * abs(self._ImageReslice[0].GetOutputSpacing()[0])
+
+        def inside(points):
+            return ImageROI.PointsInCircle(points, (cx, cy), r)
+
+        return self._GetROIStatistics((cx - r, cx + r, cy - r, cy + r),
+                                      inside, i, slices)
+
+    def GetPolygonStatistics(self, points, i=0, slices=None):
+        """w.GetPolygonStatistics(points,i=0,slices=None)  -- ROI stats
+
+        Compute statistics for the voxels inside a polygon whose
+        vertices are given in mouse coordinates.  The polygon is
+        rasterized at the voxel spacing of the image.  If *slices* is
+        a (first, last) pair of slice numbers (see GetSlice()), then the
+        polygon is swept through these slices to make a 3D ROI, and the
+        slices are measured in parallel.  The result is a dict with
+        'count', 'mean', 'sd', 'min', 'max' and either 'area' or
+        'volume'.
+        """
+        polygon = [self.GetImageCoords2D(p) for p in points]
+        xs = [p[0] for p in polygon]
+        ys = [p[1] for p in polygon]
+
+        def inside(points):
+            return ImageROI.PointsInPolygon(points, polygon)
+
+        return self._GetROIStatistics((min(xs), max(xs), min(ys), max(ys)),
+                                      inside, i, slices)
+
+    def _GetROIStatistics(self, bounds, inside, i, slices):
+        points2D = self._RasterizeROI(bounds, inside, i)
+        zs = self._GetROISliceCoords(slices, i)
+
+        # use a private nearest-neighbor sampler, so that the threads
+        # do not share interpolation state with GetImageValues()
+        sampler = ImageSampler.ImageSampler()
+        sampler.SetInput(ImagePane.GetInput(self, i))
+        sampler.SetInterpolationModeToNearestNeighbor()
+        array = sampler.GetArray()
+        component = min(self.GetActiveComponent(i), array.shape[3] - 1)
+        transform = self._ImageReslice[i].GetResliceTransform()
+
+        # combine the reslice axes, the transform and the image geometry
+        # into one matrix here, so that the threads only use numpy
+        axes = ImageSampler.GetTransformMatrix(None)
+        matrix = self._ImageReslice[0].GetResliceAxes()
+        for r in range(3):
+            for c in range(4):
+                axes[r, c] = matrix.GetElement(r, c)
+        tmatrix = ImageSampler.GetTransformMatrix(transform)
+        if tmatrix is not None:
+            m = numpy.dot(sampler.GetIndexMatrix(), numpy.dot(tmatrix, axes))
+
+        def measure(z):
+            points = numpy.empty((points2D.shape[0], 4))
+            points[:, 0:2] = points2D
+            points[:, 2] = z
+            points[:, 3] = 1.0
+            points = numpy.dot(points, m.T)
+            idx = points[:, 0:3] / points[:, 3:4]
+            values = sampler.SampleIndices(idx, array)
+            return ImageROI.ComputeStatistics(values[:, component])
+
+        def measureNonlinear(z):
+            # nonlinear transforms need VTK, so they stay on this thread
+            points = numpy.empty((points2D.shape[0], 3))
+            points[:, 0:2] = points2D
+            points[:, 2] = z
+            points = self._ResliceAxesToImageCoords(points)
+            points = ImageSampler.TransformPoints(transform, points)
+            values = sampler.Sample(points, array)
+            return ImageROI.ComputeStatistics(values[:, component])
+
+        if points2D.shape[0] == 0:
+            zs = []
+        if tmatrix is not None:
+            results = ImageROI.ParallelMap(measure, zs)
+        else:
+            results = [measureNonlinear(z) for z in zs]
+        stats = ImageROI.CombineStatistics(results)
+
+        spacing = self.GetTransformedSpacing(i)
+        area = abs(spacing[0] * spacing[1])
+        if slices is None:
+            stats['area'] = stats['count'] * area
+        else:
+            stats['volume'] = stats['count'] * area * abs(spacing[2])
+        return stats
+
+    def _RasterizeROI(self, bounds, inside, i):
+        """Get an N x 2 array of voxel centers inside of the ROI.
+
+        The voxel centers are in the 2D coordinate system of the
+        GetImageCoords2D() method, and only the voxels within the
+        2D *bounds* of the ROI are tested.
+        """
+        imageBounds = self.GetTransformedBounds(i)
+        spacing = self.GetTransformedSpacing(i)
+
+        grids = []
+        for j in (0, 1):
+            s = abs(spacing[j])
+            lo = imageBounds[2 * j]
+            hi = imageBounds[2 * j + 1]
+            n = int(round((hi - lo) / s)) if s else 0
+            k0 = max(int(math.ceil((bounds[2 * j] - lo) / s - 1e-6)), 0)
+            k1 = min(int(math.floor((bounds[2 * j + 1] - lo) / s + 1e-6)), n)
+            grids.append(lo + s * numpy.arange(k0, k1 + 1))
+
+        x, y = numpy.meshgrid(grids[0], grids[1])
+        points = numpy.column_stack((x.ravel(), y.ravel()))
+        return points[inside(points)]
+
+    def _GetROISliceCoords(self, slices, i):
+        """Get the slice positions (in the GetImageCoords2D() frame)."""
+        reslice = self._ImageReslice[0]
+        if slices is None:
+            extent = reslice.GetOutputExtent()
+            return [extent[4] * reslice.GetOutputSpacing()[2] +
+                    reslice.GetOutputOrigin()[2]]
+
+        bounds = self.GetTransformedBounds(i)
+        s = abs(self.GetTransformedSpacing(i)[2])
+        if s == 0:
+            return [bounds[4]]
+        n = int(round((bounds[5] - bounds[4]) / s))
+        first, last = min(slices), max(slices)
+        k0 = max(int(math.ceil(first - 1e-6)), 0)
+        k1 = min(int(math.floor(last + 1e-6)), n)
+        return [bounds[4] + s * k for k in range(k0, k1 + 1)]
+
+    def _ResliceAxesToImageCoords(self, points):
+        """Convert an N x 3 array from reslice axes to 3D image coords."""
+        matrix = self._ImageReslice[0].GetResliceAxes()
+        m = numpy.array([[matrix.GetElement(r, c) for c in range(4)]
+                         for r in range(3)])
+        return numpy.dot(points, m[:, 0:3].T) + m[:, 3]
+
     def GetTransformedBounds(self, i=0):
         """v.GetTransformedBounds()  -- get permuted bounding box
 
@@ -1059,26 +1598,55 @@ class ImagePane(RenderPane.RenderPane):
         the ResliceAxes.  If the reslice axes are oblique, then
         a weighted averaging is done using the direction cosines.
         """
+        return self._GetTransformedGeometry(i)[0]
+
+    def GetTransformedSpacing(self, i=0):
+        """v.GetTransformedSpacing()  -- get permuted voxel spacing
+
+        Return the Spacing of the input after permuting it through
+        the ResliceAxes.  If the reslice axes are oblique, then
+        a weighted averaging is done using the direction cosines.
+        """
+        return self._GetTransformedGeometry(i)[1]
+
+    def _GetTransformedGeometry(self, i):
+        """v._GetTransformedGeometry(i)  -- get (bounds, spacing) for input
+
+        The result is cached until the input geometry, the ResliceAxes
+        or the ResliceTransform changes, because this is called many
+        times for every slice step.
+        """
         reslice = self._ImageReslice[i]
 
-        input = reslice.GetInput()
+        input = ImagePane.GetInput(self, i)
         input.UpdateInformation()
         inSpacing = input.GetSpacing()
         inExtent = input.GetWholeExtent()
         inOrigin = input.GetOrigin()
 
+        rmatrix = reslice.GetResliceAxes()
+        transform = reslice.GetResliceTransform()
+
+        key = (input, inSpacing, inExtent, inOrigin, rmatrix, transform,
+               rmatrix and rmatrix.GetMTime(),
+               transform and transform.GetMTime())
+        try:
+            cachedKey, geometry = self._TransformedGeometry[i]
+            if cachedKey == key:
+                return geometry
+        except KeyError:
+            pass
+
         inCenter = [0.0, 0.0, 0.0]
-        for i in range(3):
-            inCenter[i] = inOrigin[i] + \
-                0.5 * (inExtent[2 * i] +
-                       inExtent[2 * i + 1]) * inSpacing[i]
+        for j in range(3):
+            inCenter[j] = inOrigin[j] + \
+                0.5 * (inExtent[2 * j] +
+                       inExtent[2 * j + 1]) * inSpacing[j]
 
         matrix = vtk.vtkMatrix4x4()
-        rmatrix = reslice.GetResliceAxes()
         if rmatrix is not None:
             matrix.DeepCopy(rmatrix)
 
-        transform = reslice.GetResliceTransform()
         if transform is not None:
             vtk.vtkMatrix4x4().Multiply4x4(
                 transform.GetMatrix(), matrix, matrix)
@@ -1087,60 +1655,44 @@ class ImagePane(RenderPane.RenderPane):
         imatrix.Invert()
 
         bounds = [0.0, 0.0, 0.0, 0.0, 0.0, 0.0]
+        spacing = [0.0, 0.0, 0.0]
 
-        for i in range(3):
+        for k in range(3):
             r = 0.0
             c = 0.0
             d = 0.0
             for j in range(3):
-                c = c + imatrix.GetElement(i, j) * (inCenter[j] -
+                c = c + imatrix.GetElement(k, j) * (inCenter[j] -
                                                     matrix.GetElement(j, 3))
-                tmp = abs(matrix.GetElement(j, i))
+                tmp = abs(matrix.GetElement(j, k))
                 d = d + tmp * abs(inSpacing[j]) * (inExtent[2 * j + 1] -
                                                    inExtent[2 * j])
+                spacing[k] = spacing[k] + tmp * abs(inSpacing[j])
                 r = r + tmp * tmp
             d = d / r
-            bounds[2 * i] = c - 0.5 * d
-            bounds[2 * i + 1] = c + 0.5 * d
+            bounds[2 * k] = c - 0.5 * d
+            bounds[2 * k + 1] = c + 0.5 * d
+            spacing[k] = spacing[k] / r
 
-        return tuple(bounds)
+        geometry = (tuple(bounds), tuple(spacing))
+        self._TransformedGeometry[i] = (key, geometry)
 
-    def GetTransformedSpacing(self, i=0):
-        """v.GetTransformedSpacing()  -- get permuted voxel spacing
-
-        Return the Spacing of the input after permuting it through
-        the ResliceAxes.  If the reslice axes are oblique, then
-        a weighted averaging is done using the direction cosines.
-        """
-        reslice = self._ImageReslice[i]
-
-        input = reslice.GetInput()
-        input.UpdateInformation()
-        inSpacing = input.GetSpacing()
-
-        matrix = vtk.vtkMatrix4x4()
-        rmatrix = reslice.GetResliceAxes()
-        if rmatrix is not None:
-            matrix.DeepCopy(rmatrix)
-        transform = reslice.GetResliceTransform()
-        if transform is not None:
-            vtk.vtkMatrix4x4().Multiply4x4(
-                transform.GetMatrix(), matrix, matrix)
-
-        spacing = [0.0, 0.0, 0.0]
-        for i in range(3):
-            r = 0.0
-            for j in range(3):
-                tmp = abs(matrix.GetElement(j, i))
-                spacing[i] = spacing[i] + tmp * abs(inSpacing[j])
-                r = r + tmp * tmp
-            spacing[i] = spacing[i] / r
-
-        return tuple(spacing)
+        return geometry
 
     def Reset(self):
         """w.Reset()  -- reset to centered, 1-to-1 scaling
         """
+        group = self._SyncGroup
+        if group:
+            group.BeginUpdate()
+            try:
+                self._Reset()
+            finally:
+                group.EndUpdate()
+        else:
+            self._Reset()
+
+    def _Reset(self):
         xl, xh, yl, yh = self.GetTransformedBounds()[0:4]
         xs, ys = self.GetTransformedSpacing()[0:2]
         self.SyncSetScale(1.0)
@@ -1202,6 +1754,25 @@ class ImagePane(RenderPane.RenderPane):
         """
         return self._SyncScalePanes
 
+    def SetSyncGroup(self, group):
+        """w.SetSyncGroup(group)  -- join an ImagePaneSyncGroup
+
+        The sync panes are set to the other panes in the group, and
+        slicing or panning this pane updates the whole group at once.
+        Use None to leave the current group.
+        """
+        if group is self._SyncGroup:
+            return
+        if self._SyncGroup:
+            self._SyncGroup.RemovePane(self)
+        if group:
+            group.AddPane(self)
+
+    def GetSyncGroup(self):
+        """w.GetSyncGroup()  -- get the ImagePaneSyncGroup for this pane
+        """
+        return self._SyncGroup
+
     # TODO: remove this sync stuff ----
 
     def GetSlice(self):
@@ -1225,6 +1796,16 @@ class ImagePane(RenderPane.RenderPane):
 
         Note that slice numbering starts at 0.
         """
+        group = self._SyncGroup
+        if group:
+            group.BeginUpdate()
+            try:
+                self._SetSlice(i)
+                group.SetCenterCoords(self.GetCenterCoords(), self)
+            finally:
+                group.EndUpdate()
+            return
+
         self._SetSlice(i)
         centerCoords = self.GetCenterCoords()
         for pane in self._SyncPanes:
@@ -1238,7 +1819,15 @@ class ImagePane(RenderPane.RenderPane):
 
         o = ol + s * i
 
-        if self._SliceLimits:
+        if self._SliceLimits and self._SyncGroup:
+            # the group computes the limits once for all of its panes
+            ol, oh = self._SyncGroup.GetSliceLimits(self)
+            if o < ol:
+                o = ol
+            if o > oh:
+                o = oh
+
+        elif self._SliceLimits:
             j = 1  # skip first input of this pane
             for pane in [self] + self._SyncPanes:
                 for k in range(j, pane.GetNumberOfInputs()):
@@ -1314,6 +1903,16 @@ class ImagePane(RenderPane.RenderPane):
         if len(args) == 1:
             args = args[0]
 
+        group = self._SyncGroup
+        if group:
+            group.BeginUpdate()
+            try:
+                self._SetCenterPixel(args)
+                group.SetCenterCoords(self.GetCenterCoords(), self)
+            finally:
+                group.EndUpdate()
+            return
+
         self._SetCenterPixel(args)
         centerCoords = self.GetCenterCoords()
         for pane in self._SyncPanes:
@@ -1535,6 +2134,8 @@ class ImagePane(RenderPane.RenderPane):
 
             self._ImageActor2[i].SetDisplayExtent(extent)
 
+        self._UpdateImagePyramidLevels()
+
         # adjust the cursor position
         # (this means that for mouse drag events, the DoCursorMotion
         #  method will be called twice, maybe _UpdateCamera should receive
@@ -1716,6 +2317,335 @@ class ImagePane(RenderPane.RenderPane):
         self._LastX = x
         self._LastY = y
 
+    def SetCineFrameRate(self, fps):
+        """w.SetCineFrameRate(fps)  -- set the target frames per second
+        """
+        fps = float(fps)
+        if fps <= 0:
+            raise ValueError("cine frame rate must be positive")
+        if self._CineScheduleId is not None and self._CineFrame is not None:
+            # restart the clock so that the current frame is kept
+            self._CineStartTime = time.time()
+            self._CineStartFrame = self._CineFrame
+            self._CineFrameTimes = []
+        self._CineFrameRate = fps
+
+    def GetCineFrameRate(self):
+        """w.GetCineFrameRate()  -- get the target frames per second
+        """
+        return self._CineFrameRate
+
+    def GetCineAchievedFrameRate(self):
+        """w.GetCineAchievedFrameRate()  -- frames per second over last second
+
+        Compare this with GetCineFrameRate() to see whether playback
+        is keeping up, frames that cannot be shown on time are skipped.
+        """
+        times = self._CineFrameTimes
+        if len(times) < 2 or times[-1] == times[0]:
+            return 0.0
+        return (len(times) - 1) / (times[-1] - times[0])
+
+    def GetCineDroppedFrames(self):
+        """w.GetCineDroppedFrames()  -- number of frames skipped so far
+        """
+        return self._CineDroppedFrames
+
+    def SetCineMode(self, mode):
+        """w.SetCineMode(mode)  -- play through 'Slice' or 'Time'
+
+        In 'Time' mode, cine steps the time index of the ImageTimeSeries
+        that was given to SetTimeSeries(), and all views of the series
+        are switched in the same render.
+        """
+        if mode not in ('Slice', 'Time'):
+            raise ValueError("unknown cine mode " + repr(mode))
+        if mode != self._CineMode:
+            self.StopCine()
+            self._CineRange = None
+            self._CineMode = mode
+
+    def SetCineModeToSlice(self):
+        self.SetCineMode('Slice')
+
+    def SetCineModeToTime(self):
+        self.SetCineMode('Time')
+
+    def GetCineMode(self):
+        return self._CineMode
+
+    def SetCineRange(self, first, last):
+        """w.SetCineRange(first,last)  -- set the frames to play through
+
+        By default, cine plays through all of the slices, or through all
+        of the time points in 'Time' mode.
+        """
+        self._CineRange = (int(first), int(last))
+
+    def GetCineRange(self):
+        """w.GetCineRange()  -- get the (first,last) frames for cine
+        """
+        if self._CineRange is not None:
+            return self._CineRange
+        if self._CineMode == 'Time':
+            series = self.GetTimeSeries()
+            if series is None:
+                return (0, 0)
+            return (0, series.GetNumberOfFrames() - 1)
+        s = self.GetTransformedSpacing()[2]
+        if s == 0:
+            return (0, 0)
+        ol, oh = self.GetTransformedBounds()[4:6]
+        return (0, int(round((oh - ol) / s)))
+
+    def SetCineLoop(self, loop):
+        """w.SetCineLoop(loop)  -- wrap around at the end, default: on
+        """
+        self._CineLoop = loop
+
+    def GetCineLoop(self):
+        return self._CineLoop
+
+    def SetCineReadAhead(self, n):
+        """w.SetCineReadAhead(n)  -- number of frames to compute in advance
+        """
+        self._CineRingSize = max(int(n), 0)
+        del self._CineRing[self._CineRingSize:]
+
+    def GetCineReadAhead(self):
+        return self._CineRingSize
+
+    def StartCine(self, fps=None):
+        """w.StartCine(fps=None)  -- start playing through the slices
+
+        The frames are paced by the PaneFrame scheduler.  If rendering
+        falls behind, frames are skipped so that the playback speed
+        stays correct.  While the pane waits for the next frame, the
+        following frames are resliced in advance.
+        """
+        if fps is not None:
+            self.SetCineFrameRate(fps)
+        self.StopCine()
+        frames = PaneFrame.PaneFrame.AllPaneFrames
+        if not frames:
+            return
+
+        first, last = self.GetCineRange()
+        if self._CineMode == 'Time':
+            if self.GetTimeSeries() is None:
+                raise ValueError("cine mode is 'Time' but there is no "
+                                 "time series, see SetTimeSeries()")
+            frame = self.GetTimeSeries().GetTimeIndex()
+        else:
+            frame = int(math.floor(self.GetSlice() + 0.5))
+        if frame < first or frame > last:
+            frame = first
+
+        self._CineStartTime = time.time()
+        self._CineStartFrame = frame
+        self._CineFrame = None
+        self._CineFrameTimes = []
+        self._CineDroppedFrames = 0
+        self._CineScheduleId = frames[0].ScheduleOnce(0, self._CineTick)
+
+    def StopCine(self):
+        """w.StopCine()  -- stop cine playback
+        """
+        frames = PaneFrame.PaneFrame.AllPaneFrames
+        for id in (self._CineScheduleId, self._CineReadAheadId):
+            if id is not None and frames:
+                frames[0].UnSchedule(id)
+        self._CineScheduleId = None
+        self._CineReadAheadId = None
+        self._CineRing = []
+        self._CineReslices = []
+        self._SetCineImages(None)
+        self.Modified()
+
+    def IsCinePlaying(self):
+        """w.IsCinePlaying()  -- check whether cine is running
+        """
+        return (self._CineScheduleId is not None)
+
+    def _GetCineFrameNumber(self, t):
+        """Get the frame that should be shown at time *t*, or None."""
+        first, last = self.GetCineRange()
+        n = last - first + 1
+        k = self._CineStartFrame - first + \
+            int((t - self._CineStartTime) * self._CineFrameRate)
+        if k >= n:
+            if not self._CineLoop:
+                return None
+            k = k % n
+        return first + k
+
+    def _CineTick(self):
+        self._CineScheduleId = None
+        frames = PaneFrame.PaneFrame.AllPaneFrames
+        if not frames:
+            return
+
+        t = time.time()
+        frame = self._GetCineFrameNumber(t)
+        if frame is None:
+            self.StopCine()
+            self.Render()
+            return
+
+        if frame != self._CineFrame:
+            if self._CineFrame is not None:
+                first, last = self.GetCineRange()
+                skipped = (frame - self._CineFrame - 1) % (last - first + 1)
+                self._CineDroppedFrames = self._CineDroppedFrames + skipped
+            self._CineFrame = frame
+            self._ShowCineFrame(frame)
+
+            times = self._CineFrameTimes
+            times.append(time.time())
+            while times[-1] - times[0] > 1.0:
+                del times[0]
+
+        # wake up again at the start of the next frame period
+        period = 1.0 / self._CineFrameRate
+        elapsed = time.time() - self._CineStartTime
+        delay = period - elapsed % period
+        self._CineScheduleId = frames[0].ScheduleOnce(delay * 1000.0,
+                                                      self._CineTick)
+        if self._CineRingSize > 0 and self._CineReadAheadId is None:
+            self._CineReadAheadId = frames[0].ScheduleOnce(
+                0, self._CineReadAhead)
+
+    def _ShowCineFrame(self, frame):
+        if self._CineMode == 'Time':
+            series = self.GetTimeSeries()
+            if series is None:
+                self.StopCine()
+                return
+            series.SetTimeIndex(frame)
+            series.Render()
+            return
+
+        key = self._GetCineKey()
+        images = None
+        for item in self._CineRing:
+            if item[0] == frame and item[1] == key:
+                images = item[2]
+        # drop frames that have been passed or that are out of date
+        self._CineRing = [item for item in self._CineRing
+                          if item[1] == key and
+                          self._IsCineFrameAhead(item[0], frame)]
+
+        self.SetSlice(frame)
+        self._SetCineImages(images)
+        if not self._SyncGroup:
+            self.Render()
+            for pane in self._SyncPanes:
+                pane.Render()
+
+    def _IsCineFrameAhead(self, k, frame):
+        first, last = self.GetCineRange()
+        n = last - first + 1
+        return 0 < (k - frame) % n <= self._CineRingSize
+
+    def _SetCineImages(self, images):
+        """Feed precomputed slices to the color mapping, or restore."""
+        for i in range(len(self._ImageReslice)):
+            reslice = self._ImageReslice[i]
+            if not reslice:
+                continue
+            if images and images[i]:
+                self._ImageColor[i].SetInput(images[i])
+            elif self._ImageColor[i].GetInput() is not reslice.GetOutput():
+                self._ImageColor[i].SetInput(reslice.GetOutput())
+
+    def _GetCineKey(self):
+        """Everything except the slice position that affects a frame."""
+        key = []
+        for reslice in self._ImageReslice:
+            if not reslice:
+                key.append(None)
+                continue
+            input = reslice.GetInput()
+            transform = reslice.GetResliceTransform()
+            key.append((input, input.GetMTime(),
+                        reslice.GetResliceAxes().GetMTime(),
+                        transform, transform and transform.GetMTime(),
+                        reslice.GetInterpolationMode(),
+                        reslice.GetOutputExtent(),
+                        reslice.GetOutputSpacing(),
+                        reslice.GetOutputOrigin()[0:2],
+                        reslice.GetSlabThickness(),
+                        reslice.GetBlendMode(),
+                        reslice.GetSlabResolution()))
+        return tuple(key)
+
+    def _CineReadAhead(self):
+        """Reslice upcoming frames until the next frame is due."""
+        self._CineReadAheadId = None
+        if self._CineScheduleId is None or self._CineFrame is None:
+            return
+
+        if self._CineMode == 'Time':
+            # the series double-buffers the next time point by itself
+            return
+
+        key = self._GetCineKey()
+        period = 1.0 / self._CineFrameRate
+        deadline = self._CineStartTime + period * \
+            (math.floor((time.time() - self._CineStartTime) / period) + 1)
+        first, last = self.GetCineRange()
+        n = last - first + 1
+
+        for j in range(1, min(self._CineRingSize, n - 1) + 1):
+            frame = first + (self._CineFrame - first + j) % n
+            if not self._CineLoop and frame < self._CineFrame:
+                break
+            if [1 for item in self._CineRing
+                    if item[0] == frame and item[1] == key]:
+                continue
+            # leave a margin for the render of the next frame
+            if time.time() + self._LastRenderTimeInSeconds > deadline:
+                break
+            self._CineRing.append((frame, key, self._ResliceCineFrame(frame)))
+
+    def _ResliceCineFrame(self, frame):
+        """Compute the resliced images for the given frame."""
+        ol = self.GetTransformedBounds()[4]
+        z = ol + self.GetTransformedSpacing()[2] * frame
+
+        images = []
+        for i in range(len(self._ImageReslice)):
+            reslice = self._ImageReslice[i]
+            if not reslice:
+                images.append(None)
+                continue
+            if len(self._CineReslices) <= i:
+                self._CineReslices.append(vtk.vtkImageSlabReslice())
+            cine = self._CineReslices[i]
+            cine.SetInput(reslice.GetInput())
+            cine.SetResliceAxes(reslice.GetResliceAxes())
+            cine.SetResliceTransform(reslice.GetResliceTransform())
+            cine.SetInterpolationMode(reslice.GetInterpolationMode())
+            cine.SetBackgroundColor(reslice.GetBackgroundColor())
+            cine.SetOutputExtent(reslice.GetOutputExtent())
+            cine.SetOutputSpacing(reslice.GetOutputSpacing())
+            origin = list(reslice.GetOutputOrigin())
+            origin[2] = z
+            cine.SetOutputOrigin(origin)
+            cine.SetSlabThickness(reslice.GetSlabThickness())
+            cine.SetBlendMode(reslice.GetBlendMode())
+            cine.SetSlabResolution(reslice.GetSlabResolution())
+            cine.Update()
+
+            image = vtk.vtkImageData()
+            image.DeepCopy(cine.GetOutput())
+            # VTK-6
+            if vtk.vtkVersion().GetVTKMajorVersion() <= 5:
+                image.SetWholeExtent(image.GetExtent())
+            images.append(image)
+
+        return images
+
     def _GetKeyAcceleration(self, event):
         """v._GetKeyAcceleration(event)  -- do keyboard acceleration
 
@@ -1807,6 +2737,12 @@ class ImagePane(RenderPane.RenderPane):
 
         self.SetSlice(math.floor(self.GetSlice() + accel + 0.5))
 
+    def DoToggleCine(self, event):
+        if self.IsCinePlaying():
+            self.StopCine()
+        else:
+            self.StartCine()
+
     def DoPrevSlice(self, event):
         accel = self._GetKeyAcceleration(event)
         if accel == 0:
@@ -1930,7 +2866,7 @@ class ImagePane(RenderPane.RenderPane):
             if reslice:
                 if reslice.GetMTime() > sinceMTime:
                     return 1
-                input = reslice.GetInput()
+                input = ImagePane.GetInput(self, i)
                 if input and input.GetMTime() > sinceMTime:
                     return 1
             color = self._ImageColor[i]
@@ -1955,3 +2891,194 @@ class ImagePane(RenderPane.RenderPane):
 
     def GetSliceLimits(self):
         return self._SliceLimits
+
+
+class ImagePaneSyncGroup(object):
+
+    """A set of ImagePanes that share a common center and slice position.
+
+    When one pane in the group is panned or sliced, the new center is
+    applied to every other pane in a single transaction: the slice
+    limits for the group are computed once, each pane is updated once,
+    and one render of all of the affected windows is scheduled for when
+    the application is idle, so that several transactions within one
+    event are rendered together with one buffer swap per window.  The
+    cost therefore grows linearly with the number of panes and inputs.
+
+    Several changes can be grouped into one transaction by calling
+    BeginUpdate() and EndUpdate() around them.
+    """
+
+    def __init__(self, panes=()):
+        self._Panes = []
+        self._UpdateDepth = 0
+        self._ModifiedPanes = []
+        # the panes waiting for the scheduled render
+        self._RenderPanes = []
+        self._RenderId = None
+        # union of the input bounds of all panes, valid in a transaction
+        self._WorldBounds = None
+
+        for pane in panes:
+            self.AddPane(pane)
+
+    def AddPane(self, pane):
+        if pane in self._Panes:
+            return
+        if pane._SyncGroup:
+            pane._SyncGroup.RemovePane(pane)
+        self._Panes.append(pane)
+        pane._SyncGroup = self
+        self._UpdateSyncPanes()
+
+    def RemovePane(self, pane):
+        if pane not in self._Panes:
+            return
+        self._Panes.remove(pane)
+        pane._SyncGroup = None
+        pane._SyncPanes = []
+        self._UpdateSyncPanes()
+
+    def GetPanes(self):
+        return self._Panes
+
+    def _UpdateSyncPanes(self):
+        # each pane syncs to all the other panes, for the benefit of
+        # the cursor, scale and dynamic interpolation code in ImagePane
+        for pane in self._Panes:
+            pane._SyncPanes = [p for p in self._Panes if p is not pane]
+
+    def BeginUpdate(self):
+        """Start a transaction, the render is deferred until EndUpdate()."""
+        self._UpdateDepth = self._UpdateDepth + 1
+
+    def EndUpdate(self):
+        """End a transaction, and schedule a render of the modified panes."""
+        self._UpdateDepth = self._UpdateDepth - 1
+        if self._UpdateDepth > 0:
+            return
+        self._UpdateDepth = 0
+        self._WorldBounds = None
+        panes = self._ModifiedPanes
+        self._ModifiedPanes = []
+        for pane in panes:
+            if pane not in self._RenderPanes:
+                self._RenderPanes.append(pane)
+
+        # all transactions before the application is idle share one render
+        frames = PaneFrame.PaneFrame.AllPaneFrames
+        if frames and self._RenderId is None and self._RenderPanes:
+            self._RenderId = frames[0].ScheduleOnce(0, self._RenderLater)
+
+    def _RenderLater(self):
+        self._RenderId = None
+        panes = self._RenderPanes
+        self._RenderPanes = []
+        self._Render(panes)
+
+    def SetCenterCoords(self, coords, source=None):
+        """Move all panes except *source* so that *coords* is centered."""
+        self.BeginUpdate()
+        try:
+            if source and source not in self._ModifiedPanes:
+                self._ModifiedPanes.append(source)
+            for pane in self._Panes:
+                if pane is not source:
+                    pane.SetCenterCoords(coords)
+                    if pane not in self._ModifiedPanes:
+                        self._ModifiedPanes.append(pane)
+        finally:
+            self.EndUpdate()
+
+    def GetSliceLimits(self, pane):
+        """Get the (low, high) slice position limits for *pane*.
+
+        The limits are the extent of the union of all the inputs of all
+        the panes in the group, measured along the slice normal of *pane*.
+        """
+        bounds = self._GetWorldBounds()
+        if bounds is None:
+            return pane.GetTransformedBounds()[4:6]
+
+        matrix = pane.GetResliceAxes()
+        nx, ny, nz, w = matrix.MultiplyPoint((0, 0, 1, 0))
+        ox, oy, oz, w = matrix.MultiplyPoint((0, 0, 0, 1))
+
+        dists = []
+        for x in bounds[0:2]:
+            for y in bounds[2:4]:
+                for z in bounds[4:6]:
+                    dists.append((x - ox) * nx + (y - oy) * ny +
+                                 (z - oz) * nz)
+
+        return (min(dists), max(dists))
+
+    def _GetWorldBounds(self):
+        # get the bounds of all the inputs, in the coordinate system of
+        # the ResliceAxes (i.e. before the ResliceTransform is applied)
+        if self._WorldBounds is not None:
+            return self._WorldBounds
+
+        bounds = None
+        for pane in self._Panes:
+            for i in range(pane.GetNumberOfInputs()):
+                input = ImagePane.GetInput(pane, i)
+                if not input:
+                    continue
+                input.UpdateInformation()
+                extent = input.GetWholeExtent()
+                origin = input.GetOrigin()
+                spacing = input.GetSpacing()
+
+                corners = []
+                for xi in extent[0:2]:
+                    for yi in extent[2:4]:
+                        for zi in extent[4:6]:
+                            corners.append((origin[0] + xi * spacing[0],
+                                            origin[1] + yi * spacing[1],
+                                            origin[2] + zi * spacing[2]))
+
+                transform = pane.GetResliceTransform(i)
+                if transform:
+                    transform = transform.GetInverse()
+                    corners = map(transform.TransformPoint, corners)
+
+                for corner in corners:
+                    if bounds is None:
+                        bounds = [corner[0], corner[0],
+                                  corner[1], corner[1],
+                                  corner[2], corner[2]]
+                    for j in range(3):
+                        if corner[j] < bounds[2 * j]:
+                            bounds[2 * j] = corner[j]
+                        if corner[j] > bounds[2 * j + 1]:
+                            bounds[2 * j + 1] = corner[j]
+
+        if self._UpdateDepth > 0:
+            self._WorldBounds = bounds
+
+        return bounds
+
+    def Render(self):
+        """Render all the panes in the group."""
+        self._RenderPanes = []
+        self._Render(self._Panes)
+
+    def _Render(self, panes):
+        # render each window once, and swap all the buffers at the end
+        windows = []
+        for pane in panes:
+            window = pane.GetRenderWindow()
+            if window not in windows:
+                windows.append(window)
+
+        renderedframes = []
+        for frame in PaneFrame.PaneFrame.AllPaneFrames:
+            if frame.GetRenderWindow() in windows:
+                frame.GetRenderWindow().SwapBuffersOff()
+                if frame.Render():
+                    renderedframes.append(frame)
+                frame.GetRenderWindow().SwapBuffersOn()
+
+        for frame in renderedframes:
+            frame.GetRenderWindow().Frame()
@@ -0,0 +1,326 @@
+# =========================================================================
+#
+# Copyright (c) 2000 Atamai, Inc.
+#
+# Use, modification and redistribution of the software, in source or
+# binary forms, are permitted provided that the following terms and
+# conditions are met:
+#
+# 1) Redistribution of the source code, in verbatim or modified
+#    form, must retain the above copyright notice, this license,
+#    the following disclaimer, and any notices that refer to this
+#    license and/or the following disclaimer.
+#
+# 2) Redistribution in binary form must include the above copyright
+#    notice, a copy of this license and the following disclaimer
+#    in the documentation or with other materials provided with the
+#    distribution.
+#
+# 3) Modified copies of the source code must be clearly marked as such,
+#    and must not be misrepresented as verbatim copies of the source code.
+#
+# THE COPYRIGHT HOLDERS AND/OR OTHER PARTIES PROVIDE THE SOFTWARE "AS IS"
+# WITHOUT EXPRESSED OR IMPLIED WARRANTY INCLUDING, BUT NOT LIMITED TO,
+# THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR
+# PURPOSE.  IN NO EVENT SHALL ANY COPYRIGHT HOLDER OR OTHER PARTY WHO MAY
+# MODIFY AND/OR REDISTRIBUTE THE SOFTWARE UNDER THE TERMS OF THIS LICENSE
+# BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL OR CONSEQUENTIAL DAMAGES
+# (INCLUDING, BUT NOT LIMITED TO, LOSS OF DATA OR DATA BECOMING INACCURATE
+# OR LOSS OF PROFIT OR BUSINESS INTERRUPTION) ARISING IN ANY WAY OUT OF
+# THE USE OR INABILITY TO USE THE SOFTWARE, EVEN IF ADVISED OF THE
+# POSSIBILITY OF SUCH DAMAGES.
+#
+# =========================================================================
+
+#
+# This file represents a derivative work by Parallax Innovations Inc.
+#
+
+"""
+ImagePyramid - a shared stack of reduced-resolution copies of an image
+
+  The ImagePyramid builds a series of averaged, downsampled copies of
+  an image volume.  Each level halves the resolution along every axis
+  that is finer than the target spacing for that level, so anisotropic
+  volumes become isotropic before their thickest axis is reduced.
+  Level 0 is always the original input.
+
+  Reslicing from a pyramid level instead of from the original data
+  makes the cost of a zoomed-out view proportional to the number of
+  screen pixels rather than the number of voxels, and the averaging
+  removes most of the aliasing that a sparse reslice would produce.
+
+  Levels are built on demand.  BuildLevelLater() defers the work to
+  the PaneFrame scheduler so that views can keep displaying a finer
+  level until the coarser one is ready.
+
+  Pyramids are shared: GetImagePyramid(*input*) returns the same
+  pyramid for every caller that shows the same vtkImageData, and
+  ReleaseImagePyramid(*input*) must be called once for every call
+  to GetImagePyramid() so that unused pyramids can be freed.
+
+Public Methods:
+
+  GetInput()                  -- get the full-resolution image
+
+  GetNumberOfLevels()         -- number of levels, including level 0
+
+  GetLevelOutput(*level*)     -- get the vtkImageData for a level
+
+  GetLevelSpacing(*level*)    -- get the voxel spacing for a level
+
+  FindLevel(*spacing*)        -- get the coarsest level with a voxel
+                                 spacing no larger than *spacing*
+
+  IsLevelCurrent(*level*)     -- check whether a level is up-to-date
+
+  GetCurrentLevel(*level*)    -- get the coarsest up-to-date level
+                                 that is not coarser than *level*
+
+  BuildLevel(*level*)         -- bring a level up-to-date immediately
+
+  BuildLevelLater(*level*,*callback*=None) -- bring a level up-to-date
+                                 when the application is idle, then call
+                                 *callback* with no arguments
+
+  ConnectLevel(*level*,*filter*) -- make a level the input of a filter
+
+Module Functions:
+
+  GetImagePyramid(*input*)     -- get the shared pyramid for *input*
+
+  ReleaseImagePyramid(*input*) -- release a pyramid from GetImagePyramid()
+
+"""
+
+#======================================
+import PaneFrame
+import math
+import vtk
+
+#======================================
+
+# shared pyramids, keyed by input: each value is [pyramid, refcount]
+_ImagePyramids = {}
+
+
+def GetImagePyramid(input):
+    """Get the pyramid for *input*, creating it if necessary."""
+    try:
+        item = _ImagePyramids[input]
+    except KeyError:
+        item = [ImagePyramid(input), 0]
+        _ImagePyramids[input] = item
+    item[1] = item[1] + 1
+    return item[0]
+
+
+def ReleaseImagePyramid(input):
+    """Release a pyramid that was obtained through GetImagePyramid()."""
+    try:
+        item = _ImagePyramids[input]
+    except KeyError:
+        return
+    item[1] = item[1] - 1
+    if item[1] <= 0:
+        item[0].tearDown()
+        del _ImagePyramids[input]
+
+
+class ImagePyramid(object):
+
+    """A lazily built stack of averaged, downsampled images."""
+
+    def __init__(self, input):
+        self._Input = input
+
+        # levels are not created for images smaller than this
+        self._MinimumSize = 32
+        self._MaximumNumberOfLevels = 6
+
+        # filters for levels 1 and up, level 0 is the input itself
+        self._Shrinks = []
+        self._Infos = []
+        self._Spacings = []
+        self._WholeExtent = None
+
+        # input MTime at the time each level was last built
+        self._BuildTimes = []
+
+        # callbacks waiting for a level to be built, keyed by level
+        self._PendingLevels = {}
+        self._ScheduleId = None
+
+    def tearDown(self):
+        if self._ScheduleId is not None and PaneFrame.PaneFrame.AllPaneFrames:
+            PaneFrame.PaneFrame.AllPaneFrames[0].UnSchedule(self._ScheduleId)
+        self._ScheduleId = None
+        self._PendingLevels = {}
+        self._Shrinks = []
+        self._Infos = []
+        self._Input = None
+
+    def GetInput(self):
+        return self._Input
+
+    def SetMinimumSize(self, size):
+        self._MinimumSize = size
+        self._WholeExtent = None
+
+    def GetMinimumSize(self):
+        return self._MinimumSize
+
+    def SetMaximumNumberOfLevels(self, n):
+        self._MaximumNumberOfLevels = n
+        self._WholeExtent = None
+
+    def GetMaximumNumberOfLevels(self):
+        return self._MaximumNumberOfLevels
+
+    def GetNumberOfLevels(self):
+        self._UpdateLevels()
+        return len(self._Shrinks) + 1
+
+    def GetLevelOutput(self, level):
+        if level == 0:
+            return self._Input
+        self._UpdateLevels()
+        return self._Infos[level - 1].GetOutput()
+
+    def GetLevelSpacing(self, level):
+        self._UpdateLevels()
+        return self._Spacings[level]
+
+    def FindLevel(self, spacing):
+        """Find the coarsest level with voxels no larger than *spacing*."""
+        self._UpdateLevels()
+        spacing = spacing * 1.0001  # tolerance for round-off
+        level = 0
+        for i in range(1, len(self._Spacings)):
+            if min(map(abs, self._Spacings[i])) > spacing:
+                break
+            level = i
+        return level
+
+    def IsLevelCurrent(self, level):
+        if level == 0:
+            return 1
+        self._UpdateLevels()
+        return self._BuildTimes[level - 1] >= self._Input.GetMTime()
+
+    def GetCurrentLevel(self, level):
+        while level > 0 and not self.IsLevelCurrent(level):
+            level = level - 1
+        return level
+
+    def BuildLevel(self, level):
+        if self.IsLevelCurrent(level):
+            return
+        self._Infos[level - 1].Update()
+        self._BuildTimes[level - 1] = self._Input.GetMTime()
+
+    def BuildLevelLater(self, level, callback=None):
+        if level == 0:
+            return
+        callbacks = self._PendingLevels.setdefault(level, [])
+        if callback and callback not in callbacks:
+            callbacks.append(callback)
+        if not PaneFrame.PaneFrame.AllPaneFrames:
+            self._BuildPendingLevels()
+        elif self._ScheduleId is None:
+            self._ScheduleId = PaneFrame.PaneFrame.AllPaneFrames[0].\
+                ScheduleOnce(0, self._BuildPendingLevels)
+
+    def ConnectLevel(self, level, filter):
+        """Set the specified level as the input to *filter*."""
+        self._UpdateLevels()
+        # VTK-6
+        if vtk.vtkVersion().GetVTKMajorVersion() > 5:
+            if level == 0:
+                filter.SetInputData(self._Input)
+            else:
+                filter.SetInputConnection(
+                    self._Infos[level - 1].GetOutputPort())
+        else:
+            filter.SetInput(self.GetLevelOutput(level))
+
+    def _BuildPendingLevels(self):
+        self._ScheduleId = None
+        pending = self._PendingLevels
+        self._PendingLevels = {}
+        # build the finest levels first, the coarser ones depend on them
+        levels = pending.keys()
+        levels.sort()
+        callbacks = []
+        for level in levels:
+            if level < self.GetNumberOfLevels():
+                self.BuildLevel(level)
+            for callback in pending[level]:
+                if callback not in callbacks:
+                    callbacks.append(callback)
+        for callback in callbacks:
+            callback()
+
+    def _UpdateLevels(self):
+        # (re)generate the pipeline if the input extent has changed
+        input = self._Input
+        # VTK-6
+        if vtk.vtkVersion().GetVTKMajorVersion() > 5:
+            extent = input.GetExtent()
+        else:
+            input.UpdateInformation()
+            extent = input.GetWholeExtent()
+        spacing = input.GetSpacing()
+
+        if self._Spacings and extent == self._WholeExtent and \
+                spacing == self._Spacings[0]:
+            return
+
+        self._WholeExtent = extent
+        self._Shrinks = []
+        self._Infos = []
+        self._Spacings = [spacing]
+        self._BuildTimes = []
+
+        size = [extent[1] - extent[0] + 1,
+                extent[3] - extent[2] + 1,
+                extent[5] - extent[4] + 1]
+        minspacing = min(map(abs, spacing))
+        lastOutput = None
+
+        for level in range(1, self._MaximumNumberOfLevels):
+            target = minspacing * 2 ** level
+            factors = [1, 1, 1]
+            for j in range(3):
+                if abs(spacing[j]) * 1.0001 < target and \
+                        size[j] >= 2 * self._MinimumSize:
+                    factors[j] = 2
+            if factors == [1, 1, 1]:
+                break
+
+            shrink = vtk.vtkImageShrink3D()
+            shrink.SetShrinkFactors(factors)
+            shrink.AveragingOn()
+            if lastOutput is None:
+                # VTK-6
+                if vtk.vtkVersion().GetVTKMajorVersion() > 5:
+                    shrink.SetInputData(input)
+                else:
+                    shrink.SetInput(input)
+            else:
+                shrink.SetInputConnection(lastOutput)
+
+            # the average of voxels i and i+1 lies halfway between them
+            info = vtk.vtkImageChangeInformation()
+            info.SetInputConnection(shrink.GetOutputPort())
+            info.SetOriginTranslation(
+                [0.5 * (factors[j] - 1) * spacing[j] for j in range(3)])
+
+            spacing = tuple([spacing[j] * factors[j] for j in range(3)])
+            size = [int(math.floor(size[j] / factors[j])) for j in range(3)]
+
+            self._Shrinks.append(shrink)
+            self._Infos.append(info)
+            self._Spacings.append(spacing)
+            self._BuildTimes.append(0)
+            lastOutput = info.GetOutputPort()
@@ -0,0 +1,154 @@
+# =========================================================================
+#
+# Copyright (c) 2000 Atamai, Inc.
+#
+# Use, modification and redistribution of the software, in source or
+# binary forms, are permitted provided that the following terms and
+# conditions are met:
+#
+# 1) Redistribution of the source code, in verbatim or modified
+#    form, must retain the above copyright notice, this license,
+#    the following disclaimer, and any notices that refer to this
+#    license and/or the following disclaimer.
+#
+# 2) Redistribution in binary form must include the above copyright
+#    notice, a copy of this license and the following disclaimer
+#    in the documentation or with other materials provided with the
+#    distribution.
+#
+# 3) Modified copies of the source code must be clearly marked as such,
+#    and must not be misrepresented as verbatim copies of the source code.
+#
+# THE COPYRIGHT HOLDERS AND/OR OTHER PARTIES PROVIDE THE SOFTWARE "AS IS"
+# WITHOUT EXPRESSED OR IMPLIED WARRANTY INCLUDING, BUT NOT LIMITED TO,
+# THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR
+# PURPOSE.  IN NO EVENT SHALL ANY COPYRIGHT HOLDER OR OTHER PARTY WHO MAY
+# MODIFY AND/OR REDISTRIBUTE THE SOFTWARE UNDER THE TERMS OF THIS LICENSE
+# BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL OR CONSEQUENTIAL DAMAGES
+# (INCLUDING, BUT NOT LIMITED TO, LOSS OF DATA OR DATA BECOMING INACCURATE
+# OR LOSS OF PROFIT OR BUSINESS INTERRUPTION) ARISING IN ANY WAY OUT OF
+# THE USE OR INABILITY TO USE THE SOFTWARE, EVEN IF ADVISED OF THE
+# POSSIBILITY OF SUCH DAMAGES.
+#
+# =========================================================================
+
+#
+# This file represents a derivative work by Parallax Innovations Inc.
+#
+
+"""
+ImageROI - vectorized helpers for region-of-interest measurements
+
+  These functions do the numerical work for the ROI methods of the
+  ImagePane: testing which points lie inside of a circle or polygon,
+  and computing the statistics of the image values inside the region.
+  Statistics are computed in pieces (e.g. one piece per slice) that
+  can be evaluated in parallel and then combined exactly.
+
+Module Functions:
+
+  PointsInCircle(*points*,*center*,*radius*) -- boolean mask for an N x 2
+                                array of points
+
+  PointsInPolygon(*points*,*polygon*) -- boolean mask for an N x 2 array
+                                of points, using the even-odd rule
+
+  ComputeStatistics(*values*)  -- partial statistics for a 1D array
+
+  CombineStatistics(*partials*) -- combine partial statistics into a
+                                dictionary with 'count', 'mean', 'sd'
+                                (sample standard deviation), 'min' and
+                                'max'
+
+  ParallelMap(*func*,*items*)  -- like map(), but the items are processed
+                                by a pool of threads
+
+"""
+
+#======================================
+import numpy
+import multiprocessing
+from multiprocessing.pool import ThreadPool
+
+#======================================
+
+_ThreadPool = None
+
+
+def ParallelMap(func, items):
+    """Apply *func* to each item in a thread pool, return a list."""
+    global _ThreadPool
+    items = list(items)
+    if len(items) < 2:
+        return [func(item) for item in items]
+    if _ThreadPool is None:
+        _ThreadPool = ThreadPool(multiprocessing.cpu_count())
+    return _ThreadPool.map(func, items)
+
+
+def PointsInCircle(points, center, radius):
+    points = numpy.asarray(points, numpy.float64)
+    dx = points[:, 0] - center[0]
+    dy = points[:, 1] - center[1]
+    return dx * dx + dy * dy <= radius * radius
+
+
+def PointsInPolygon(points, polygon):
+    points = numpy.asarray(points, numpy.float64)
+    x = points[:, 0]
+    y = points[:, 1]
+    inside = numpy.zeros(points.shape[0], bool)
+    n = len(polygon)
+    for k in range(n):
+        x1, y1 = polygon[k][0:2]
+        x2, y2 = polygon[(k + 1) % n][0:2]
+        if y1 == y2:
+            continue
+        crosses = (y1 > y) != (y2 > y)
+        xcross = x1 + (x2 - x1) * (y - y1) / (y2 - y1)
+        inside = inside ^ (crosses & (x < xcross))
+    return inside
+
+
+def ComputeStatistics(values):
+    """Get (count, mean, sum of squared deviations, min, max)."""
+    values = numpy.asarray(values, numpy.float64).ravel()
+    n = values.shape[0]
+    if n == 0:
+        return (0, 0.0, 0.0, None, None)
+    mean = values.mean()
+    d = values - mean
+    return (n, mean, numpy.dot(d, d), values.min(), values.max())
+
+
+def CombineStatistics(partials):
+    """Combine the results of several ComputeStatistics() calls."""
+    n = 0
+    mean = 0.0
+    m2 = 0.0
+    vmin = None
+    vmax = None
+    for pn, pmean, pm2, pmin, pmax in partials:
+        if pn == 0:
+            continue
+        # pairwise update (Chan et al.), exact for any split of the data
+        delta = pmean - mean
+        total = n + pn
+        mean = mean + delta * pn / total
+        m2 = m2 + pm2 + delta * delta * n * pn / total
+        n = total
+        if vmin is None or pmin < vmin:
+            vmin = pmin
+        if vmax is None or pmax > vmax:
+            vmax = pmax
+
+    stats = {'count': n, 'mean': None, 'sd': None,
+             'min': vmin, 'max': vmax}
+    if n > 0:
+        stats['mean'] = float(mean)
+        stats['sd'] = 0.0
+        stats['min'] = float(vmin)
+        stats['max'] = float(vmax)
+    if n > 1:
+        stats['sd'] = float(numpy.sqrt(m2 / (n - 1)))
+    return stats
@@ -0,0 +1,308 @@
+# =========================================================================
+#
+# Copyright (c) 2000 Atamai, Inc.
+#
+# Use, modification and redistribution of the software, in source or
+# binary forms, are permitted provided that the following terms and
+# conditions are met:
+#
+# 1) Redistribution of the source code, in verbatim or modified
+#    form, must retain the above copyright notice, this license,
+#    the following disclaimer, and any notices that refer to this
+#    license and/or the following disclaimer.
+#
+# 2) Redistribution in binary form must include the above copyright
+#    notice, a copy of this license and the following disclaimer
+#    in the documentation or with other materials provided with the
+#    distribution.
+#
+# 3) Modified copies of the source code must be clearly marked as such,
+#    and must not be misrepresented as verbatim copies of the source code.
+#
+# THE COPYRIGHT HOLDERS AND/OR OTHER PARTIES PROVIDE THE SOFTWARE "AS IS"
+# WITHOUT EXPRESSED OR IMPLIED WARRANTY INCLUDING, BUT NOT LIMITED TO,
+# THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR
+# PURPOSE.  IN NO EVENT SHALL ANY COPYRIGHT HOLDER OR OTHER PARTY WHO MAY
+# MODIFY AND/OR REDISTRIBUTE THE SOFTWARE UNDER THE TERMS OF THIS LICENSE
+# BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL OR CONSEQUENTIAL DAMAGES
+# (INCLUDING, BUT NOT LIMITED TO, LOSS OF DATA OR DATA BECOMING INACCURATE
+# OR LOSS OF PROFIT OR BUSINESS INTERRUPTION) ARISING IN ANY WAY OUT OF
+# THE USE OR INABILITY TO USE THE SOFTWARE, EVEN IF ADVISED OF THE
+# POSSIBILITY OF SUCH DAMAGES.
+#
+# =========================================================================
+
+#
+# This file represents a derivative work by Parallax Innovations Inc.
+#
+
+"""
+ImageSampler - interpolate image values at many points at once
+
+  The ImageSampler samples a vtkImageData at an arbitrary list of
+  points, using the same nearest-neighbor, linear or cubic
+  interpolation as vtkImageReslice.  The interpolation is done with
+  numpy on a view of the image scalars that shares memory with the
+  image, so no copy of the volume is made and no VTK pipeline has to
+  execute for each point.
+
+  Points that lie outside of the image are given the background level.
+
+Public Methods:
+
+  SetInput(*image*)            -- set the vtkImageData to sample
+
+  GetInput()                   -- get the image
+
+  SetInterpolationMode(*mode*) -- 'NearestNeighbor', 'Linear' or 'Cubic',
+                                  or the equivalent vtkImageReslice
+                                  constant (0, 1 or 3)
+
+  GetInterpolationMode()       -- get the mode as a vtkImageReslice constant
+
+  SetBackgroundLevel(*value*)  -- value for points outside the image
+
+  GetArray()                   -- get a (z,y,x,component) numpy view of the
+                                  image scalars
+
+  Sample(*points*,*array*=None) -- sample at an N x 3 array of (x,y,z)
+                                  points, the result is an N x C array
+                                  where C is the number of components
+
+  GetIndexMatrix()             -- get a 4x4 numpy matrix that converts
+                                  (x,y,z) points to continuous indices
+                                  into the array from GetArray()
+
+  SampleIndices(*indices*,*array*) -- sample the array at an N x 3 array
+                                  of continuous (i,j,k) indices, this only
+                                  uses numpy so it is safe to call from
+                                  worker threads
+
+Module Functions:
+
+  TransformPoints(*transform*,*points*) -- apply a vtkAbstractTransform
+                                  to an N x 3 array of points
+
+  GetTransformMatrix(*transform*) -- get a 4x4 numpy matrix for a linear
+                                  or homogeneous transform, or None if the
+                                  transform is nonlinear
+
+"""
+
+#======================================
+import numpy
+import vtk
+from vtk.util import numpy_support
+
+#======================================
+
+_InterpolationModes = {'NearestNeighbor': 0,
+                       'Nearest': 0,
+                       'Linear': 1,
+                       'Cubic': 3}
+
+
+def GetTransformMatrix(transform):
+    """Get the 4x4 matrix of a transform as a numpy array."""
+    if transform is None:
+        return numpy.identity(4)
+    if transform.IsA('vtkHomogeneousTransform') or \
+            transform.IsA('vtkHomogenousTransform'):
+        vmatrix = transform.GetMatrix()
+        return numpy.array([[vmatrix.GetElement(i, j) for j in range(4)]
+                            for i in range(4)])
+    return None
+
+
+def TransformPoints(transform, points):
+    """Transform an N x 3 array of points, return an N x 3 array."""
+    points = numpy.asarray(points, numpy.float64).reshape(-1, 3)
+    if transform is None:
+        return points
+    matrix = GetTransformMatrix(transform)
+    if matrix is not None:
+        result = numpy.dot(points, matrix[0:3, 0:3].T) + matrix[0:3, 3]
+        w = numpy.dot(points, matrix[3, 0:3]) + matrix[3, 3]
+        return result / w[:, numpy.newaxis]
+    # nonlinear transforms must be done point-by-point
+    return numpy.array([transform.TransformPoint(p) for p in points],
+                       numpy.float64).reshape(-1, 3)
+
+
+class ImageSampler(object):
+
+    """Vectorized point sampling of a vtkImageData."""
+
+    def __init__(self):
+        self._Input = None
+        self._InterpolationMode = 1
+        self._BackgroundLevel = 0.0
+
+        # the numpy view of the scalars, and what it was made from
+        self._Array = None
+        self._ArrayKey = None
+
+    def SetInput(self, input):
+        if input is not self._Input:
+            self._Input = input
+            self._Array = None
+            self._ArrayKey = None
+
+    def GetInput(self):
+        return self._Input
+
+    def SetInterpolationMode(self, mode):
+        if mode in _InterpolationModes:
+            mode = _InterpolationModes[mode]
+        if mode not in (0, 1, 3):
+            raise ValueError("unrecognized interpolation mode " + repr(mode))
+        self._InterpolationMode = mode
+
+    def GetInterpolationMode(self):
+        return self._InterpolationMode
+
+    def SetInterpolationModeToNearestNeighbor(self):
+        self.SetInterpolationMode(0)
+
+    def SetInterpolationModeToLinear(self):
+        self.SetInterpolationMode(1)
+
+    def SetInterpolationModeToCubic(self):
+        self.SetInterpolationMode(3)
+
+    def SetBackgroundLevel(self, value):
+        self._BackgroundLevel = value
+
+    def GetBackgroundLevel(self):
+        return self._BackgroundLevel
+
+    def GetArray(self):
+        """Get the image scalars as a (z,y,x,component) numpy array.
+
+        The array shares memory with the image, it is only regenerated
+        when the scalars or the extent of the image change.
+        """
+        input = self._Input
+        # VTK-6
+        if vtk.vtkVersion().GetVTKMajorVersion() <= 5:
+            input.UpdateInformation()
+            input.SetUpdateExtentToWholeExtent()
+            input.Update()
+
+        scalars = input.GetPointData().GetScalars()
+        extent = input.GetExtent()
+        key = (scalars, scalars.GetMTime(), extent)
+        if key != self._ArrayKey:
+            shape = (extent[5] - extent[4] + 1,
+                     extent[3] - extent[2] + 1,
+                     extent[1] - extent[0] + 1,
+                     scalars.GetNumberOfComponents())
+            self._Array = numpy_support.vtk_to_numpy(scalars).reshape(shape)
+            # the key keeps a reference to the scalars, which must stay
+            # alive for as long as the numpy view is in use
+            self._ArrayKey = key
+
+        return self._Array
+
+    def Sample(self, points, array=None):
+        """Sample the image at an N x 3 array of points.
+
+        The result is an N x C array of float values, where C is the
+        number of scalar components in the image.  If an *array* from
+        GetArray() is given, the pipeline is not updated, which allows
+        several threads to sample the same image at once.
+        """
+        points = numpy.asarray(points, numpy.float64).reshape(-1, 3)
+        if array is None:
+            array = self.GetArray()
+        matrix = self.GetIndexMatrix()
+        idx = numpy.dot(points, matrix[0:3, 0:3].T) + matrix[0:3, 3]
+        return self.SampleIndices(idx, array)
+
+    def GetIndexMatrix(self):
+        """Get the matrix from (x,y,z) to continuous array indices."""
+        input = self._Input
+        origin = input.GetOrigin()
+        spacing = input.GetSpacing()
+        extent = input.GetExtent()
+        matrix = numpy.identity(4)
+        for i in range(3):
+            matrix[i, i] = 1.0 / spacing[i]
+            matrix[i, 3] = -origin[i] / spacing[i] - extent[2 * i]
+        return matrix
+
+    def SampleIndices(self, idx, array):
+        """Sample an array from GetArray() at continuous indices.
+
+        Only numpy is used, so several threads can sample at once.
+        """
+        idx = numpy.asarray(idx, numpy.float64).reshape(-1, 3)
+
+        # continuous structured coordinates, in (x,y,z) order
+        dims = numpy.array([array.shape[2], array.shape[1], array.shape[0]])
+
+        # points within half a voxel of a flat axis are not rejected
+        tol = numpy.where(dims == 1, 0.5, 1e-3)
+        if self._InterpolationMode == 0:
+            tol = numpy.maximum(tol, 0.5)
+        inside = numpy.all((idx >= -tol) & (idx <= dims - 1 + tol), axis=1)
+
+        values = numpy.empty((idx.shape[0], array.shape[3]),
+                             numpy.float64)
+        values[:] = self._BackgroundLevel
+
+        idx = idx[inside]
+        if idx.shape[0] == 0:
+            return values
+
+        if self._InterpolationMode == 0:
+            values[inside] = self._SampleNearest(array, idx, dims)
+        elif self._InterpolationMode == 1:
+            values[inside] = self._SampleLinear(array, idx, dims)
+        else:
+            values[inside] = self._SampleCubic(array, idx, dims)
+
+        return values
+
+    def _SampleNearest(self, array, idx, dims):
+        i = numpy.clip(numpy.floor(idx + 0.5).astype(int), 0, dims - 1)
+        return array[i[:, 2], i[:, 1], i[:, 0]]
+
+    def _SampleLinear(self, array, idx, dims):
+        i0 = numpy.clip(numpy.floor(idx).astype(int), 0,
+                        numpy.maximum(dims - 2, 0))
+        f = numpy.clip(idx - i0, 0.0, 1.0)
+        i1 = numpy.minimum(i0 + 1, dims - 1)
+
+        result = 0.0
+        for zi, zw in ((i0[:, 2], 1.0 - f[:, 2]), (i1[:, 2], f[:, 2])):
+            for yi, yw in ((i0[:, 1], 1.0 - f[:, 1]), (i1[:, 1], f[:, 1])):
+                for xi, xw in ((i0[:, 0], 1.0 - f[:, 0]),
+                               (i1[:, 0], f[:, 0])):
+                    w = (zw * yw * xw)[:, numpy.newaxis]
+                    result = result + w * array[zi, yi, xi]
+        return result
+
+    def _SampleCubic(self, array, idx, dims):
+        # Catmull-Rom cubic, the same kernel as vtkImageReslice
+        i0 = numpy.floor(idx).astype(int)
+        f = idx - i0
+        f2 = f * f
+        f3 = f2 * f
+        weights = (-0.5 * f3 + f2 - 0.5 * f,
+                   1.5 * f3 - 2.5 * f2 + 1.0,
+                   -1.5 * f3 + 2.0 * f2 + 0.5 * f,
+                   0.5 * f3 - 0.5 * f2)
+        indices = [numpy.clip(i0 + k - 1, 0, dims - 1) for k in range(4)]
+
+        result = 0.0
+        for kz in range(4):
+            zi = indices[kz][:, 2]
+            zw = weights[kz][:, 2]
+            for ky in range(4):
+                yi = indices[ky][:, 1]
+                yw = zw * weights[ky][:, 1]
+                for kx in range(4):
+                    w = (yw * weights[kx][:, 0])[:, numpy.newaxis]
+                    result = result + w * array[zi, yi, indices[kx][:, 0]]
+        return result
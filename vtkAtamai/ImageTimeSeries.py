@@ -0,0 +1,188 @@
+# =========================================================================
+#
+# Copyright (c) 2000 Atamai, Inc.
+#
+# Use, modification and redistribution of the software, in source or
+# binary forms, are permitted provided that the following terms and
+# conditions are met:
+#
+# 1) Redistribution of the source code, in verbatim or modified
+#    form, must retain the above copyright notice, this license,
+#    the following disclaimer, and any notices that refer to this
+#    license and/or the following disclaimer.
+#
+# 2) Redistribution in binary form must include the above copyright
+#    notice, a copy of this license and the following disclaimer
+#    in the documentation or with other materials provided with the
+#    distribution.
+#
+# 3) Modified copies of the source code must be clearly marked as such,
+#    and must not be misrepresented as verbatim copies of the source code.
+#
+# THE COPYRIGHT HOLDERS AND/OR OTHER PARTIES PROVIDE THE SOFTWARE "AS IS"
+# WITHOUT EXPRESSED OR IMPLIED WARRANTY INCLUDING, BUT NOT LIMITED TO,
+# THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR
+# PURPOSE.  IN NO EVENT SHALL ANY COPYRIGHT HOLDER OR OTHER PARTY WHO MAY
+# MODIFY AND/OR REDISTRIBUTE THE SOFTWARE UNDER THE TERMS OF THIS LICENSE
+# BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL OR CONSEQUENTIAL DAMAGES
+# (INCLUDING, BUT NOT LIMITED TO, LOSS OF DATA OR DATA BECOMING INACCURATE
+# OR LOSS OF PROFIT OR BUSINESS INTERRUPTION) ARISING IN ANY WAY OUT OF
+# THE USE OR INABILITY TO USE THE SOFTWARE, EVEN IF ADVISED OF THE
+# POSSIBILITY OF SUCH DAMAGES.
+#
+# =========================================================================
+
+#
+# This file represents a derivative work by Parallax Innovations Inc.
+#
+
+"""
+ImageTimeSeries - a 4D image, i.e. a series of volumes with one geometry
+
+  The ImageTimeSeries holds a list of vtkImageData frames that share
+  the same extent, spacing, origin and scalar type, for example the
+  phases of a cardiac series or the time points of a perfusion scan.
+  Its output is a single vtkImageData that can be given to any number
+  of ImagePanes, SlicePlaneFactories and VolumeFactories.
+
+  Changing the time index does not copy any data and does not change
+  the geometry of the output: the scalar array of the new frame is
+  simply placed in the output.  Because the geometry stays the same,
+  the views keep their zoom, pan and slice position.
+
+  Frames are double-buffered: after frame t is shown, frame t+1 is
+  brought up to date by the PaneFrame scheduler while the application
+  is idle, so that switching to it only costs a render.  All views
+  of the series are switched in a single render of all PaneFrames.
+
+Public Methods:
+
+  AddFrame(*image*)            -- append a vtkImageData to the series
+
+  GetNumberOfFrames()          -- number of time points
+
+  GetFrame(*t*)                -- get the vtkImageData for time point *t*
+
+  GetOutput()                  -- get the vtkImageData for the views
+
+  SetTimeIndex(*t*)            -- show time point *t* in all views
+
+  GetTimeIndex()               -- get the time point that is shown
+
+  PrepareTimeIndex(*t*)        -- bring frame *t* up to date now
+
+  PrepareTimeIndexLater(*t*)   -- bring frame *t* up to date when idle
+
+  Render()                     -- render all views at once
+
+"""
+
+#======================================
+import vtk
+import PaneFrame
+
+#======================================
+
+
+class ImageTimeSeries(object):
+
+    def __init__(self, frames=()):
+        self._Frames = []
+        self._TimeIndex = None
+        self._Geometry = None
+        self._PrepareId = None
+        self._Output = vtk.vtkImageData()
+
+        for frame in frames:
+            self.AddFrame(frame)
+
+    def AddFrame(self, image):
+        self._Frames.append(image)
+        if self._TimeIndex is None:
+            self.SetTimeIndex(0)
+
+    def GetNumberOfFrames(self):
+        return len(self._Frames)
+
+    def GetFrame(self, t):
+        return self._Frames[t]
+
+    def GetOutput(self):
+        return self._Output
+
+    def GetTimeIndex(self):
+        return self._TimeIndex
+
+    def SetTimeIndex(self, t):
+        """Put the scalars of frame *t* into the output.
+
+        The views are not rendered, call Render() afterwards (this
+        allows several series to be switched in the same render).
+        """
+        n = len(self._Frames)
+        if n == 0:
+            raise IndexError("time series has no frames")
+        t = t % n
+        frame = self.PrepareTimeIndex(t)
+        scalars = frame.GetPointData().GetScalars()
+
+        if self._Output.GetPointData().GetScalars() is not scalars:
+            self._Output.GetPointData().SetScalars(scalars)
+            self._Output.Modified()
+        self._TimeIndex = t
+
+        # double-buffering: get the next frame ready while this one
+        # is displayed
+        if n > 1:
+            self.PrepareTimeIndexLater((t + 1) % n)
+
+    def PrepareTimeIndex(self, t):
+        """Update frame *t*, and check that it matches the series."""
+        frame = self._Frames[t]
+        # VTK-6
+        if vtk.vtkVersion().GetVTKMajorVersion() <= 5:
+            frame.UpdateInformation()
+            frame.SetUpdateExtentToWholeExtent()
+            frame.Update()
+
+        scalars = frame.GetPointData().GetScalars()
+        geometry = (frame.GetExtent(), frame.GetSpacing(), frame.GetOrigin(),
+                    scalars.GetDataType(), scalars.GetNumberOfComponents())
+        if self._Geometry is None:
+            self._SetOutputGeometry(frame)
+            self._Geometry = geometry
+        elif geometry != self._Geometry:
+            raise ValueError("frame %d of time series does not match the "
+                             "geometry of the other frames" % t)
+
+        return frame
+
+    def PrepareTimeIndexLater(self, t):
+        frames = PaneFrame.PaneFrame.AllPaneFrames
+        if not frames:
+            return
+        if self._PrepareId is not None:
+            frames[0].UnSchedule(self._PrepareId)
+        self._PrepareId = frames[0].ScheduleOnce(
+            0, lambda: self._PrepareLater(t))
+
+    def _PrepareLater(self, t):
+        self._PrepareId = None
+        if t < len(self._Frames):
+            self.PrepareTimeIndex(t)
+
+    def _SetOutputGeometry(self, frame):
+        output = self._Output
+        output.SetExtent(frame.GetExtent())
+        output.SetSpacing(frame.GetSpacing())
+        output.SetOrigin(frame.GetOrigin())
+        # VTK-6
+        if vtk.vtkVersion().GetVTKMajorVersion() <= 5:
+            output.SetWholeExtent(frame.GetExtent())
+            output.SetScalarType(frame.GetScalarType())
+            output.SetNumberOfScalarComponents(
+                frame.GetNumberOfScalarComponents())
+
+    def Render(self):
+        """Render every PaneFrame once, and swap all buffers together."""
+        PaneFrame.RenderAll()
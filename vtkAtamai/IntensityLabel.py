@@ -88,6 +88,8 @@ Public Methods:
 """
 
 from vtkAtamai.Label import *
+from vtkAtamai.ImageSampler import ImageSampler
+import math
 import vtk
 
 if "FreeType" in vtk.vtkTextMapper().GetClassName():
@@ -122,22 +124,26 @@ class IntensityLabel(Label):
 
         self._Input = None
 
-        self._Reslice = vtk.vtkImageReslice()
-        self._Reslice.SetOutputExtent(0, 0, 0, 0, 0, 0)
-        self._Reslice.SetInterpolationModeToLinear()
+        # sample the image directly, rather than executing a
+        # vtkImageReslice for every cursor motion
+        self._Sampler = ImageSampler()
+        self._Sampler.SetInterpolationModeToLinear()
 
     def SetInterpolate(self, interpolation):
-        self._Reslice.SetInterpolate(interpolation)
+        if interpolation:
+            self._Sampler.SetInterpolationModeToLinear()
+        else:
+            self._Sampler.SetInterpolationModeToNearestNeighbor()
 
     def GetInterpolate(self):
-        return self._Reslice.GetInterpolate()
+        return int(self._Sampler.GetInterpolationMode() != 0)
 
     def GetInterpolation(self):
-        return self._reslice.GetInterpolation()
+        return self._Sampler.GetInterpolationMode()
 
     def SetInput(self, input):
         self._Input = input
-        self._Reslice.SetInput(input)
+        self._Sampler.SetInput(input)
 
     def GetInput(self):
         return self._Input
@@ -170,16 +176,14 @@ class IntensityLabel(Label):
         if self._Transform:
             x, y, z = self._Transform.TransformPoint(x, y, z)
 
-        self._Reslice.SetOutputOrigin(x, y, z)
-        self._Reslice.GetOutput().SetUpdateExtent(0, 0, 0, 0, 0, 0)
-        self._Reslice.GetOutput().Update()
+        if self._Input is None:
+            return
 
-        try:
-            val = self._Reslice.GetOutput().GetScalarComponentAsDouble(
-                0, 0, 0, 0)
-        except AttributeError:
-            val = self._Reslice.GetOutput().GetScalarComponentAsFloat(
-                0, 0, 0, 0)
+        val = self._Sampler.Sample((x, y, z))[0, 0]
+
+        # round like vtkImageReslice does for integer images
+        if self._Input.GetScalarType() not in (vtk.VTK_FLOAT, vtk.VTK_DOUBLE):
+            val = math.floor(val + 0.5)
 
         val = val * self._Scale + self._Shift
 
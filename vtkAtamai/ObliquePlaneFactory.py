@@ -236,9 +236,13 @@ class ObliquePlaneFactory(ActorFactory):
         else:
             pass
 
+        # reslice at the interactive level of detail until the action ends
+        self._Plane.SetInteractive(1)
+
         self.Modified()
 
     def DoEndAction(self, event):
+        self._Plane.SetInteractive(0)
         self._Plane.DoEndAction(event)
 
         # Make Plane Outline Invisible
@@ -127,6 +127,24 @@ Interpolation:
     SetTextureInterpolate(*boolean*) -- interpolate when texture mapping
                                         (default on)
 
+Interactive level of detail (see SlicePlaneFactory):
+
+    SetInteractiveLOD(*boolean*)   -- reslice coarsely while planes move
+
+    SetInteractiveFrameRate(*fps*) -- frame rate that the coarsening factor
+                                      is adapted to
+
+Thick slabs (see SlicePlaneFactory):
+
+    SetSlabThickness(*mm*)         -- slab thickness for all three planes
+
+    SetSlabMode(*mode*)            -- 'Max', 'Min' or 'Mean'
+
+    SetSlabSampleSpacing(*mm*)     -- distance between samples across the
+                                      slab
+
+    SetSlabInteractiveFactor(*f*)  -- coarser sampling while interacting
+
   Access the slice planes individually:
 
     GetPlanes()              -- get a list of three SlicePlaneFactories
@@ -227,6 +245,11 @@ class OrthoPlanesFactory(ActorFactory.ActorFactory):
         if self._Plane is None:
             return
 
+        # spin and rotate move all three planes, so all of them use
+        # the interactive level of detail until the action ends
+        for plane in self._Planes:
+            plane.SetInteractive(1)
+
         self._PlaneGuides.SetPlane(self._Plane)
         self._PlaneGuides.SetVisibility(1)
 
@@ -309,6 +332,9 @@ class OrthoPlanesFactory(ActorFactory.ActorFactory):
             self._Plane.DoEndAction(event)
             self._Plane = None
 
+        for plane in self._Planes:
+            plane.SetInteractive(0)
+
         self.__UserAction = None
         self.__RotateAxis = None
         self.__RadiusVector = None
@@ -675,6 +701,66 @@ class OrthoPlanesFactory(ActorFactory.ActorFactory):
     def TextureInterpolateOff(self):
         self.SetTextureInterpolate(0)
 
+    def SetInteractiveLOD(self, val):
+        for plane in self._Planes:
+            plane.SetInteractiveLOD(val)
+
+    def GetInteractiveLOD(self):
+        return self._Planes[0].GetInteractiveLOD()
+
+    def InteractiveLODOn(self):
+        self.SetInteractiveLOD(1)
+
+    def InteractiveLODOff(self):
+        self.SetInteractiveLOD(0)
+
+    def SetInteractiveFrameRate(self, fps):
+        for plane in self._Planes:
+            plane.SetInteractiveFrameRate(fps)
+
+    def GetInteractiveFrameRate(self):
+        return self._Planes[0].GetInteractiveFrameRate()
+
+    def SetSlabThickness(self, thickness):
+        for plane in self._Planes:
+            plane.SetSlabThickness(thickness)
+        self.Modified()
+
+    def GetSlabThickness(self):
+        return self._Planes[0].GetSlabThickness()
+
+    def SetSlabMode(self, mode):
+        for plane in self._Planes:
+            plane.SetSlabMode(mode)
+        self.Modified()
+
+    def SetSlabModeToMax(self):
+        self.SetSlabMode('Max')
+
+    def SetSlabModeToMin(self):
+        self.SetSlabMode('Min')
+
+    def SetSlabModeToMean(self):
+        self.SetSlabMode('Mean')
+
+    def GetSlabMode(self):
+        return self._Planes[0].GetSlabMode()
+
+    def SetSlabSampleSpacing(self, spacing):
+        for plane in self._Planes:
+            plane.SetSlabSampleSpacing(spacing)
+        self.Modified()
+
+    def GetSlabSampleSpacing(self):
+        return self._Planes[0].GetSlabSampleSpacing()
+
+    def SetSlabInteractiveFactor(self, factor):
+        for plane in self._Planes:
+            plane.SetSlabInteractiveFactor(factor)
+
+    def GetSlabInteractiveFactor(self):
+        return self._Planes[0].GetSlabInteractiveFactor()
+
     def GetPlaneEquations(self):
         planes = vtk.vtkPlaneCollection()
         for plane in self._Planes:
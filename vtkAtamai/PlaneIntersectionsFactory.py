@@ -61,6 +61,11 @@ PlaneIntersectionsFactory - draw lines at the plane intersections
   This factory is meant to be used with a set of SlicePlaneFactories.
   It generates a set of lines at the intersections of the planes.
 
+  Any number of planes can be used.  The segment where two planes
+  overlap is computed in closed form from the corners of the planes,
+  and all of the segments are written into a single vtkPolyData whose
+  size only changes when SetPlanes() is called.
+
 Derived From:
 
   ActorFactory
@@ -79,6 +84,8 @@ Public Methods:
 
   GetPlanes()         -- get the planes
 
+  GetPolyData()       -- get the intersection lines
+
   SetColor(*color*)  -- specify the color of the lines in RGB
 
   GetColor()         -- get the color
@@ -87,7 +94,91 @@ Public Methods:
 
 #======================================
 from ActorFactory import *
-import math
+
+
+#======================================
+def _Dot(a, b):
+    return a[0] * b[0] + a[1] * b[1] + a[2] * b[2]
+
+
+def _Cross(a, b):
+    return (a[1] * b[2] - a[2] * b[1],
+            a[2] * b[0] - a[0] * b[2],
+            a[0] * b[1] - a[1] * b[0])
+
+
+def _ClipLineToQuad(point, direction, quad, interval):
+    """Restrict the line point + l*direction to a parallelogram.
+
+    The *quad* is given as (origin, vector1, vector2), and *interval*
+    is the (lmin, lmax) range of l that is allowed so far.  The
+    result is the new range, or None if it is empty.
+    """
+    o, u, v = quad
+    uu = _Dot(u, u)
+    uv = _Dot(u, v)
+    vv = _Dot(v, v)
+    det = uu * vv - uv * uv
+    if det == 0:
+        return None
+
+    # the (s,t) coords of the line in the quad are linear in l
+    w = (point[0] - o[0], point[1] - o[1], point[2] - o[2])
+    wu = _Dot(w, u)
+    wv = _Dot(w, v)
+    du = _Dot(direction, u)
+    dv = _Dot(direction, v)
+    coeffs = (((vv * wu - uv * wv) / det, (vv * du - uv * dv) / det),
+              ((uu * wv - uv * wu) / det, (uu * dv - uv * du) / det))
+
+    lmin, lmax = interval
+    for a, b in coeffs:
+        # require 0 <= a + b*l <= 1
+        if abs(b) < 1e-12:
+            if a < -1e-9 or a > 1 + 1e-9:
+                return None
+            continue
+        l0 = -a / b
+        l1 = (1.0 - a) / b
+        if l0 > l1:
+            l0, l1 = l1, l0
+        lmin = max(lmin, l0)
+        lmax = min(lmax, l1)
+        if lmin > lmax:
+            return None
+
+    return (lmin, lmax)
+
+
+def _IntersectQuads(quad1, quad2):
+    """Get the segment where two parallelograms intersect, or None."""
+    n1 = _Cross(quad1[1], quad1[2])
+    n2 = _Cross(quad2[1], quad2[2])
+    direction = _Cross(n1, n2)
+    dd = _Dot(direction, direction)
+    if dd < 1e-12 * _Dot(n1, n1) * _Dot(n2, n2):
+        # the planes are parallel
+        return None
+
+    # a point that lies on both planes
+    h1 = _Dot(n1, quad1[0])
+    h2 = _Dot(n2, quad2[0])
+    n12 = _Dot(n1, n2)
+    a = (h1 * _Dot(n2, n2) - h2 * n12) / dd
+    b = (h2 * _Dot(n1, n1) - h1 * n12) / dd
+    point = (a * n1[0] + b * n2[0],
+             a * n1[1] + b * n2[1],
+             a * n1[2] + b * n2[2])
+
+    interval = (-1e300, 1e300)
+    for quad in (quad1, quad2):
+        interval = _ClipLineToQuad(point, direction, quad, interval)
+        if interval is None:
+            return None
+
+    return [(point[0] + l * direction[0],
+             point[1] + l * direction[1],
+             point[2] + l * direction[2]) for l in interval]
 
 
 #======================================
@@ -101,9 +192,17 @@ class PlaneIntersectionsFactory(ActorFactory):
         self._Property.SetAmbient(1.0)
 
         self._Planes = []
-        self._Cutters = []
 
-        self._Append = vtk.vtkAppendPolyData()
+        # corners of the planes at the time of the last update
+        self._PlaneQuads = None
+
+        # one line cell per pair of planes, pairs that do not intersect
+        # get a zero-length line
+        self._Points = vtk.vtkPoints()
+        self._Lines = vtk.vtkCellArray()
+        self._PolyData = vtk.vtkPolyData()
+        self._PolyData.SetPoints(self._Points)
+        self._PolyData.SetLines(self._Lines)
 
     def SetColor(self, *args):
         apply(self._Property.SetColor, args)
@@ -123,20 +222,50 @@ class PlaneIntersectionsFactory(ActorFactory):
 
     def SetPlanes(self, planes):
         self._Planes = list(planes)
-        planes = list(planes)
-        done = []
 
-        for cutter in self._Cutters:
-            self._Append.RemoveInput(cutter.GetOutput())
+        n = len(self._Planes)
+        npairs = n * (n - 1) // 2
+        self._Points.SetNumberOfPoints(2 * npairs)
+        for k in range(2 * npairs):
+            self._Points.SetPoint(k, 0.0, 0.0, 0.0)
 
-        self._Cutters = []
-        for i in range(len(self._Planes)):
-            for j in range(i + 1, len(self._Planes)):
-                cutter = vtk.vtkCutter()
-                cutter.SetInput(self._Planes[i].GetPolyData())
-                cutter.SetCutFunction(self._Planes[j].GetPlaneEquation())
-                self._Cutters.append(cutter)
-                self._Append.AddInput(cutter.GetOutput())
+        self._Lines.Initialize()
+        for k in range(npairs):
+            self._Lines.InsertNextCell(2)
+            self._Lines.InsertCellPoint(2 * k)
+            self._Lines.InsertCellPoint(2 * k + 1)
+
+        self._PlaneQuads = None
+        self._UpdateIntersections()
+        self.Modified()
+
+    def _UpdateIntersections(self):
+        quads = []
+        for plane in self._Planes:
+            o = plane.GetOrigin()
+            p1 = plane.GetPoint1()
+            p2 = plane.GetPoint2()
+            quads.append((o, (p1[0] - o[0], p1[1] - o[1], p1[2] - o[2]),
+                          (p2[0] - o[0], p2[1] - o[1], p2[2] - o[2])))
+        if quads == self._PlaneQuads:
+            return
+        self._PlaneQuads = quads
+
+        points = self._Points
+        k = 0
+        for i in range(len(quads)):
+            for j in range(i + 1, len(quads)):
+                segment = _IntersectQuads(quads[i], quads[j])
+                if segment is None:
+                    segment = (quads[i][0], quads[i][0])
+                points.SetPoint(k, segment[0])
+                points.SetPoint(k + 1, segment[1])
+                k = k + 2
+        points.Modified()
+        self._PolyData.Modified()
+
+    def GetPolyData(self):
+        return self._PolyData
 
     def GetPlanes(self):
         return self._Planes
@@ -156,21 +285,17 @@ class PlaneIntersectionsFactory(ActorFactory):
 
     def AddToRenderer(self, ren):
         ActorFactory.AddToRenderer(self, ren)
-        try:
-            ren.AddObserver('StartEvent', self.OnRenderEvent)
-        except:
-            pass
+        self.AddRendererObserver(ren, 'StartEvent', self.OnRenderEvent)
 
     def OnRenderEvent(self, ren, event):
-        camera = ren.GetActiveCamera()
-        v = camera.GetViewPlaneNormal()
+        self._UpdateIntersections()
 
-        if camera.GetParallelProjection():
-            d = camera.GetParallelScale() / 100
-        else:
-            d = camera.GetDistance() * \
-                math.sin(camera.GetViewAngle() / 360.0 * math.pi) / \
-                100
+        if not self._HasViewChanged(ren, self._Transform.GetMTime()):
+            return
+
+        state = self.GetCameraState(ren)
+        v = state.GetViewPlaneNormal()
+        d = state.GetWorldSize() / 100
 
         v = self._Transform.GetInverse().TransformVector(
             v[0] * d, v[1] * d, v[2] * d)
@@ -181,7 +306,11 @@ class PlaneIntersectionsFactory(ActorFactory):
         actors = []
 
         mapper = vtk.vtkPolyDataMapper()
-        mapper.SetInputConnection(self._Append.GetOutputPort())
+        # VTK-6
+        if vtk.vtkVersion().GetVTKMajorVersion() > 5:
+            mapper.SetInputData(self._PolyData)
+        else:
+            mapper.SetInput(self._PolyData)
         actor = self._NewActor()
         actor.SetProperty(self._Property)
         actor.SetMapper(mapper)
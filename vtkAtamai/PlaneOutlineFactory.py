@@ -141,10 +141,7 @@ class PlaneOutlineFactory(ActorFactory):
 
     def AddToRenderer(self, ren):
         ActorFactory.AddToRenderer(self, ren)
-        try:
-            ren.AddObserver('StartEvent', self.OnRenderEvent)
-        except:
-            pass
+        self.AddRendererObserver(ren, 'StartEvent', self.OnRenderEvent)
 
     def OnRenderEvent(self, ren, event):
         if self._Property.GetOpacity() == 0.0:
@@ -370,7 +370,7 @@ class RulerFactory(ActorFactory):
     def AddToRenderer(self, renderer):
         ActorFactory.AddToRenderer(self, renderer)
         self.PutAsideRuler(renderer)
-        renderer.AddObserver('StartEvent', self.OnRenderEvent)
+        self.AddRendererObserver(renderer, 'StartEvent', self.OnRenderEvent)
 
     def OnRenderEvent(self, renderer, event):
         # Update scale for cones
@@ -378,16 +378,13 @@ class RulerFactory(ActorFactory):
         x = matrix.GetElement(0, 3)
         y = matrix.GetElement(1, 3)
         z = matrix.GetElement(2, 3)
-        camera = renderer.GetActiveCamera()
-        if camera.GetParallelProjection():
-            worldsize = camera.GetParallelScale()
-        else:
-            cx, cy, cz = camera.GetPosition()
-            worldsize = math.sqrt((x - cx) ** 2 + (y - cy) ** 2 +
-                                  (z - cz) ** 2) * \
-                math.tan(0.5 * camera.GetViewAngle() / 57.296)
-        pitch = worldsize / math.sqrt(renderer.GetSize()[0] *
-                                      renderer.GetSize()[1])
+        if not self._HasViewChanged(renderer, x, y, z):
+            return
+        state = self.GetCameraState(renderer)
+        width, height = state.GetSize()
+        if width <= 0 or height <= 0:
+            return
+        pitch = state.GetWorldSize((x, y, z)) / math.sqrt(width * height)
         # self._ConePitch = pitch
 
         for child in self.GetChildren():
@@ -66,6 +66,10 @@ SlicePlaneFactory - provides a slice view through a 3D image
   Also, the ImageTransform for each input specifies a transformation
   to apply to the image before it is texture mapped onto the planes.
   This transformation can be a linear or nonlinear transformation.
+  A nonlinear transformation is sampled once over the whole volume by
+  a DeformationField that is shared with the other factories, so that
+  moving the plane does not require the transformation to be evaluated
+  again.
 
 Derived From:
 
@@ -93,6 +97,12 @@ Public Methods:
 
     GetNumberOfInputs()           -- current number of inputs
 
+    SetTimeSeries(*series*,*i*=0) -- slice through an ImageTimeSeries,
+                                     the geometry is kept when the time
+                                     index of the series changes
+
+    GetTimeSeries(*i*=0)          -- get the time series for input *i*
+
     SetVolumeBounds(*xl*,*xh*,*yl*,*yh*,*zl*,*zh*) -- specify the bounds
                       of the data set (if not specified, the bounds of
                       the first Input will be used)
@@ -135,9 +145,52 @@ Public Methods:
 
     SetSliceInterpolate(*boolean*) -- interpolate while resampling (default on)
 
+    SetUseImagePyramid(*boolean*) -- when zoomed out, reslice from averaged,
+                                     reduced-resolution copies of the inputs
+                                     (default off)
+
     SetTextureInterpolate(*boolean*) -- interpolate when texture mapping
                                         (default on)
 
+    SetTextureSizeMode(*mode*)    -- 'PowerOfTwo' pads the resliced images
+                                     to a power of two, 'Exact' reslices
+                                     only the plane itself, and 'Auto'
+                                     (the default) uses 'Exact' if the
+                                     OpenGL driver supports non-power-of-two
+                                     textures
+
+  Thick slabs:
+
+    SetSlabThickness(*mm*)        -- combine the image over a slab of this
+                                     thickness, centered on the plane
+                                     (default 0, i.e. a thin slice)
+
+    SetSlabMode(*mode*)           -- 'Max', 'Min' or 'Mean' for MIP, MinIP
+                                     or an average (default 'Max')
+
+    SetSlabSampleSpacing(*mm*)    -- distance between samples across the
+                                     slab (default None, i.e. the smallest
+                                     voxel spacing of each input)
+
+    SetSlabInteractiveFactor(*f*) -- while the plane is interactive, the
+                                     slab is sampled *f* times more
+                                     coarsely (default 4)
+
+  Interactive level of detail:
+
+    SetInteractive(*boolean*)     -- set while the plane is being moved,
+                                     this is done by DoStartAction() and
+                                     DoEndAction()
+
+    SetInteractiveLOD(*boolean*)  -- while interactive, reslice at a coarser
+                                     spacing with nearest-neighbor
+                                     interpolation (default on)
+
+    SetInteractiveFrameRate(*fps*) -- the coarsening factor is adapted to
+                                     the measured reslice time so that
+                                     reslicing takes at most half of each
+                                     frame at this rate (default 15)
+
   Use a canonical slice orientation:
 
     SetPlaneOrientationToYZ() -- sagittal
@@ -199,11 +252,29 @@ Public Methods:
 #======================================
 import ActorFactory
 import OutlineFactory
+import ImagePyramid
+import DeformationField
 from ImagePane import ImagePane
 import math
+import time
 import vtk
 import logging
 
+
+def _SupportsNPOTTextures(window):
+    """Check whether a render window can use non-power-of-two textures.
+
+    This requires a current OpenGL context, i.e. it must be called
+    while the window is rendering.
+    """
+    try:
+        manager = vtk.vtkOpenGLExtensionManager()
+    except AttributeError:
+        return 0
+    manager.SetRenderWindow(window)
+    return (manager.ExtensionSupported('GL_VERSION_2_0') or
+            manager.ExtensionSupported('GL_ARB_texture_non_power_of_two'))
+
 #======================================
 
 
@@ -216,10 +287,12 @@ class SlicePlaneFactory(ActorFactory.ActorFactory):
 
         # the following are required for each input
         self._Inputs = {}
+        self._TimeSeries = {}
         self._ImageReslicers = {}
         self._ResliceTransforms = {}
         self._ImageTransforms = {}
         self._TransformGrids = {}
+        self._DeformationFields = {}
         self._TextureCoords = {}
         self._LookupTables = {}
         self._Properties = {}
@@ -250,6 +323,34 @@ class SlicePlaneFactory(ActorFactory.ActorFactory):
         self._SliceInterpolate = 1
         self._TextureInterpolate = 1
 
+        # whether to pad the textures to a power of two, in 'Auto' mode
+        # this is decided at the first render (None means unknown)
+        self._TextureSizeMode = 'Auto'
+        self._NPOTSupported = None
+
+        # while the plane is interactive (i.e. being dragged), the
+        # reslice spacing is multiplied by self._LODFactor, which is
+        # adapted to the time measured for the previous reslice
+        self._Interactive = 0
+        self._InteractiveLOD = 1
+        self._InteractiveFrameRate = 15.0
+        self._LODFactor = 1.0
+        self._ResliceStartTime = 0.0
+        self._ResliceTime = 0.0
+
+        # thick slab settings, the slab is sampled more coarsely while
+        # the plane is interactive
+        self._SlabThickness = 0.0
+        self._SlabMode = 'Max'
+        self._SlabSampleSpacing = None
+        self._SlabInteractiveFactor = 4.0
+
+        # shared reduced-resolution copies of the inputs, and the level
+        # that is currently resliced for each input
+        self._UseImagePyramid = 0
+        self._ImagePyramids = {}
+        self._ImagePyramidLevels = {}
+
         self._DisablePushAction = 0
         self._RestrictPlaneToVolume = 0
         self._VolumeBounds = None
@@ -489,7 +590,6 @@ class SlicePlaneFactory(ActorFactory.ActorFactory):
         # JDG: changed reslice from a basic image reslice object
         # to one that has MIP capabilities
         reslice = vtk.vtkImageSlabReslice()
-        reslice.SetSlabThickness(0.0)
 
         reslice.SetResliceTransform(resliceTransform)
         if self._SliceInterpolate:
@@ -497,6 +597,8 @@ class SlicePlaneFactory(ActorFactory.ActorFactory):
         else:
             reslice.SetInterpolationModeToNearestNeighbor()
         reslice.SetOptimization(2)
+        reslice.AddObserver('StartEvent', self._OnResliceStart)
+        reslice.AddObserver('EndEvent', self._OnResliceEnd)
 
         # VTK-6
         if vtk.vtkVersion().GetVTKMajorVersion() > 5:
@@ -534,8 +636,14 @@ class SlicePlaneFactory(ActorFactory.ActorFactory):
         self._ImagePostClips[name] = None
         self._ImageTransforms[name] = None
         self._TransformGrids[name] = None
+        self._DeformationFields[name] = None
         self._ClippingPlanes[name] = None
 
+        if self._UseImagePyramid:
+            self._AcquireImagePyramid(name)
+
+        self._UpdateSlabReslice(name)
+
         actors = self._ActorDict
         for renderer in self._Renderers:
             actor = self._NewActor(name)
@@ -552,6 +660,9 @@ class SlicePlaneFactory(ActorFactory.ActorFactory):
 
     def RemoveInput(self, name=0):
 
+        self._ReleaseImagePyramid(name)
+        self._ReleaseDeformationField(name)
+
         actors = self._ActorDict
         for renderer in self._Renderers:
 
@@ -568,6 +679,8 @@ class SlicePlaneFactory(ActorFactory.ActorFactory):
                         break
 
         del self._Inputs[name]
+        if name in self._TimeSeries:
+            del self._TimeSeries[name]
         del self._ImageReslicers[name]
         del self._ResliceTransforms[name]
         del self._ImageMapToColors[name]
@@ -578,6 +691,7 @@ class SlicePlaneFactory(ActorFactory.ActorFactory):
         del self._ImagePostClips[name]
         del self._ImageTransforms[name]
         del self._TransformGrids[name]
+        del self._DeformationFields[name]
         del self._ClippingPlanes[name]
 
         self.Modified()
@@ -593,6 +707,8 @@ class SlicePlaneFactory(ActorFactory.ActorFactory):
             self.AddInputData(image_data, name)
             return
 
+        self._ReleaseImagePyramid(name)
+        field = self._DeformationFields[name]
         self._Inputs[name] = image_data
 
         # VTK-6
@@ -601,6 +717,17 @@ class SlicePlaneFactory(ActorFactory.ActorFactory):
         else:
             self._ImageReslicers[name].SetInput(image_data)
 
+        if self._UseImagePyramid:
+            self._AcquireImagePyramid(name)
+
+        # the deformation field must cover the new image
+        if field and field.GetInput() is not image_data:
+            trans = self._ImageTransforms[name]
+            self._ImageTransforms[name] = None
+            self.SetImageTransform(trans, name)
+
+        self._UpdateSlabReslice(name)
+
         # self.OnExecuteInformation(self._ImageMapToColors[name])
         self._UpdateNormal()
         self._UpdateOrigin()
@@ -613,6 +740,18 @@ class SlicePlaneFactory(ActorFactory.ActorFactory):
         else:
             return None
 
+    def SetTimeSeries(self, series, name=0):
+        """Slice through the output of an ImageTimeSeries"""
+        self._TimeSeries[name] = series
+        self.SetInputData(series.GetOutput(), name)
+
+    def GetTimeSeries(self, name=0):
+        """Returns the ImageTimeSeries associated with this slice plane"""
+        series = self._TimeSeries.get(name)
+        if series and series.GetOutput() is not self.GetInput(name):
+            return None
+        return series
+
     def GetInputConnection(self, name=0):
         import pdb
         pdb.set_trace()
@@ -660,7 +799,11 @@ class SlicePlaneFactory(ActorFactory.ActorFactory):
 
     def SetSliceInterpolate(self, val):
         self._SliceInterpolate = val
-        if val:
+        self._UpdateInterpolation()
+
+    def _UpdateInterpolation(self):
+        if self._SliceInterpolate and not \
+                (self._Interactive and self._InteractiveLOD):
             for name in self._ImageReslicers:
                 reslice = self._ImageReslicers[name]
                 reslice.SetInterpolationModeToLinear()
@@ -679,6 +822,260 @@ class SlicePlaneFactory(ActorFactory.ActorFactory):
     def SliceInterpolateOff(self):
         self.SetSliceInterpolate(0)
 
+    def SetTextureSizeMode(self, mode):
+        if mode not in ('Auto', 'PowerOfTwo', 'Exact'):
+            raise ValueError("unknown texture size mode " + repr(mode))
+        self._TextureSizeMode = mode
+        self._UpdateNormal()
+
+    def SetTextureSizeModeToAuto(self):
+        self.SetTextureSizeMode('Auto')
+
+    def SetTextureSizeModeToPowerOfTwo(self):
+        self.SetTextureSizeMode('PowerOfTwo')
+
+    def SetTextureSizeModeToExact(self):
+        self.SetTextureSizeMode('Exact')
+
+    def GetTextureSizeMode(self):
+        return self._TextureSizeMode
+
+    def _UsePowerOfTwoTextures(self):
+        if self._TextureSizeMode == 'Auto':
+            return not self._NPOTSupported
+        return (self._TextureSizeMode == 'PowerOfTwo')
+
+    def SetSlabThickness(self, thickness):
+        self._SlabThickness = max(float(thickness), 0.0)
+        self._UpdateSlab()
+
+    def GetSlabThickness(self):
+        return self._SlabThickness
+
+    def SetSlabMode(self, mode):
+        if mode not in ('Max', 'Min', 'Mean'):
+            raise ValueError("unknown slab mode " + repr(mode))
+        self._SlabMode = mode
+        self._UpdateSlab()
+
+    def SetSlabModeToMax(self):
+        self.SetSlabMode('Max')
+
+    def SetSlabModeToMin(self):
+        self.SetSlabMode('Min')
+
+    def SetSlabModeToMean(self):
+        self.SetSlabMode('Mean')
+
+    def GetSlabMode(self):
+        return self._SlabMode
+
+    def SetSlabSampleSpacing(self, spacing):
+        self._SlabSampleSpacing = spacing
+        self._UpdateSlab()
+
+    def GetSlabSampleSpacing(self):
+        return self._SlabSampleSpacing
+
+    def SetSlabInteractiveFactor(self, factor):
+        self._SlabInteractiveFactor = max(float(factor), 1.0)
+        if self._Interactive:
+            self._UpdateSlab()
+
+    def GetSlabInteractiveFactor(self):
+        return self._SlabInteractiveFactor
+
+    def SetInteractive(self, val):
+        """Use the interactive level of detail while the plane moves."""
+        if val == self._Interactive:
+            return
+        self._Interactive = val
+        self._ResliceTime = 0.0
+        self._UpdateInterpolation()
+        if self._InteractiveLOD:
+            self._UpdateNormal()
+        if self._SlabThickness > 0:
+            self._UpdateSlab()
+
+    def GetInteractive(self):
+        return self._Interactive
+
+    def SetInteractiveLOD(self, val):
+        self._InteractiveLOD = val
+        if self._Interactive:
+            self._UpdateInterpolation()
+            self._UpdateNormal()
+
+    def GetInteractiveLOD(self):
+        return self._InteractiveLOD
+
+    def InteractiveLODOn(self):
+        self.SetInteractiveLOD(1)
+
+    def InteractiveLODOff(self):
+        self.SetInteractiveLOD(0)
+
+    def SetInteractiveFrameRate(self, fps):
+        self._InteractiveFrameRate = float(fps)
+
+    def GetInteractiveFrameRate(self):
+        return self._InteractiveFrameRate
+
+    def GetLODFactor(self):
+        """Get the factor by which the spacing is coarsened when moving."""
+        return self._LODFactor
+
+    def _OnResliceStart(self, obj, event):
+        self._ResliceStartTime = time.time()
+
+    def _OnResliceEnd(self, obj, event):
+        self._ResliceTime = self._ResliceTime + \
+            (time.time() - self._ResliceStartTime)
+
+    def _AdaptLODFactor(self, seconds):
+        # allow the reslice half of the frame, and leave the factor
+        # alone while the time is between one half and all of that
+        ratio = seconds * self._InteractiveFrameRate / 0.5
+        if 0.5 <= ratio <= 1.0:
+            return
+
+        # the reslice time is proportional to the number of pixels,
+        # i.e. to the inverse square of the factor, and the factor is
+        # rounded to a power of sqrt(2) to avoid resizing the texture
+        # after every small change in the timing
+        factor = self._LODFactor * math.sqrt(ratio)
+        factor = min(max(factor, 1.0), 8.0)
+        factor = 2.0 ** (round(2.0 * math.log(factor, 2)) / 2.0)
+        if factor != self._LODFactor:
+            self._LODFactor = factor
+            self._UpdateNormal()
+
+    def _UpdateSlab(self):
+        for name in self._ImageReslicers:
+            self._UpdateSlabReslice(name)
+        self.Modified()
+
+    def _UpdateSlabReslice(self, name):
+        reslice = self._ImageReslicers[name]
+        thickness = self._SlabThickness
+
+        reslice.SetSlabThickness(thickness)
+        if self._SlabMode == 'Min':
+            reslice.SetBlendModeToMin()
+        elif self._SlabMode == 'Mean':
+            reslice.SetBlendModeToMean()
+        else:
+            reslice.SetBlendModeToMax()
+
+        spacing = self._SlabSampleSpacing
+        if not spacing:
+            input = self._Inputs[name]
+            # VTK-6
+            if vtk.vtkVersion().GetVTKMajorVersion() <= 5:
+                input.UpdateInformation()
+            spacing = min(map(abs, input.GetSpacing()))
+
+        if self._Interactive and thickness > 0:
+            # keep at least two samples across the slab
+            spacing = max(min(spacing * self._SlabInteractiveFactor,
+                              0.5 * thickness), spacing)
+
+        reslice.SetSlabResolution(spacing)
+
+    def SetUseImagePyramid(self, val):
+        if val == self._UseImagePyramid:
+            return
+        self._UseImagePyramid = val
+        if val:
+            for name in self._Inputs:
+                self._AcquireImagePyramid(name)
+            self._UpdateImagePyramidLevels()
+        else:
+            for name in self._ImagePyramids.keys():
+                self._ReleaseImagePyramid(name)
+            self._UpdateNormal()
+            self._UpdateOrigin()
+        self.Modified()
+
+    def GetUseImagePyramid(self):
+        return self._UseImagePyramid
+
+    def UseImagePyramidOn(self):
+        self.SetUseImagePyramid(1)
+
+    def UseImagePyramidOff(self):
+        self.SetUseImagePyramid(0)
+
+    def _AcquireImagePyramid(self, name):
+        self._ImagePyramids[name] = \
+            ImagePyramid.GetImagePyramid(self._Inputs[name])
+        self._ImagePyramidLevels[name] = 0
+
+    def _ReleaseImagePyramid(self, name):
+        # reconnect the reslicer to the full-resolution input
+        if name not in self._ImagePyramids:
+            return
+        pyramid = self._ImagePyramids[name]
+        del self._ImagePyramids[name]
+        del self._ImagePyramidLevels[name]
+        pyramid.ConnectLevel(0, self._ImageReslicers[name])
+        ImagePyramid.ReleaseImagePyramid(pyramid.GetInput())
+
+    def _GetPixelSize(self, renderer):
+        # get the size of a screen pixel at the center of the plane
+        camera = renderer.GetActiveCamera()
+        if camera.GetParallelProjection():
+            worldsize = camera.GetParallelScale()
+        else:
+            x, y, z = self.GetTransformedCenter()
+            cx, cy, cz = camera.GetPosition()
+            worldsize = math.sqrt((x - cx) ** 2 + (y - cy) ** 2 +
+                                  (z - cz) ** 2) * \
+                math.tan(0.5 * camera.GetViewAngle() / 57.296)
+        windowWidth, windowHeight = renderer.GetSize()
+        if windowHeight <= 0:
+            return None
+        return 2.0 * worldsize / windowHeight
+
+    def _UpdateImagePyramidLevels(self):
+        # choose a pyramid level for each input so that the voxels are
+        # no larger than a screen pixel in any of our renderers
+        if not self._ImagePyramids:
+            return
+
+        pixelSize = None
+        # an ImagePane sets the reslice spacing, so it does its own LOD
+        if not self._ImagePane:
+            for renderer in self._Renderers:
+                size = self._GetPixelSize(renderer)
+                if size is not None and (pixelSize is None or
+                                         size < pixelSize):
+                    pixelSize = size
+
+        changed = 0
+        for name in self._ImagePyramids:
+            pyramid = self._ImagePyramids[name]
+            level = 0
+            if pixelSize is not None:
+                level = pyramid.FindLevel(pixelSize)
+            if not pyramid.IsLevelCurrent(level):
+                # use a finer level until the requested one is ready
+                pyramid.BuildLevelLater(level, self._OnImagePyramidLevelBuilt)
+                level = pyramid.GetCurrentLevel(level)
+            if level != self._ImagePyramidLevels[name]:
+                self._ImagePyramidLevels[name] = level
+                pyramid.ConnectLevel(level, self._ImageReslicers[name])
+                changed = 1
+
+        if changed:
+            self._UpdateNormal()
+            self._UpdateOrigin()
+
+    def _OnImagePyramidLevelBuilt(self):
+        self._UpdateImagePyramidLevels()
+        self.Modified()
+        self.Render()
+
     def SetTextureInterpolate(self, val):
         self._TextureInterpolate = val
         for renderer in self._Renderers:
@@ -757,6 +1154,7 @@ class SlicePlaneFactory(ActorFactory.ActorFactory):
 
         # the TransformGrid is used to accelerate nonlinear transforms
         self._TransformGrids[name] = None
+        self._ReleaseDeformationField(name)
 
         # a linear transform is much more efficient than a nonlinear
         # transform, so we set our concatenated transform type according
@@ -774,9 +1172,14 @@ class SlicePlaneFactory(ActorFactory.ActorFactory):
             transform.Concatenate(trans.GetHomogenousInverse())
             transform.PreMultiply()
         else:  # nonlinear warp transforms
+            # the shared field samples the inverse over the whole volume,
+            # so the grid for the plane is only a resampling of the field
+            field = DeformationField.GetDeformationField(
+                trans, self._Inputs[name])
+            self._DeformationFields[name] = field
             transform = vtk.vtkGeneralTransform()
             transform.PostMultiply()
-            transform.Concatenate(trans.GetInverse())
+            transform.Concatenate(field.GetResliceTransform())
             transform.PreMultiply()
             # accelerate by sampling a grid, then interpolating
             tgrid = vtk.vtkTransformToGrid()
@@ -804,6 +1207,13 @@ class SlicePlaneFactory(ActorFactory.ActorFactory):
     def GetImageTransform(self, name=0):
         return self._ImageTransforms[name]
 
+    def _ReleaseDeformationField(self, name):
+        field = self._DeformationFields.get(name)
+        if field:
+            DeformationField.ReleaseDeformationField(field.GetTransform(),
+                                                     field.GetInput())
+            self._DeformationFields[name] = None
+
     def GeneratePlaneFromPolyData(self):
         # generate a plane which is aligned with the polydata --
         # you must call this method each time the polydata is changed.
@@ -1015,6 +1425,21 @@ class SlicePlaneFactory(ActorFactory.ActorFactory):
 
     def OnRenderEvent(self, ren, event):
 
+        # the reslice time is only known after a render that resliced
+        if self._Interactive and self._InteractiveLOD and self._ResliceTime:
+            self._AdaptLODFactor(self._ResliceTime)
+        self._ResliceTime = 0.0
+
+        # recompute the shared fields if their transforms have changed
+        for field in self._DeformationFields.values():
+            if field:
+                field.Update()
+
+        if self._TextureSizeMode == 'Auto' and self._NPOTSupported is None:
+            self._NPOTSupported = _SupportsNPOTTextures(ren.GetRenderWindow())
+            if self._NPOTSupported:
+                self._UpdateNormal()
+
         if self._ImagePane:
             for i in range(self._ImagePane.GetNumberOfInputs()):
                 input = ImagePane.GetInput(self._ImagePane, i)
@@ -1034,9 +1459,11 @@ class SlicePlaneFactory(ActorFactory.ActorFactory):
                 self._Plane.Push(d)
                 self._UpdateOrigin()
 
+        self._UpdateImagePyramidLevels()
+
     def AddToRenderer(self, ren):
         ActorFactory.ActorFactory.AddToRenderer(self, ren)
-        ren.AddObserver('StartEvent', self.OnRenderEvent)
+        self.AddRendererObserver(ren, 'StartEvent', self.OnRenderEvent)
 
     def SetImagePane(self, pane):
         self._ImagePane = pane
@@ -1506,7 +1933,11 @@ class SlicePlaneFactory(ActorFactory.ActorFactory):
             # input.UpdateInformation()  # TODO: VTK-6 figure out what to do
             # here
 
-            spacing = input.GetSpacing()
+            if name in self._ImagePyramids:
+                spacing = self._ImagePyramids[name].GetLevelSpacing(
+                    self._ImagePyramidLevels[name])
+            else:
+                spacing = input.GetSpacing()
 
             spacingX = abs(planeAxis1[0] * spacing[0]) +\
                 abs(planeAxis1[1] * spacing[1]) +\
@@ -1520,15 +1951,23 @@ class SlicePlaneFactory(ActorFactory.ActorFactory):
                 spacingX, spacingY, spacingZ = self._ImagePane.GetTransformedSpacing(
                     name)
 
-            # pad extent up to a power of two for efficient texture mapping
+            if self._Interactive and self._InteractiveLOD:
+                spacingX = spacingX * self._LODFactor
+                spacingY = spacingY * self._LODFactor
 
-            extentX = 1
-            while (extentX < planeSizeX / spacingX):
-                extentX = extentX << 1
+            if self._UsePowerOfTwoTextures():
+                # pad extent up to a power of two for efficient texture
+                # mapping on older hardware
+                extentX = 1
+                while (extentX < planeSizeX / spacingX):
+                    extentX = extentX << 1
 
-            extentY = 1
-            while (extentY < planeSizeY / spacingY):
-                extentY = extentY << 1
+                extentY = 1
+                while (extentY < planeSizeY / spacingY):
+                    extentY = extentY << 1
+            else:
+                extentX = max(int(math.ceil(planeSizeX / spacingX - 1e-6)), 1)
+                extentY = max(int(math.ceil(planeSizeY / spacingY - 1e-6)), 1)
 
             reslice.SetOutputSpacing(spacingX, spacingY, 1)
             reslice.SetOutputOrigin(0.5 * spacingX + originX,
@@ -1546,7 +1985,7 @@ class SlicePlaneFactory(ActorFactory.ActorFactory):
                     map(lambda x: x / 4, reslice.GetOutputExtent()))
 
             # find expansion factor to account for increasing the extent
-            # to a power of two
+            # to a power of two (or to a whole number of pixels)
             expand1 = extentX * spacingX
             expand2 = extentY * spacingY
 
@@ -1573,6 +2012,7 @@ class SlicePlaneFactory(ActorFactory.ActorFactory):
     def DoStartAction(self, event):
         self._LastX = event.x
         self._LastY = event.y
+        self.SetInteractive(1)
         if self._ImagePane:
             self._ImagePane.DynamicOn()
             for pane in self._ImagePane.GetSyncPanes():
@@ -1591,6 +2031,9 @@ class SlicePlaneFactory(ActorFactory.ActorFactory):
             self.SetOutlineColor(self._SpinColor)
 
     def DoEndAction(self, event):
+        # one full-quality reslice for the still render
+        self.SetInteractive(0)
+
         if self._ImagePane:
             self._ImagePane.DynamicOff()
             for pane in self._ImagePane.GetSyncPanes():
@@ -162,7 +162,7 @@ class SphereMarkFactory(ActorFactory):
 
     def AddToRenderer(self, renderer):
         ActorFactory.AddToRenderer(self, renderer)
-        renderer.AddObserver('StartEvent', self.OnRenderEvent)
+        self.AddRendererObserver(renderer, 'StartEvent', self.OnRenderEvent)
 
     def OnRenderEvent(self, renderer, event):
 
@@ -0,0 +1,293 @@
+# =========================================================================
+#
+# Copyright (c) 2000 Atamai, Inc.
+#
+# Use, modification and redistribution of the software, in source or
+# binary forms, are permitted provided that the following terms and
+# conditions are met:
+#
+# 1) Redistribution of the source code, in verbatim or modified
+#    form, must retain the above copyright notice, this license,
+#    the following disclaimer, and any notices that refer to this
+#    license and/or the following disclaimer.
+#
+# 2) Redistribution in binary form must include the above copyright
+#    notice, a copy of this license and the following disclaimer
+#    in the documentation or with other materials provided with the
+#    distribution.
+#
+# 3) Modified copies of the source code must be clearly marked as such,
+#    and must not be misrepresented as verbatim copies of the source code.
+#
+# THE COPYRIGHT HOLDERS AND/OR OTHER PARTIES PROVIDE THE SOFTWARE "AS IS"
+# WITHOUT EXPRESSED OR IMPLIED WARRANTY INCLUDING, BUT NOT LIMITED TO,
+# THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR
+# PURPOSE.  IN NO EVENT SHALL ANY COPYRIGHT HOLDER OR OTHER PARTY WHO MAY
+# MODIFY AND/OR REDISTRIBUTE THE SOFTWARE UNDER THE TERMS OF THIS LICENSE
+# BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL OR CONSEQUENTIAL DAMAGES
+# (INCLUDING, BUT NOT LIMITED TO, LOSS OF DATA OR DATA BECOMING INACCURATE
+# OR LOSS OF PROFIT OR BUSINESS INTERRUPTION) ARISING IN ANY WAY OUT OF
+# THE USE OR INABILITY TO USE THE SOFTWARE, EVEN IF ADVISED OF THE
+# POSSIBILITY OF SUCH DAMAGES.
+#
+# =========================================================================
+
+#
+# This file represents a derivative work by Parallax Innovations Inc.
+#
+
+"""
+VolumeCache - shared reduced-resolution copies of volumes for rendering
+
+  Volume rendering needs copies of the image that have been averaged
+  down to the resolution of the textures, and that have been converted
+  to an unsigned type for the mappers.  The VolumeCache keeps one such
+  copy for each combination of input, shrink factors and type
+  conversion, so that several panes that show the same image do not
+  each compute and store their own copies.
+
+  A ReducedVolume is brought up-to-date through the VTK pipeline when
+  the input changes, and the shift that converts signed data to
+  unsigned data follows the scalar range of the input.  Use
+  UpdateReducedVolumes() to bring several volumes up-to-date at once.
+  The volumes are updated one after another, because volumes that are
+  reduced from the same input share its pipeline.
+
+  Volumes are shared: GetReducedVolume(*input*,*shrink*,*unsigned*)
+  returns the same volume for every caller with the same arguments,
+  and ReleaseReducedVolume(*volume*) must be called once for every call
+  to GetReducedVolume().  Volumes that are no longer used are kept until
+  the memory limit is exceeded, where the limit also counts the inputs
+  that are only kept alive by the unused volumes.  A volume whose output
+  is its input is discarded as soon as it is no longer used.
+
+Public Methods:
+
+  GetInput()                   -- the full-resolution image
+
+  GetShrinkFactors()           -- the shrink factors for the volume
+
+  GetOutput()                  -- the reduced volume, as vtkImageData
+
+  GetMemorySize()              -- the memory used by the reduced volume
+
+  GetShift()                   -- the shift that was added to the values
+                                  to make them unsigned
+
+  Update()                     -- bring the reduced volume up-to-date
+
+Module Functions:
+
+  GetReducedVolume(*input*,*shrink*,*unsigned*=0) -- get the shared volume
+                                  for *input* reduced by the integer factors
+                                  *shrink*, and converted to an unsigned type
+                                  if *unsigned* is set, if nothing needs to
+                                  be done then the output is the input
+
+  ReleaseReducedVolume(*volume*) -- release a volume that was obtained
+                                  from GetReducedVolume()
+
+  UpdateReducedVolumes(*volumes*) -- bring several volumes up-to-date
+
+  SetMemoryLimit(*bytes*)      -- the maximum memory for unused volumes
+
+  GetMemoryLimit()             -- get the memory limit
+
+"""
+
+#======================================
+import vtk
+
+#======================================
+
+# shared volumes, keyed by (input, shrink, unsigned): each value is
+# [volume, refcount]
+_ReducedVolumes = {}
+
+# volumes that are no longer in use, oldest first: a list of (key, volume)
+_UnusedVolumes = []
+
+_MemoryLimit = 128 * 1024 * 1024
+
+
+def _GetKey(input, shrink, unsigned):
+    # no conversion is needed if the data is already unsigned
+    if unsigned:
+        if vtk.vtkVersion().GetVTKMajorVersion() <= 5:
+            input.UpdateInformation()
+        t = input.GetScalarType()
+        unsigned = (t != vtk.VTK_UNSIGNED_SHORT and
+                    t != vtk.VTK_UNSIGNED_CHAR)
+    return (input, tuple(map(int, shrink)), bool(unsigned))
+
+
+def SetMemoryLimit(nbytes):
+    global _MemoryLimit
+    _MemoryLimit = nbytes
+    _PruneUnusedVolumes()
+
+
+def GetMemoryLimit():
+    return _MemoryLimit
+
+
+def GetReducedVolume(input, shrink, unsigned=0):
+    """Get the reduced volume for *input*, creating it if necessary."""
+    key = _GetKey(input, shrink, unsigned)
+    try:
+        item = _ReducedVolumes[key]
+    except KeyError:
+        volume = None
+        for i in range(len(_UnusedVolumes)):
+            if _UnusedVolumes[i][0] == key:
+                volume = _UnusedVolumes[i][1]
+                del _UnusedVolumes[i]
+                break
+        if volume is None:
+            volume = ReducedVolume(input, key[1], key[2])
+            volume._Key = key
+        item = [volume, 0]
+        _ReducedVolumes[key] = item
+    item[1] = item[1] + 1
+    return item[0]
+
+
+def ReleaseReducedVolume(volume):
+    """Release a volume that was obtained through GetReducedVolume()."""
+    key = volume._Key
+    try:
+        item = _ReducedVolumes[key]
+    except KeyError:
+        return
+    item[1] = item[1] - 1
+    if item[1] <= 0:
+        del _ReducedVolumes[key]
+        if item[0].GetOutput() is item[0].GetInput():
+            # nothing was computed, so nothing is worth keeping
+            item[0].tearDown()
+            return
+        _UnusedVolumes.append((key, item[0]))
+        _PruneUnusedVolumes()
+
+
+def UpdateReducedVolumes(volumes):
+    """Bring several volumes up-to-date."""
+    # the volumes are not updated concurrently, since the pipeline
+    # requests on a shared input are not thread safe
+    for volume in filter(None, volumes):
+        volume.Update()
+
+
+def _GetUnusedMemorySize():
+    # the unused volumes, and the inputs that only they refer to
+    total = 0
+    inputs = []
+    for key, volume in _UnusedVolumes:
+        total = total + volume.GetMemorySize()
+        if key[0] not in inputs:
+            inputs.append(key[0])
+    for key in _ReducedVolumes:
+        if key[0] in inputs:
+            inputs.remove(key[0])
+    for input in inputs:
+        total = total + input.GetActualMemorySize() * 1024
+    return total
+
+
+def _PruneUnusedVolumes():
+    while _UnusedVolumes and _GetUnusedMemorySize() > _MemoryLimit:
+        key, volume = _UnusedVolumes.pop(0)
+        volume.tearDown()
+
+
+class ReducedVolume(object):
+
+    """An averaged, downsampled and type-converted copy of an image."""
+
+    def __init__(self, input, shrink, unsigned):
+        self._Input = input
+        self._ShrinkFactors = tuple(shrink)
+        self._Unsigned = unsigned
+        self._Key = None
+
+        output = None
+        self._Shrink = None
+        if self._ShrinkFactors != (1, 1, 1):
+            self._Shrink = vtk.vtkImageShrink3D()
+            self._Shrink.SetShrinkFactors(self._ShrinkFactors)
+            self._Shrink.MeanOn()
+            if vtk.vtkVersion().GetVTKMajorVersion() > 5:
+                self._Shrink.SetInputData(input)
+            else:
+                self._Shrink.SetInput(input)
+            output = self._Shrink
+
+        # the scalar type and shift are set by UpdateShift()
+        self._ShiftScale = None
+        self._InputMTime = None
+        if unsigned:
+            self._ShiftScale = vtk.vtkImageShiftScale()
+            if output:
+                output.ReleaseDataFlagOn()
+                if vtk.vtkVersion().GetVTKMajorVersion() > 5:
+                    self._ShiftScale.SetInputConnection(
+                        output.GetOutputPort())
+                else:
+                    self._ShiftScale.SetInput(output.GetOutput())
+            elif vtk.vtkVersion().GetVTKMajorVersion() > 5:
+                self._ShiftScale.SetInputData(input)
+            else:
+                self._ShiftScale.SetInput(input)
+            output = self._ShiftScale
+
+        self._Output = output
+
+    def tearDown(self):
+        self._Shrink = None
+        self._ShiftScale = None
+        self._Output = None
+        self._Input = None
+
+    def GetInput(self):
+        return self._Input
+
+    def GetShrinkFactors(self):
+        return self._ShrinkFactors
+
+    def GetOutput(self):
+        if self._Output:
+            return self._Output.GetOutput()
+        return self._Input
+
+    def GetMemorySize(self):
+        if self._Output:
+            return self._Output.GetOutput().GetActualMemorySize() * 1024
+        return 0
+
+    def GetShift(self):
+        if self._ShiftScale:
+            return self._ShiftScale.GetShift()
+        return 0.0
+
+    def UpdateShift(self):
+        """Convert signed data to unsigned by shifting its range."""
+        if not self._ShiftScale:
+            return
+        input = self._Input
+        mtime = input.GetMTime()
+        if mtime == self._InputMTime:
+            return
+        self._InputMTime = mtime
+
+        # convert from signed to unsigned
+        f = self._ShiftScale
+        t = input.GetScalarType()
+        minval, maxval = input.GetScalarRange()
+        f.SetShift(-minval)
+        f.SetScale(1.0)
+        f.SetOutputScalarType(t + 1)
+
+    def Update(self):
+        self.UpdateShift()
+        if self._Output:
+            self._Output.UpdateWholeExtent()
@@ -66,6 +66,34 @@ VolumeFactory - volume rendering using color transfer function
   Interaction with the planes (i.e. slicing into the planes) is done
   via the ClippingCubeFactory.
 
+  The mappers that do the rendering are chosen by the backend.  The
+  'Texture' backend uses vtkVolumeTextureMapper2D for both levels of
+  detail.  The 'FixedPoint' backend uses vtkFixedPointVolumeRayCastMapper,
+  which renders on all of the CPU cores without any need for graphics
+  hardware, with a subsampled volume for the interactive level of detail
+  and the full-resolution volume for the still level of detail.  The
+  default is 'Texture' if VTK still provides the texture mapper, and
+  'FixedPoint' otherwise.
+
+  Regions of the volume that are completely transparent for the current
+  opacity transfer function are found with a BrickIndex.  The mappers
+  are cropped to the bounds of the visible bricks, and picking skips
+  over the transparent bricks.  Cropping is not done for nonlinear image
+  transforms.
+
+  While all of the planes of the clipping cube are perpendicular to the
+  axes, the mappers are cropped to the cube instead of being clipped by
+  its planes, so that they can skip the regions outside of the cube.
+  The clipping planes are used when the planes are oblique.
+
+  The size of the still level of detail is the smallest power of two
+  that keeps every voxel, reduced until it fits within
+  SetTextureMemoryLimit().  The interactive level is halved or doubled
+  to fit the desired update rate of interactive renders, based on its
+  measured render time.  The vtkLODProp3D picks between the two levels
+  from their measured render times, and the LOD levels only rank them,
+  so they are left fixed.
+
 
 Derived From:
 
@@ -85,6 +113,12 @@ Public Methods:
 
   GetInput()             -- get the input
 
+  SetTimeSeries(*series*) -- render the output of an ImageTimeSeries,
+                            changing its time index swaps the scalars
+                            without rebuilding the bounds
+
+  GetTimeSeries()        -- get the time series
+
   SetColorTransferFunction() -- set the color transfer function
 
   GetColorTransferFunction() -- get the color transfer function
@@ -111,12 +145,44 @@ Public Methods:
   GetClippingCube()      -- get the ClippingCubeFactory used to clip into
                             the volume
 
+  SetBackend(*name*)     -- set the rendering backend, 'Texture' or
+                            'FixedPoint'
+
+  SetBackendToTexture()  -- use 2D texture mapping
+
+  SetBackendToFixedPoint() -- use the multithreaded fixed-point ray caster
+
+  GetBackend()           -- get the rendering backend
+
+  SetNumberOfThreads(*n*) -- set the number of CPU threads for ray casting,
+                            or None to use all of the cores
+
+  GetNumberOfThreads()   -- get the number of CPU threads
+
+  SetTextureSize(*n*)    -- set the resolution of the still level of detail,
+                            the interactive level is half of this, the
+                            default of None chooses the sizes automatically
+
+  GetTextureSize()       -- get the resolution of the still level
+
+  GetInteractiveTextureSize() -- get the resolution of the interactive
+                            level, which automatic sizing adjusts to fit
+                            the desired update rate of the render window
+
+  SetTextureMemoryLimit(*bytes*) -- limit the memory for the textures,
+                            the default is 24MB
+
+  GetTextureMemoryLimit() -- get the memory limit for the textures
+
 """
 
 #======================================
 import ActorFactory
+import BrickIndex
 import ClippingCubeFactory
 import PaneFrame
+import DeformationField
+import VolumeCache
 import math
 import vtk
 
@@ -131,7 +197,6 @@ class VolumeFactory(ActorFactory.ActorFactory):
         self._LookupTable = None  # lookup table is currently not used
         self._ColorTransferFunction = None
         self._OpacityTransferFunction = None
-        self._RendererObserverList = {}
 
         # create a clipping cube to go with the volume
         self._ClippingCube = ClippingCubeFactory.ClippingCubeFactory()
@@ -183,15 +248,16 @@ class VolumeFactory(ActorFactory.ActorFactory):
 
         # generate the pipeline pieces
         self._Input = None
+        self._TimeSeries = None
 
         # transform the full-resolution volume
         self._RayCastReslice = vtk.vtkImageReslice()
         self._RayCastReslice.SetInterpolationModeToLinear()
 
-        # subsample the volume for low-res rendering
-        self._ImagePrefilter1 = vtk.vtkImageShrink3D()
-
-        self._ImagePrefilter2 = vtk.vtkImageShrink3D()
+        # subsampled volumes for low-res rendering, and the unsigned
+        # full-res volume, which are shared through the VolumeCache
+        self._LevelVolumes = [None, None]
+        self._RayCastVolume = None
 
         # transform the subsampled volume
         self._ImageReslice1 = vtk.vtkImageReslice()
@@ -209,16 +275,35 @@ class VolumeFactory(ActorFactory.ActorFactory):
 
         # a transform to apply to the image
         self._ImageTransform = None
-        self._TransformToGrid = vtk.vtkTransformToGrid()
+        self._DeformationField = None
 
         # the opacity pick threshold for the volume
         self._PickThreshold = 0.99
+
+        # an index of the range of values in each brick of the input,
+        # and the visible bricks for rendering and for picking, which
+        # are kept as (key, visible) with the key that was used to
+        # compute them
+        self._BrickIndex = None
+        self._RenderBricks = None
+        self._PickBricks = None
+        self._BrickBounds = None
+        self._CroppingBounds = None
+        self._CroppingPlanes = self._ClippingCube.GetClippingPlanes()
         # the implicit volume for finding the gradient
         self._ImplicitVolume = vtk.vtkImplicitVolume()
 
-        # the texture dimensions (later this will be set automatically
-        #    to provide the desired interactive rendering time)
-        self._TextureSize = 128
+        # the texture dimensions for the interactive and still levels,
+        # chosen from the volume size and the memory limit unless the
+        # TextureSize is set, the interactive level is then resized to
+        # provide the desired interactive rendering time
+        self._TextureSize = None
+        self._TextureMemoryLimit = 24 * 1024 * 1024
+        self._LevelSizes = [64, 128]
+        self._PendingLevelSizes = {}
+        self._RebuildId = None
+        self._AdaptTime = None
+        self._Bounds = None
 
         # the bounds of the volume
         self._VolumeBounds = None
@@ -227,6 +312,32 @@ class VolumeFactory(ActorFactory.ActorFactory):
         self._VolumeProperty = vtk.vtkVolumeProperty()
         self._VolumeProperty.SetInterpolationTypeToLinear()
 
+        # the rendering backend, the texture and ray-cast mappers
+        # were removed in VTK 7
+        if hasattr(vtk, 'vtkVolumeTextureMapper2D'):
+            self._Backend = 'Texture'
+        else:
+            self._Backend = 'FixedPoint'
+        self._NumberOfThreads = None
+        self._FixedPointMapper1 = None
+        self._FixedPointMapper2 = None
+        self._RayCastOutput = None
+
+        self._VolumeRayCastMapper = None
+        self._VolumeTextureMapper1 = None
+        self._VolumeTextureMapper2 = None
+        if hasattr(vtk, 'vtkVolumeRayCastMapper'):
+            self._MakeRayCastMapper()
+        if hasattr(vtk, 'vtkVolumeTextureMapper2D'):
+            self._MakeTextureMappers()
+
+        # set two levels of detail: low and high resolution
+        self._Volume = vtk.vtkLODProp3D()
+        self._Volume.PickableOff()
+        self._lod = []
+        self._BuildLODs()
+
+    def _MakeRayCastMapper(self):
         rayCastFunction = vtk.vtkVolumeRayCastCompositeFunction()
         self._VolumeRayCastMapper = vtk.vtkVolumeRayCastMapper()
         self._VolumeRayCastMapper.SetVolumeRayCastFunction(rayCastFunction)
@@ -237,53 +348,145 @@ class VolumeFactory(ActorFactory.ActorFactory):
         except:
             pass
 
+    def _MakeTextureMappers(self):
         self._VolumeTextureMapper1 = vtk.vtkVolumeTextureMapper2D()
-        self._VolumeTextureMapper1.SetTargetTextureSize(self._TextureSize / 4,
-                                                        self._TextureSize / 4)
+        self._VolumeTextureMapper1.SetTargetTextureSize(
+            self._LevelSizes[0] / 2, self._LevelSizes[0] / 2)
         self._VolumeTextureMapper1.SetMaximumNumberOfPlanes(
-            self._TextureSize / 2)
+            self._LevelSizes[0])
         self._VolumeTextureMapper1.SetClippingPlanes(
             self._ClippingCube.GetClippingPlanes())
         try:  # vtk 3.2 does not contain this function call:
             # set to the amount of available texture memory (24MB is a good
             # start)
-            self._VolumeTextureMapper1.SetMaximumStorageSize(24 * 1024 * 1024)
+            self._VolumeTextureMapper1.SetMaximumStorageSize(
+                self._TextureMemoryLimit)
         except:
             pass
 
         self._VolumeTextureMapper2 = vtk.vtkVolumeTextureMapper2D()
-        self._VolumeTextureMapper2.SetTargetTextureSize(self._TextureSize,
-                                                        self._TextureSize)
-        self._VolumeTextureMapper2.SetMaximumNumberOfPlanes(self._TextureSize)
+        self._VolumeTextureMapper2.SetTargetTextureSize(
+            self._LevelSizes[1], self._LevelSizes[1])
+        self._VolumeTextureMapper2.SetMaximumNumberOfPlanes(
+            self._LevelSizes[1])
         self._VolumeTextureMapper2.SetClippingPlanes(
             self._ClippingCube.GetClippingPlanes())
 
         try:  # vtk 3.2 does not contain this function call:
             # set to the amount of available texture memory (24MB is a good
             # start)
-            self._VolumeTextureMapper2.SetMaximumStorageSize(24 * 1024 * 1024)
+            self._VolumeTextureMapper2.SetMaximumStorageSize(
+                self._TextureMemoryLimit)
         except:
             pass
 
-        # set two levels of detail: texture and ray-casting
-        self._Volume = vtk.vtkLODProp3D()
-        self._Volume.PickableOff()
-        idT1 = self._Volume.AddLOD(self._VolumeTextureMapper1,
-                                   self._VolumeProperty,
-                                   0.02)
-        idT2 = self._Volume.AddLOD(self._VolumeTextureMapper2,
-                                   self._VolumeProperty,
-                                   0.1)
+    def _MakeFixedPointMappers(self):
+        # the interactive LOD renders the subsampled volume, and reduces
+        # the number of rays if it is too slow for the allocated time
+        mapper1 = vtk.vtkFixedPointVolumeRayCastMapper()
+        mapper1.AutoAdjustSampleDistancesOn()
+        mapper1.SetClippingPlanes(self._ClippingCube.GetClippingPlanes())
+        self._ConnectInput(mapper1, self._ImageReslice1)
+
+        # the still LOD renders the full-resolution volume, one ray per pixel
+        mapper2 = vtk.vtkFixedPointVolumeRayCastMapper()
+        mapper2.AutoAdjustSampleDistancesOff()
+        mapper2.SetImageSampleDistance(1.0)
+        mapper2.SetClippingPlanes(self._ClippingCube.GetClippingPlanes())
+        if self._RayCastOutput:
+            self._ConnectInput(mapper2, self._RayCastReslice)
+
+        self._SetMapperCropping(mapper1)
+        self._SetMapperCropping(mapper2)
+
+        if self._NumberOfThreads:
+            mapper1.SetNumberOfThreads(self._NumberOfThreads)
+            mapper2.SetNumberOfThreads(self._NumberOfThreads)
+
+        self._FixedPointMapper1 = mapper1
+        self._FixedPointMapper2 = mapper2
+
+    def _BuildLODs(self):
+        # replace the levels of detail with those of the current backend
+        for lodId in self._lod:
+            self._Volume.RemoveLOD(lodId)
+
+        if self._Backend == 'FixedPoint':
+            if not self._FixedPointMapper1:
+                self._MakeFixedPointMappers()
+            id1 = self._Volume.AddLOD(self._FixedPointMapper1,
+                                      self._VolumeProperty,
+                                      0.05)
+            id2 = self._Volume.AddLOD(self._FixedPointMapper2,
+                                      self._VolumeProperty,
+                                      1.0)
+        else:
+            id1 = self._Volume.AddLOD(self._VolumeTextureMapper1,
+                                      self._VolumeProperty,
+                                      0.02)
+            id2 = self._Volume.AddLOD(self._VolumeTextureMapper2,
+                                      self._VolumeProperty,
+                                      0.1)
 
         # remember these LOD id numbers
-        self._lod = [idT1, idT2]
+        self._lod = [id1, id2]
+
+        # the levels only rank the LODs: vtkLODProp3D picks the best
+        # ranked LOD whose measured render time fits the allocated time,
+        # so the choice already follows the measured times, and it is
+        # the level sizes that are adapted (see _AdaptLevelSizes)
+        self._Volume.SetLODLevel(id1, 2.0)
+        self._Volume.SetLODLevel(id2, 1.0)
+
+    def SetBackend(self, backend):
+        if backend not in ('Texture', 'FixedPoint'):
+            raise ValueError('unknown volume rendering backend ' +
+                             repr(backend))
+        if backend == self._Backend:
+            return
+        if backend == 'Texture' and not self._VolumeTextureMapper1:
+            raise ValueError('texture mapping is not available in this VTK')
+        self._Backend = backend
+        self._BuildLODs()
+        self.Modified()
+
+    def SetBackendToTexture(self):
+        self.SetBackend('Texture')
 
-#        idRC = self._Volume.AddLOD(self._VolumeRayCastMapper,
-#                                   self._VolumeProperty,
-#                                   2.0)
-        self._Volume.SetLODLevel(idT1, 2.0)
-        self._Volume.SetLODLevel(idT2, 1.0)
-#        self._Volume.SetLODLevel(idRC, 0.0)
+    def SetBackendToFixedPoint(self):
+        self.SetBackend('FixedPoint')
+
+    def GetBackend(self):
+        return self._Backend
+
+    def SetNumberOfThreads(self, n):
+        self._NumberOfThreads = n
+        if self._FixedPointMapper1:
+            if not n:
+                n = vtk.vtkMultiThreader.GetGlobalDefaultNumberOfThreads()
+            self._FixedPointMapper1.SetNumberOfThreads(n)
+            self._FixedPointMapper2.SetNumberOfThreads(n)
+        self.Modified()
+
+    def GetNumberOfThreads(self):
+        if self._NumberOfThreads:
+            return self._NumberOfThreads
+        return vtk.vtkMultiThreader.GetGlobalDefaultNumberOfThreads()
+
+    def tearDown(self):
+        ActorFactory.ActorFactory.tearDown(self)
+        self._ReleaseDeformationField()
+        self._SetLevelVolume(0, None)
+        self._SetLevelVolume(1, None)
+        if self._RayCastVolume:
+            VolumeCache.ReleaseReducedVolume(self._RayCastVolume)
+            self._RayCastVolume = None
+        if self._BrickIndex:
+            BrickIndex.ReleaseBrickIndex(self._BrickIndex.GetInput())
+            self._BrickIndex = None
+        if self._RebuildId is not None and PaneFrame.PaneFrame.AllPaneFrames:
+            PaneFrame.PaneFrame.AllPaneFrames[0].UnSchedule(self._RebuildId)
+        self._RebuildId = None
 
     def GetLODIds(self):
         return self._lod
@@ -307,8 +510,8 @@ class VolumeFactory(ActorFactory.ActorFactory):
         renderer.GetCullers().GetNextItem().SetSortingStyleToBackToFront()
 
         try:  # new way of adding render callback
-            self._RendererObserverList[renderer] = \
-                renderer.AddObserver('StartEvent', self.OnRenderEvent)
+            self.AddRendererObserver(renderer, 'StartEvent',
+                                     self.OnRenderEvent)
         except:
             renderer.SetStartRenderMethod(lambda s=self, r=renderer:
                                           s._OnRenderEvent(r, 'StartEvent'))
@@ -317,10 +520,9 @@ class VolumeFactory(ActorFactory.ActorFactory):
     def RemoveFromRenderer(self, renderer):
         renderer.RemoveViewProp(self._Volume)
 
-        try:
-            renderer.RemoveObserver(self._RendererObserverList[renderer])
-            del self._RendererObserverList[renderer]
-        except:
+        if renderer in self._RendererObservers:
+            self.RemoveRendererObservers(renderer)
+        else:
             done = 0
             for frame in PaneFrame.PaneFrame.AllPaneFrames:
                 for pane in frame.GetRenderPanes():
@@ -356,8 +558,132 @@ class VolumeFactory(ActorFactory.ActorFactory):
         self.OnRenderEvent(renderer, vtkevent)
 
     def OnRenderEvent(self, renderer, vtkevent):
+        if self._DeformationField:
+            self._DeformationField.Update()
+        # if the input changed, update the shared volumes
+        VolumeCache.UpdateReducedVolumes(self._LevelVolumes +
+                                         [self._RayCastVolume])
+        self._UpdateCropping()
+        self._AdaptLevelSizes(renderer)
         self._RenderTime.Modified()
 
+    def _ComputeVisibleBricks(self, cached, shift, func):
+        """Find the visible bricks, unless *cached* is still valid.
+
+        Returns (key, visible), or None if there is no index.
+        """
+        index = self._BrickIndex
+        if not index or not func:
+            return None
+        index.Update()
+        key = (index.GetBuildCount(), func, func.GetMTime(), shift)
+        if cached and cached[0] == key:
+            return cached
+        if func.IsA('vtkLookupTable'):
+            alpha, _range = BrickIndex.GetLookupTableAlpha(func)
+        else:
+            alpha, _range = BrickIndex.GetOpacityTable(func)
+        return (key, index.ComputeVisibleBricks(alpha, _range, shift))
+
+    def _UpdateCropping(self):
+        """Crop the mappers to the visible bricks and the clipping cube."""
+        transform = self._ImageTransform
+        volume = self._LevelVolumes[1]
+        if (not volume or
+                (transform and not transform.IsA('vtkLinearTransform'))):
+            self._RenderBricks = None
+            self._BrickBounds = None
+        else:
+            # the mappers see the values after they were made unsigned
+            cached = self._RenderBricks
+            self._RenderBricks = self._ComputeVisibleBricks(
+                cached, volume.GetShift(), self._OpacityTransferFunction)
+            if self._RenderBricks is not cached or not cached:
+                self._BrickBounds = self._GetVisibleBounds()
+
+        # crop to an axis-aligned cube, or else clip with its planes
+        planes = self._ClippingCube.GetClippingPlanes()
+        cubeBounds = None
+        if self._Bounds:
+            cubeBounds = ClippingCubeFactory.GetAxisAlignedBounds(planes)
+        if cubeBounds:
+            planes = None
+            cubeBounds = [b if b is not None else self._Bounds[i]
+                          for i, b in enumerate(cubeBounds)]
+        bounds = self._IntersectBounds(self._BrickBounds, cubeBounds)
+
+        if bounds != self._CroppingBounds or \
+                planes is not self._CroppingPlanes:
+            self._CroppingBounds = bounds
+            self._CroppingPlanes = planes
+            for mapper in (self._VolumeRayCastMapper,
+                           self._VolumeTextureMapper1,
+                           self._VolumeTextureMapper2,
+                           self._FixedPointMapper1,
+                           self._FixedPointMapper2):
+                if mapper:
+                    self._SetMapperCropping(mapper)
+
+    def _GetVisibleBounds(self):
+        # get the world bounds of the visible bricks, padded by the
+        # spacing of the coarsest level
+        if not self._RenderBricks:
+            return None
+        index = self._BrickIndex
+        b = index.GetVisibleBounds(self._RenderBricks[1])
+        if b is None:
+            # everything is transparent, so crop to nothing
+            b = self._Bounds
+            return (b[0], b[0], b[2], b[2], b[4], b[4])
+
+        transform = self._ImageTransform
+        points = []
+        for x in b[0:2]:
+            for y in b[2:4]:
+                for z in b[4:6]:
+                    if transform:
+                        points.append(transform.TransformPoint(x, y, z))
+                    else:
+                        points.append((x, y, z))
+
+        bounds = []
+        size = self._LevelSizes[0]
+        for i in range(3):
+            lo = min([p[i] for p in points])
+            hi = max([p[i] for p in points])
+            pad = (self._Bounds[2 * i + 1] - self._Bounds[2 * i]) / size
+            bounds.append(max(lo - pad, self._Bounds[2 * i]))
+            bounds.append(min(hi + pad, self._Bounds[2 * i + 1]))
+        return tuple(bounds)
+
+    def _IntersectBounds(self, bounds1, bounds2):
+        if bounds1 is None:
+            if bounds2 is None:
+                return None
+            bounds1 = bounds2
+        elif bounds2 is None:
+            bounds2 = bounds1
+        bounds = []
+        for i in range(3):
+            lo = max(bounds1[2 * i], bounds2[2 * i])
+            hi = min(bounds1[2 * i + 1], bounds2[2 * i + 1])
+            bounds = bounds + [lo, max(lo, hi)]
+        return tuple(bounds)
+
+    def _SetMapperCropping(self, mapper):
+        if self._CroppingPlanes is not None:
+            mapper.SetClippingPlanes(self._CroppingPlanes)
+        else:
+            # detach the cube's planes, the collection is shared
+            mapper.SetClippingPlanes(None)
+        bounds = self._CroppingBounds
+        if bounds is None:
+            mapper.CroppingOff()
+        else:
+            mapper.SetCroppingRegionPlanes(bounds)
+            mapper.SetCroppingRegionFlagsToSubVolume()
+            mapper.CroppingOn()
+
     def SetImageStencil(self, stencil):
         self._ImageReslice1.SetStencil(stencil)
         self._ImageReslice2.SetStencil(stencil)
@@ -365,44 +691,58 @@ class VolumeFactory(ActorFactory.ActorFactory):
 
     def SetImageTransform(self, transform):
         self._ImageTransform = transform
+        self._SetImageTransform(transform, self._Input)
+
+    def _SetImageTransform(self, transform, input):
+        # a nonlinear transform is sampled once over the whole volume,
+        # by a field that is shared with the other factories
+        field = None
         if not transform:
-            self._ImageReslice1.SetResliceTransform(None)
-            self._ImageReslice2.SetResliceTransform(None)
-            self._RayCastReslice.SetResliceTransform(None)
+            inverse = None
         elif transform.IsA('vtkLinearTransform'):
-            self._ImageReslice1.SetResliceTransform(
-                transform.GetLinearInverse())
-            self._ImageReslice2.SetResliceTransform(
-                transform.GetLinearInverse())
-            self._RayCastReslice.SetResliceTransform(
-                transform.GetLinearInverse())
+            inverse = transform.GetLinearInverse()
         elif transform.IsA('vtkHomogeneousTransform'):
-            self._ImageReslice1.SetResliceTransform(
-                transform.GetHomogeneousInverse())
-            self._ImageReslice2.SetResliceTransform(
-                transform.GetHomogeneousInverse())
-            self._RayCastReslice.SetResliceTransform(
-                transform.GetHomogeneousInverse())
+            inverse = transform.GetHomogeneousInverse()
+        elif input:
+            field = DeformationField.GetDeformationField(transform, input)
+            inverse = field.GetResliceTransform()
         else:
-            tgrid = self._TransformToGrid
-            tgrid.SetInput(transform.GetInverse())
-            gridt = vtk.vtkGridTransform()
-            gridt.SetInterpolationModeToCubic()
-            gridt.SetDisplacementGrid(tgrid.GetOutput())
-            self._ImageReslice1.SetResliceTransform(transform.GetInverse())
-            self._ImageReslice2.SetResliceTransform(transform.GetInverse())
-            self._RayCastReslice.SetResliceTransform(transform.GetInverse())
+            inverse = transform.GetInverse()
 
-        self._ImplicitVolume.SetTransform(
-            self._ImageReslice1.GetResliceTransform())
+        # acquire the new field before releasing the old one, in case
+        # they are the same
+        self._ReleaseDeformationField()
+        self._DeformationField = field
+
+        self._ImageReslice1.SetResliceTransform(inverse)
+        self._ImageReslice2.SetResliceTransform(inverse)
+        self._RayCastReslice.SetResliceTransform(inverse)
+
+        self._ImplicitVolume.SetTransform(inverse)
+        self._RenderBricks = None
+
+    def _ReleaseDeformationField(self):
+        field = self._DeformationField
+        if field:
+            DeformationField.ReleaseDeformationField(field.GetTransform(),
+                                                     field.GetInput())
+            self._DeformationField = None
 
     def GetImageTransform(self, transform):
         return self._ImageTransform
 
     def SetInput(self, input):
         # the input is the image data to slice through
-        input.UpdateInformation()
-        extent = input.GetWholeExtent()
+        if vtk.vtkVersion().GetVTKMajorVersion() > 5:
+            extent = input.GetExtent()
+        else:
+            input.UpdateInformation()
+            extent = input.GetWholeExtent()
+
+        # a nonlinear transform must be sampled over the new input
+        if self._ImageTransform and input is not self._Input:
+            self._SetImageTransform(self._ImageTransform, input)
+
         origin = input.GetOrigin()
         spacing = input.GetSpacing()
 
@@ -422,70 +762,115 @@ class VolumeFactory(ActorFactory.ActorFactory):
         if bounds[4] > bounds[5]:
             bounds[4:6] = [bounds[5], bounds[4]]
 
-        resliceExtent = [0, self._TextureSize / 2 - 1,
-                         0, self._TextureSize / 2 - 1,
-                         0, self._TextureSize / 2 - 1]
+        self._Bounds = bounds
+        if self._TextureSize is None:
+            self._LevelSizes = self._ComputeLevelSizes(input)
+        self._SetTextureMapperSizes()
 
-        resliceSpacing = ((bounds[1] - bounds[0]) / (self._TextureSize / 2),
-                          (bounds[3] - bounds[2]) / (self._TextureSize / 2),
-                          (bounds[5] - bounds[4]) / (self._TextureSize / 2))
+        # the low-resolution level for interaction, and the higher
+        # resolution level for still renders
+        self._SetLevelVolume(0, self._SetUpLevel(
+            self._ImageReslice1, self._LevelSizes[0], input, bounds))
+        self._SetLevelVolume(1, self._SetUpLevel(
+            self._ImageReslice2, self._LevelSizes[1], input, bounds))
 
-        resliceOrigin = (bounds[0] + resliceSpacing[0] * 0.5,
-                         bounds[2] + resliceSpacing[1] * 0.5,
-                         bounds[4] + resliceSpacing[2] * 0.5)
+        # apply the color table (this is currently not used)
+        self._ConnectInput(self._ImageMapToColors, self._ImageReslice1)
+        self._ImageMapToColors.ReleaseDataFlagOff()
 
-        # first shrink the image & antialias
-        shrink = [1, 1, 1]
-        for i in range(3):
-            s = int(abs(resliceSpacing[i] / spacing[i]))
-            if s > 1:
-                shrink[i] = s
+        # convert to structured points before chopping up and sending to
+        # the textures (this is currently not used)
+        self._ConnectInput(self._ImageToStructuredPoints,
+                           self._ImageMapToColors)
+        self._ImageToStructuredPoints.ReleaseDataFlagOff()
+
+        # set clipping cube bounds
+        self._ClippingCube.SetROIBounds(bounds)
 
-        self._ImagePrefilter1.SetInput(input)
-        self._ImagePrefilter1.SetShrinkFactors(map(int, shrink))
-        self._ImagePrefilter1.MeanOn()
-        self._ImagePrefilter1.ReleaseDataFlagOn()
-
-        # we might need to convert from signed to unsigned here...
-        t = input.GetScalarType()
-        minval, maxval = input.GetScalarRange()
-        if (t != vtk.VTK_UNSIGNED_SHORT) and (t != vtk.VTK_UNSIGNED_CHAR):
-            f = vtk.vtkImageShiftScale()
-            f.SetInput(self._ImagePrefilter1.GetOutput())
-            f.SetShift(-minval)
-            f.SetScale(1.0)
-            f.SetOutputScalarType(t + 1)
-            f.ReleaseDataFlagOn()
-            obj = f.GetOutput()
+        # set up implicit volume
+        self._ImplicitVolume.SetTransform(
+            self._ImageReslice1.GetResliceTransform())
+        self._ImplicitVolume.SetVolume(input)
+        if vtk.vtkVersion().GetVTKMajorVersion() <= 5:
+            self._ImplicitVolume.GetVolume().Update()
+
+        # find the empty regions of the input
+        index = BrickIndex.GetBrickIndex(input)
+        if self._BrickIndex:
+            BrickIndex.ReleaseBrickIndex(self._BrickIndex.GetInput())
+        self._BrickIndex = index
+        self._RenderBricks = None
+        self._PickBricks = None
+
+        # texture-map LOD gets the subsampled volume
+        VolumeCache.UpdateReducedVolumes(self._LevelVolumes)
+        self._ImageReslice1.UpdateWholeExtent()
+        self._ImageReslice2.UpdateWholeExtent()
+
+        if self._VolumeTextureMapper1:
+            self._ConnectInput(self._VolumeTextureMapper1,
+                               self._ImageReslice1)
+            self._ConnectInput(self._VolumeTextureMapper2,
+                               self._ImageReslice2)
+
+        # ray-cast LOD gets the full resolution volume, converted to
+        # unsigned before it is resliced
+        volume = VolumeCache.GetReducedVolume(input, (1, 1, 1), 1)
+        volume.Update()
+        if self._RayCastVolume:
+            VolumeCache.ReleaseReducedVolume(self._RayCastVolume)
+        self._RayCastVolume = volume
+        self._SetInputData(self._RayCastReslice, volume.GetOutput())
+        self._RayCastReslice.SetOutputSpacing(map(abs, spacing))
+        self._RayCastReslice.ReleaseDataFlagOn()
+        obj = self._RayCastReslice.GetOutput()
+
+        self._RayCastOutput = obj
+        if self._VolumeRayCastMapper:
+            self._ConnectInput(self._VolumeRayCastMapper,
+                               self._RayCastReslice)
+        if self._FixedPointMapper1:
+            self._ConnectInput(self._FixedPointMapper1, self._ImageReslice1)
+            self._ConnectInput(self._FixedPointMapper2, self._RayCastReslice)
+        self._Input = input
+        self.Modified()
+
+    def GetInput(self):
+        return self._Input
+
+    def _ConnectInput(self, consumer, producer):
+        # connect the output of one filter to the input of another
+        if vtk.vtkVersion().GetVTKMajorVersion() > 5:
+            consumer.SetInputConnection(producer.GetOutputPort())
         else:
-            obj = self._ImagePrefilter1.GetOutput()
+            consumer.SetInput(producer.GetOutput())
 
-        # need to shift to correct the error in vtkImageShrink3D...
-        matrix = vtk.vtkMatrix4x4()
-        matrix.DeepCopy((1.0, 0.0, 0.0, 0.5 * (spacing[0] - resliceSpacing[0]),
-                         0.0, 1.0, 0.0, 0.5 * (spacing[1] - resliceSpacing[1]),
-                         0.0, 0.0, 1.0, 0.5 * (spacing[2] - resliceSpacing[2]),
-                         0.0, 0.0, 0.0, 1.0))
+    def _SetInputData(self, consumer, data):
+        # the shared volumes are updated by VolumeCache, not by the pipeline
+        if vtk.vtkVersion().GetVTKMajorVersion() > 5:
+            consumer.SetInputData(data)
+        else:
+            consumer.SetInput(data)
 
-        # apply the shift correction, resample to power of two
-        # (if vtkImageReslice did antialiasing, there would be no need
-        # for the vtkImageShrink3D)
-        self._ImageReslice1.SetInput(obj)
-        self._ImageReslice1.SetResliceAxes(matrix)
-        self._ImageReslice1.SetOutputExtent(resliceExtent)
-        self._ImageReslice1.SetOutputOrigin(resliceOrigin)
-        self._ImageReslice1.SetOutputSpacing(resliceSpacing)
-        self._ImageReslice1.ReleaseDataFlagOff()
+    def _SetLevelVolume(self, level, volume):
+        # keep the new volume, and release the old one
+        if self._LevelVolumes[level]:
+            VolumeCache.ReleaseReducedVolume(self._LevelVolumes[level])
+        self._LevelVolumes[level] = volume
 
-        # do the higher-resolution textures
+    def _SetUpLevel(self, reslice, size, input, bounds):
+        """Set up a reslice to resample the volume at *size*^3.
 
-        resliceExtent = [0, self._TextureSize - 1,
-                         0, self._TextureSize - 1,
-                         0, self._TextureSize - 1]
+        Returns the shared, shrunk volume that is the input to the
+        reslice, which must be released by the caller.
+        """
+        spacing = input.GetSpacing()
+
+        resliceExtent = [0, size - 1, 0, size - 1, 0, size - 1]
 
-        resliceSpacing = ((bounds[1] - bounds[0]) / (self._TextureSize),
-                          (bounds[3] - bounds[2]) / (self._TextureSize),
-                          (bounds[5] - bounds[4]) / (self._TextureSize))
+        resliceSpacing = ((bounds[1] - bounds[0]) / size,
+                          (bounds[3] - bounds[2]) / size,
+                          (bounds[5] - bounds[4]) / size)
 
         resliceOrigin = (bounds[0] + resliceSpacing[0] * 0.5,
                          bounds[2] + resliceSpacing[1] * 0.5,
@@ -498,24 +883,9 @@ class VolumeFactory(ActorFactory.ActorFactory):
             if s > 1:
                 shrink[i] = s
 
-        self._ImagePrefilter2.SetInput(input)
-        self._ImagePrefilter2.SetShrinkFactors(map(int, shrink))
-        self._ImagePrefilter2.MeanOn()
-        self._ImagePrefilter2.ReleaseDataFlagOn()
-
-        # we might need to convert from signed to unsigned here...
-        t = input.GetScalarType()
-        minval, maxval = input.GetScalarRange()
-        if (t != vtk.VTK_UNSIGNED_SHORT) and (t != vtk.VTK_UNSIGNED_CHAR):
-            f = vtk.vtkImageShiftScale()
-            f.SetInput(self._ImagePrefilter2.GetOutput())
-            f.SetShift(-minval)
-            f.SetScale(1.0)
-            f.SetOutputScalarType(t + 1)
-            f.ReleaseDataFlagOn()
-            obj = f.GetOutput()
-        else:
-            obj = self._ImagePrefilter2.GetOutput()
+        # the shrunk, unsigned volume is shared with other factories
+        volume = VolumeCache.GetReducedVolume(input, shrink, 1)
+        obj = volume.GetOutput()
 
         # need to shift to correct the error in vtkImageShrink3D...
         matrix = vtk.vtkMatrix4x4()
@@ -527,73 +897,175 @@ class VolumeFactory(ActorFactory.ActorFactory):
         # apply the shift correction, resample to power of two
         # (if vtkImageReslice did antialiasing, there would be no need
         # for the vtkImageShrink3D)
-        self._ImageReslice2.SetInput(obj)
-        self._ImageReslice2.SetResliceAxes(matrix)
-        self._ImageReslice2.SetOutputExtent(resliceExtent)
-        self._ImageReslice2.SetOutputOrigin(resliceOrigin)
-        self._ImageReslice2.SetOutputSpacing(resliceSpacing)
-        self._ImageReslice2.ReleaseDataFlagOff()
-
-        # apply the color table (this is currently not used)
-        self._ImageMapToColors.SetInput(self._ImageReslice1.GetOutput())
-        self._ImageMapToColors.ReleaseDataFlagOff()
-
-        # convert to structured points before chopping up and sending to
-        # the textures (this is currently not used)
-        self._ImageToStructuredPoints.SetInput(
-            self._ImageMapToColors.GetOutput())
-        self._ImageToStructuredPoints.ReleaseDataFlagOff()
-
-        # this is for if we want to warp the volume before renderering
-        self._TransformToGrid.SetGridSpacing(
-            map(lambda x: 4 * x, resliceSpacing))
-        self._TransformToGrid.SetGridOrigin(
-            resliceOrigin)
-        self._TransformToGrid.SetGridExtent(
-            map(lambda x: x / 4, resliceExtent))
-
-        # set clipping cube bounds
-        self._ClippingCube.SetROIBounds(bounds)
-
-        # set up implicit volume
-        self._ImplicitVolume.SetTransform(
-            self._ImageReslice1.GetResliceTransform())
-        self._ImplicitVolume.SetVolume(input)
-        self._ImplicitVolume.GetVolume().Update()
-
-        # texture-map LOD gets the subsampled volume
-        self._ImageReslice1.UpdateWholeExtent()
-
-        self._VolumeTextureMapper1.SetInput(self._ImageReslice1.GetOutput())
-
-        self._ImageReslice2.UpdateWholeExtent()
-        self._VolumeTextureMapper2.SetInput(self._ImageReslice2.GetOutput())
-
-        # ray-cast LOD gets the full resolution volume
-        self._RayCastReslice.SetInput(input)
-        self._RayCastReslice.SetOutputSpacing(map(abs, spacing))
-        self._RayCastReslice.ReleaseDataFlagOn()
-
-        # we might need to convert from signed to unsigned here...
-        t = input.GetScalarType()
-        minval, maxval = input.GetScalarRange()
-        if (t != vtk.VTK_UNSIGNED_SHORT) and (t != vtk.VTK_UNSIGNED_CHAR):
-            f = vtk.vtkImageShiftScale()
-            f.SetInput(self._RayCastReslice.GetOutput())
-            f.SetShift(-minval)
-            f.SetScale(1.0)
-            f.SetOutputScalarType(t + 1)
-            f.ReleaseDataFlagOn()
-            obj = f.GetOutput()
+        self._SetInputData(reslice, obj)
+        reslice.SetResliceAxes(matrix)
+        reslice.SetOutputExtent(resliceExtent)
+        reslice.SetOutputOrigin(resliceOrigin)
+        reslice.SetOutputSpacing(resliceSpacing)
+        reslice.ReleaseDataFlagOff()
+
+        return volume
+
+    def _ComputeLevelSizes(self, input):
+        """Choose the texture sizes from the volume and the memory limit."""
+        if vtk.vtkVersion().GetVTKMajorVersion() > 5:
+            extent = input.GetExtent()
         else:
-            obj = self._RayCastReslice.GetOutput()
+            extent = input.GetWholeExtent()
+        dims = max(extent[1] - extent[0], extent[3] - extent[2],
+                   extent[5] - extent[4]) + 1
+
+        # a power of two that does not throw away any of the voxels,
+        # reduced until one copy of the RGBA textures fits in memory
+        size = 16
+        while size < dims:
+            size = size * 2
+        while size > 16 and size * size * size * 4 > self._TextureMemoryLimit:
+            size = size / 2
+
+        return [max(size / 2, 16), size]
+
+    def _SetTextureMapperSizes(self):
+        size1, size2 = self._LevelSizes
+        if self._VolumeTextureMapper1:
+            self._VolumeTextureMapper1.SetTargetTextureSize(size1 / 2,
+                                                            size1 / 2)
+            self._VolumeTextureMapper1.SetMaximumNumberOfPlanes(size1)
+            self._VolumeTextureMapper2.SetTargetTextureSize(size2, size2)
+            self._VolumeTextureMapper2.SetMaximumNumberOfPlanes(size2)
+
+    def _AdaptLevelSizes(self, renderer):
+        """Resize the interactive level to fit the desired frame rate."""
+        if self._TextureSize is not None or self._Input is None:
+            return
+        if self._RebuildId is not None:
+            return
+        rate = renderer.GetRenderWindow().GetDesiredUpdateRate()
+        rtime = self._Volume.GetLODEstimatedRenderTime(self._lod[0])
+        if rate <= 0 or rtime <= 0:
+            return
+
+        # still renders ask for a very low rate, and must not be used
+        # to judge the size of the interactive level
+        if rate < 0.1:
+            return
+
+        # wait until the level has been rendered since it was resized
+        if rtime == self._AdaptTime:
+            return
+
+        # the time grows with the cube of the size, so halving the size
+        # divides the time by eight: only grow if there is ample time
+        budget = 1.0 / rate
+        size1, size2 = self._LevelSizes
+        if rtime > budget and size1 > 16:
+            self._AdaptTime = rtime
+            self._RebuildLevelLater(0, size1 / 2)
+        elif rtime * 16 < budget and size1 < size2:
+            self._AdaptTime = rtime
+            self._RebuildLevelLater(0, size1 * 2)
+
+    def _RebuildLevelLater(self, level, size):
+        """Rebuild a level at a new size when the application is idle."""
+        self._PendingLevelSizes[level] = size
+        frames = PaneFrame.PaneFrame.AllPaneFrames
+        if not frames:
+            self._RebuildPendingLevels()
+        elif self._RebuildId is None:
+            self._RebuildId = frames[0].ScheduleOnce(
+                0, self._RebuildPendingLevels)
+
+    def _RebuildPendingLevels(self):
+        # build the new levels with new filters, so that the old levels
+        # can still be rendered until the new ones are ready
+        self._RebuildId = None
+        pending = self._PendingLevelSizes
+        self._PendingLevelSizes = {}
+        input = self._Input
+        if input is None:
+            return
+
+        for level, size in pending.items():
+            if size == self._LevelSizes[level]:
+                continue
+            if level == 0:
+                oldReslice = self._ImageReslice1
+            else:
+                oldReslice = self._ImageReslice2
+            reslice = vtk.vtkImageReslice()
+            reslice.SetInterpolationModeToLinear()
+            reslice.SetResliceTransform(oldReslice.GetResliceTransform())
+            reslice.SetStencil(oldReslice.GetStencil())
+            volume = self._SetUpLevel(reslice, size, input, self._Bounds)
+            volume.Update()
+            reslice.UpdateWholeExtent()
+            self._SetLevelVolume(level, volume)
+
+            self._LevelSizes[level] = size
+            if level == 0:
+                self._ImageReslice1 = reslice
+                self._ConnectInput(self._ImageMapToColors, reslice)
+                if self._VolumeTextureMapper1:
+                    self._ConnectInput(self._VolumeTextureMapper1, reslice)
+                if self._FixedPointMapper1:
+                    self._ConnectInput(self._FixedPointMapper1, reslice)
+            else:
+                self._ImageReslice2 = reslice
+                if self._VolumeTextureMapper2:
+                    self._ConnectInput(self._VolumeTextureMapper2, reslice)
 
-        self._VolumeRayCastMapper.SetInput(obj)
-        self._Input = input
+        self._SetTextureMapperSizes()
         self.Modified()
 
-    def GetInput(self):
-        return self._Input
+    def SetTextureSize(self, size):
+        """Set the texture size, or None to choose it automatically."""
+        if size == self._TextureSize:
+            return
+        self._TextureSize = size
+        if size is not None:
+            sizes = [max(size / 2, 16), size]
+        elif self._Input:
+            sizes = self._ComputeLevelSizes(self._Input)
+        else:
+            return
+        if self._Input is None:
+            self._LevelSizes = sizes
+            self._SetTextureMapperSizes()
+            return
+        for level in (0, 1):
+            self._RebuildLevelLater(level, sizes[level])
+
+    def GetTextureSize(self):
+        return self._LevelSizes[1]
+
+    def GetInteractiveTextureSize(self):
+        return self._LevelSizes[0]
+
+    def SetTextureMemoryLimit(self, nbytes):
+        if nbytes == self._TextureMemoryLimit:
+            return
+        self._TextureMemoryLimit = nbytes
+        if self._VolumeTextureMapper1:
+            self._VolumeTextureMapper1.SetMaximumStorageSize(nbytes)
+            self._VolumeTextureMapper2.SetMaximumStorageSize(nbytes)
+        if self._TextureSize is None and self._Input:
+            sizes = self._ComputeLevelSizes(self._Input)
+            sizes[0] = min(sizes[0], self._LevelSizes[0])
+            for level in (0, 1):
+                self._RebuildLevelLater(level, sizes[level])
+
+    def GetTextureMemoryLimit(self):
+        return self._TextureMemoryLimit
+
+    def SetTimeSeries(self, series):
+        self._TimeSeries = series
+        self.SetInput(series.GetOutput())
+
+    def GetTimeSeries(self):
+        series = self._TimeSeries
+        if series and series.GetOutput() is not self._Input:
+            return None
+        return series
 
     def SetClippingCube(self, cube):
         self._ClippingCube = cube
@@ -672,6 +1144,18 @@ class VolumeFactory(ActorFactory.ActorFactory):
     def GetPickThreshold(self, thresh):
         return self._PickThreshold
 
+    def _GetPickSteps(self, point, step, n):
+        """Get the numbers of the ray steps that are not transparent."""
+        func = self._OpacityTransferFunction or self._LookupTable
+        self._PickBricks = self._ComputeVisibleBricks(
+            self._PickBricks, 0.0, func)
+        transform = self._ImplicitVolume.GetTransform()
+        if (not self._PickBricks or
+                (transform and not transform.IsA('vtkLinearTransform'))):
+            return range(n)
+        return self._BrickIndex.GetVisibleSteps(
+            self._PickBricks[1], transform, point, step, n)
+
     def GetPickList(self, event):
         # get a list of PickInformation objects, one for each picked actor
 
@@ -729,7 +1213,8 @@ class VolumeFactory(ActorFactory.ActorFactory):
                 transparency = 1.0
                 x0, y0, z0 = point1
 
-                for i in range(N):
+                # skip the steps that are in transparent bricks
+                for i in self._GetPickSteps(point1, (dx, dy, dz), N):
                     x = x0 + i * dx
                     y = y0 + i * dy
                     z = z0 + i * dz
@@ -762,7 +1247,7 @@ class VolumeFactory(ActorFactory.ActorFactory):
                     # cast a ray into the volume from the other side
                     x1, y1, z1 = point2
                     transparency = 1.0
-                    for i in range(N):
+                    for i in self._GetPickSteps(point2, (-dx, -dy, -dz), N):
                         x = x1 - i * dx
                         y = y1 - i * dy
                         z = z1 - i * dz
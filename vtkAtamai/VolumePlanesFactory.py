@@ -66,6 +66,27 @@ VolumePlanesFactory - accelerated volume rendering with texture maps
   Interaction with the planes (i.e. slicing into the planes) is done
   via the ClippingCubeFactory.
 
+  Slices that only pass through bricks of the volume that are completely
+  transparent for the lookup table are found with a BrickIndex, and are
+  not drawn.  Picking also skips over the transparent bricks.  Slices are
+  only skipped when there is no image transform.
+
+  While the clipping cube is aligned with the axes, the slices that lie
+  outside of the cube are not drawn at all, instead of being clipped
+  away by its planes.  This is not done while the OrthoPlanes are shown.
+
+  The stack of textures for each axis is only built when the volume is
+  first viewed along that axis, and the stacks that were used least
+  recently are released when there are more than the maximum number of
+  stacks.  Each stack holds one RGBA copy of the resampled volume, e.g.
+  512MB for a resolution of 512x512x512.
+
+  By default, the textures are made from the scalars of the resampled
+  volume and each texture maps its slice through the lookup table when
+  it is drawn.  A change to the lookup table then only re-colors the
+  slices that are drawn, instead of the whole volume, and the slices
+  that are not visible are re-colored when they are next drawn.
+
 
 Derived From:
 
@@ -131,13 +152,43 @@ Public Methods:
 
   GetShowVolume()        -- get whether the volume is shown
 
+  SetMaximumNumberOfStacks(*n*) -- the maximum number of texture stacks
+                            to keep for each renderer, from 1 to 3,
+                            the default is 2
+
+  GetMaximumNumberOfStacks() -- get the maximum number of stacks
+
+  GetTextureMemorySize() -- get the memory used by the texture stacks
+                            for all renderers, in bytes
+
+  SetMapColorsInTexture(*bool*) -- map the colors when each texture is
+                            loaded (the default), rather than mapping the
+                            whole volume through the lookup table
+
+  MapColorsInTextureOn() -- let the textures map the colors
+
+  MapColorsInTextureOff() -- map the colors for the whole volume
+
+  GetMapColorsInTexture() -- get whether the textures map the colors
+
+  The slices that are being shown are held in a vtkPropAssembly, so that
+  changing the view direction only swaps the parts of the assembly.  The
+  ortho planes and the other translucent actors are kept after the
+  assembly in the renderer, so that they are drawn after the volume, and
+  they are only moved if they are out of order.
+
 """
 
 #======================================
 import ActorFactory
+import BrickIndex
 import ClippingCubeFactory
 import PaneFrame
+import DeformationField
+import VolumeCache
 import math
+import numpy
+from vtk.util import numpy_support
 import vtk
 
 #======================================
@@ -163,6 +214,7 @@ class VolumePlanesFactory(ActorFactory.ActorFactory):
         self._OrthoPlanes = None
         self._ShowOrthoPlanes = 1
         self._OrthoPlanesLookupTables = {}
+        self._OrthoPlanesLookupTableKeys = {}
         self._OrthoPickThreshold = 0.0025
 
         # corner clipping planes, in pairs with opposite normals
@@ -207,8 +259,9 @@ class VolumePlanesFactory(ActorFactory.ActorFactory):
 
         self._Input = None
 
-        # generate the pipeline
-        self._ImagePrefilter = vtk.vtkImageShrink3D()
+        # generate the pipeline, the shrunk volume is shared with
+        # other factories through the VolumeCache
+        self._ReducedVolume = None
 
         self._ImageReslice = vtk.vtkImageReslice()
         self._ImageReslice.SetInterpolationModeToLinear()
@@ -239,14 +292,40 @@ class VolumePlanesFactory(ActorFactory.ActorFactory):
         self._PropertyZX.SetDiffuse(0)
         self._PropertyZX.SetAmbient(1)
 
-        # a list of the renderer info
+        # the axis and the position of the slice for each actor
+        self._ActorSlices = {}
+
+        # an index of the range of values in each brick of the input,
+        # the visible bricks are kept as (key, visible), and the
+        # visibility of the voxel slices along each axis
+        self._BrickIndex = None
+        self._RenderBricks = None
+        self._PickBricks = None
+        self._VisibleSlices = None
+
+        # the bounds of the clipping cube, if it is axis-aligned
+        self._CubeBounds = None
+
+        # a list of the renderer info: the texture stacks for each
+        # renderer are kept in a dict keyed by axis, each stack has
+        # lists of actors for looking in the forward and reverse
+        # directions, and the axes are also listed from least to most
+        # recently used, and the visible slices and cube bounds that
+        # each assembly was built for are kept as a key
         self._RendererCurrentIndex = {}
-        self._RendererActorList = {}
-        self._RendererObserverList = {}
+        self._RendererAssemblyKeys = {}
+        self._RendererStacks = {}
+        self._RendererStackOrder = {}
+        self._RendererVisibility = {}
+        self._RendererAssemblies = {}
+        self._MaximumNumberOfStacks = 2
+
+        # whether the textures use the lookup table themselves
+        self._MapColorsInTexture = 1
 
         # a transform to apply to the image
         self._ImageTransform = None
-        self._TransformToGrid = vtk.vtkTransformToGrid()
+        self._DeformationField = None
 
         # the alpha pick threshold for the volume
         self._PickThreshold = 0.25
@@ -259,6 +338,16 @@ class VolumePlanesFactory(ActorFactory.ActorFactory):
         # the bounds of the volume
         self._VolumeBounds = None
 
+    def tearDown(self):
+        ActorFactory.ActorFactory.tearDown(self)
+        self._ReleaseDeformationField()
+        if self._ReducedVolume:
+            VolumeCache.ReleaseReducedVolume(self._ReducedVolume)
+            self._ReducedVolume = None
+        if self._BrickIndex:
+            BrickIndex.ReleaseBrickIndex(self._BrickIndex.GetInput())
+            self._BrickIndex = None
+
     def HandleEvent(self, event):
         if self._OrthoPlanes and \
                 event.actor in self._OrthoPlanes.GetActors(event.renderer):
@@ -267,10 +356,11 @@ class VolumePlanesFactory(ActorFactory.ActorFactory):
             self._ClippingCube.HandleEvent(event)
 
     def SetVisibility(self, renderer, i):
-        for actors in self._RendererActorList[renderer]:
+        self._RendererVisibility[renderer] = i
+        for actors, reverse in self._RendererStacks[renderer].values():
             for actor in actors:
                 actor.SetVisibility(i)
-                self._ClippingCube.SetPickable(i)
+        self._ClippingCube.SetPickable(i)
 
         if i == 0:
             self._PickThreshold = 0.0
@@ -281,41 +371,44 @@ class VolumePlanesFactory(ActorFactory.ActorFactory):
     # add the volume rendering mechanism to a renderer
     def AddToRenderer(self, renderer):
         ActorFactory.ActorFactory.AddToRenderer(self, renderer)
-        actorList = self._MakeAllActors()
-        self._RendererActorList[renderer] = actorList
-        self._RendererCurrentIndex[renderer] = 5
+        # the stacks are built when they are first needed
+        self._RendererStacks[renderer] = {}
+        self._RendererStackOrder[renderer] = []
+        self._RendererVisibility[renderer] = 1
+        self._RendererCurrentIndex[renderer] = -1
+        self._RendererAssemblyKeys[renderer] = None
+        # the slices that are shown are the parts of an assembly
+        assembly = vtk.vtkPropAssembly()
+        assembly.PickableOff()
+        self._RendererAssemblies[renderer] = assembly
+        renderer.AddViewProp(assembly)
         # force update of these
         # self._ImageReslice.UpdateWholeExtent()
-        self._ImageMapToColors.UpdateWholeExtent()
-        self._ImageToStructuredPoints.UpdateWholeExtent()
-        for actors in actorList[0:3]:
-            i = 0
-            for actor in actors:
-                if i % 3 == 0:
-                    actor.GetTexture().Render(renderer)
-                    actor.GetTexture().GetInput().ReleaseData()
-                actor.RenderOpaqueGeometry(renderer)
-                actor.RenderTranslucentGeometry(renderer)
-                i = i + 1
+        if not self._MapColorsInTexture:
+            self._ImageMapToColors.UpdateWholeExtent()
+            self._ImageToStructuredPoints.UpdateWholeExtent()
 
         try:  # new way of adding render callback
-            self._RendererObserverList[renderer] = \
-                renderer.AddObserver('StartEvent', self.OnRenderEvent)
+            self.AddRendererObserver(renderer, 'StartEvent',
+                                     self.OnRenderEvent)
         except:
             renderer.SetStartRenderMethod(lambda s=self, r=renderer:
                                           s._OnRenderEvent(r, 'StartEvent'))
 
     # remove volume from renderer and free resources
     def RemoveFromRenderer(self, renderer):
-        actorList = self._RendererActorList[renderer]
-        index = self._RendererCurrentIndex[renderer]
+        self._ReleaseStacks(renderer)
+        renderer.RemoveViewProp(self._RendererAssemblies[renderer])
 
-        del self._RendererActorList[renderer]
+        del self._RendererAssemblies[renderer]
+        del self._RendererStacks[renderer]
+        del self._RendererStackOrder[renderer]
+        del self._RendererVisibility[renderer]
         del self._RendererCurrentIndex[renderer]
-        try:
-            renderer.RemoveObserver(self._RendererObserverList[renderer])
-            del self._RendererObserverList[renderer]
-        except:
+        del self._RendererAssemblyKeys[renderer]
+        if renderer in self._RendererObservers:
+            self.RemoveRendererObservers(renderer)
+        else:
             done = 0
             for frame in PaneFrame.AllPaneFrames:
                 for pane in frame.GetRenderPanes():
@@ -331,22 +424,6 @@ class VolumePlanesFactory(ActorFactory.ActorFactory):
                 except:
                     renderer.SetStartRenderMethod(lambda: None)
 
-        for actor in actorList[index]:
-            renderer.RemoveActor(actor)
-
-        clips = (self._ImageClipsXY, self._ImageClipsYZ, self._ImageClipsZX)
-        planes = (self._PlanesXY, self._PlanesYZ, self._PlanesZX)
-        actorlist = (self._ActorsXY, self._ActorsYZ, self._ActorsZX)
-
-        for i in range(6):
-            for actor in actorList[i]:
-                for j in range(3):
-                    if actor in actorlist[j]:
-                        k = actorlist[j].index(actor)
-                        del actorlist[j][k]
-                        del clips[j][k]
-                        del planes[j][k]
-
         ActorFactory.ActorFactory.RemoveFromRenderer(self, renderer)
 
     # like OnRenderEvent, but for VTK 3.2 backwards compatibility
@@ -368,26 +445,45 @@ class VolumePlanesFactory(ActorFactory.ActorFactory):
 
     # call when orientation changes
     def OnRenderEvent(self, renderer, vtkevent):
+        if self._DeformationField:
+            self._DeformationField.Update()
+        if self._ReducedVolume:
+            self._ReducedVolume.Update()
+        # the visible slices and the cube bounds are shared by all the
+        # renderers, so each renderer compares them to its own assembly
+        self._UpdateVisibleSlices()
+        self._UpdateCubeBounds()
+        assemblyKey = (self._RenderBricks and self._RenderBricks[0],
+                       self._CubeBounds)
+
         VPN = renderer.GetActiveCamera().GetViewPlaneNormal()
         absVPN = map(abs, VPN)
         planeIndex = absVPN.index(max(absVPN))
         oldPlaneIndex = self._RendererCurrentIndex[renderer]
         if VPN[planeIndex] < 0:
             planeIndex = planeIndex + 3
-        if planeIndex != oldPlaneIndex or self._StatusChange:
-            allPlanes = self._RendererActorList[renderer]
-            if oldPlaneIndex >= 0 and oldPlaneIndex < 6:
-                for actor in allPlanes[oldPlaneIndex]:
-                    renderer.RemoveActor(actor)
+        if planeIndex != oldPlaneIndex or self._StatusChange or \
+                assemblyKey != self._RendererAssemblyKeys[renderer]:
+            # swap the slices in the assembly
+            assembly = self._RendererAssemblies[renderer]
+            assembly.GetParts().RemoveAllItems()
+            i = 0
+            for actor in self._GetStackActors(renderer, planeIndex):
+                if (i % 3 == 0 or (self._OrthoPlanes and self._ShowOrthoPlanes)) and \
+                        self._ShowVolume and self._IsSliceVisible(actor):
+                    assembly.AddPart(actor)
+                i = i + 1
+            assembly.Modified()
 
             # the OrthoPlane actors
+            orthoActors = []
             if self._OrthoPlanes:
                 for plane in self._OrthoPlanes.GetPlanes():
                     for actor in plane.GetActors(renderer):
                         if actor.GetTexture():
-                            renderer.RemoveActor(actor)
+                            orthoActors.append(actor)
 
-            # make a list of all the other actors
+            # make a list of all the other translucent actors
             allActorsList = []
             allActors = renderer.GetActors()
             allActors.InitTraversal()
@@ -395,25 +491,30 @@ class VolumePlanesFactory(ActorFactory.ActorFactory):
                 actor = allActors.GetNextItem()
                 if actor is None:
                     break
-                if actor.GetProperty().GetOpacity() < 1.0:
+                if actor.GetProperty().GetOpacity() < 1.0 and \
+                        actor not in orthoActors and \
+                        actor not in self._ActorSlices:
                     allActorsList.append(actor)
-            for actor in allActorsList:
-                renderer.RemoveActor(actor)
 
-            i = 0
-            for actor in allPlanes[planeIndex]:
-                if (i % 3 == 0 or (self._OrthoPlanes and self._ShowOrthoPlanes)) and \
-                        self._ShowVolume:
-                    renderer.AddActor(actor)
-                i = i + 1
+            # draw the OrthoPlanes and then the other actors after the
+            # volume, unless the OrthoPlanes are hidden
+            if self._OrthoPlanes and self._ShowOrthoPlanes:
+                self._OrderAfterVolume(renderer, orthoActors + allActorsList)
+            else:
+                for actor in orthoActors:
+                    renderer.RemoveActor(actor)
+                self._OrderAfterVolume(renderer, allActorsList)
 
         self._RendererCurrentIndex[renderer] = planeIndex
+        self._RendererAssemblyKeys[renderer] = assemblyKey
 
-        if self._LookupTable.GetMTime() > self._RenderTime.GetMTime():
+        # (if the textures map the colors, they are re-loaded when drawn)
+        if self._LookupTable.GetMTime() > self._RenderTime.GetMTime() and \
+                not self._MapColorsInTexture:
             self._ImageMapToColors.UpdateWholeExtent()
             self._ImageToStructuredPoints.UpdateWholeExtent()
             i = 0
-            for actor in self._RendererActorList[renderer][planeIndex]:
+            for actor in self._GetStackActors(renderer, planeIndex, 0):
                 if i % 3 == 0:
                     actor.GetTexture().Render(renderer)
                     actor.GetTexture().GetInput().ReleaseData()
@@ -435,40 +536,21 @@ class VolumePlanesFactory(ActorFactory.ActorFactory):
 
         else:
             for i in range(self._OrthoPlanes.GetNumberOfInputs()):
-                needupdate = 0
                 try:
                     table = self._OrthoPlanesLookupTables[i]
                 except KeyError:
                     table = vtk.vtkLookupTable()
                     self._OrthoPlanesLookupTables[i] = table
-                    needupdate = 1
 
+                # only compose the table if either source has changed
                 oldtable = self._OrthoPlanes.GetLookupTable(i)
                 vtable = self._LookupTable
-                if (oldtable.GetMTime() > table.GetMTime() or
-                        vtable.GetMTime() > table.GetMTime() or needupdate):
-                    # map everything with alpha below threshold to transparent
-                    trange = oldtable.GetTableRange()
-                    vrange = vtable.GetTableRange()
-                    n = oldtable.GetNumberOfColors()
-                    m = vtable.GetNumberOfColors()
-                    table.SetTableRange(trange[0], trange[1])
-                    table.SetNumberOfColors(n)
-                    for j in range(n):
-                        r, g, b, a = oldtable.GetTableValue(j)
-                        v = trange[0] + j / (n - 1.0) * (trange[1] - trange[0])
-                        idx = int((v - vrange[0]) / (vrange[
-                                  1] - vrange[0]) * (m - 1.0) + 0.5)
-                        if idx < 0:
-                            idx = 0
-                        if idx > m - 1:
-                            idx = m - 1
-                        vr, vg, vb, va = vtable.GetTableValue(idx)
-                        # vr,vg,vb,va = vtable.GetColor(v)
-                        if va < self._OrthoPickThreshold or j == 0:
-                            table.SetTableValue(j, r, g, b, 0)
-                        else:
-                            table.SetTableValue(j, r, g, b, a)
+                key = (oldtable, oldtable.GetMTime(),
+                       vtable, vtable.GetMTime(), self._OrthoPickThreshold)
+                if self._OrthoPlanesLookupTableKeys.get(i) != key:
+                    self._OrthoPlanesLookupTableKeys[i] = key
+                    self._ComposeOrthoPlanesLookupTable(table, oldtable,
+                                                        vtable)
 
             transform = self._OrthoPlanes.GetTransform()
             pos = transform.TransformPoint(self._OrthoPlanes.GetOrthoCenter())
@@ -569,38 +651,316 @@ class VolumePlanesFactory(ActorFactory.ActorFactory):
                             np.SetNormal(transform.GetInverse().
                                          TransformNormal(bplane.GetNormal()))
                     i = i + 1
-                    if planeIndex != oldPlaneIndex or self._StatusChange:
-                        renderer.AddActor(actor)
                 k = k + 1
 
-        # put all the other actors back
-        if planeIndex != oldPlaneIndex or self._StatusChange:
-            for actor in allActorsList:
-                renderer.AddActor(actor)
-
         self._StatusChange = 0
         self._RenderTime.Modified()
 
+    def _OrderAfterVolume(self, renderer, props):
+        """Make the renderer draw *props* in order after the volume.
+
+        Only the props that are out of order, or that are not in the
+        renderer, are moved to the end of the renderer's props.
+        """
+        collection = renderer.GetViewProps()
+        last = collection.IsItemPresent(self._RendererAssemblies[renderer])
+        for prop in props:
+            i = collection.IsItemPresent(prop)
+            if i > last:
+                last = i
+                continue
+            if i:
+                renderer.RemoveViewProp(prop)
+            renderer.AddViewProp(prop)
+            last = collection.GetNumberOfItems()
+
+    def _ComposeOrthoPlanesLookupTable(self, table, oldtable, vtable):
+        """Make the ortho planes transparent where the volume is.
+
+        The colors of *oldtable* are copied to *table*, and everything
+        where the alpha of the volume table *vtable* is below the
+        threshold is made transparent.  The tables are accessed through
+        numpy views of their RGBA arrays.
+        """
+        trange = oldtable.GetTableRange()
+        vrange = vtable.GetTableRange()
+        colors = numpy_support.vtk_to_numpy(oldtable.GetTable())
+        vcolors = numpy_support.vtk_to_numpy(vtable.GetTable())
+        colors = colors.reshape(-1, 4)
+        vcolors = vcolors.reshape(-1, 4)
+        n = len(colors)
+        m = len(vcolors)
+        if n == 0 or m == 0:
+            return
+
+        table.SetTableRange(trange[0], trange[1])
+        table.SetNumberOfTableValues(n)
+        result = numpy_support.vtk_to_numpy(table.GetTable()).reshape(-1, 4)
+
+        # the value at each entry of oldtable, and the entry of vtable
+        # that it falls into
+        v = trange[0] + (numpy.arange(n) / max(n - 1.0, 1.0) *
+                         (trange[1] - trange[0]))
+        if vrange[1] != vrange[0]:
+            scale = (m - 1.0) / (vrange[1] - vrange[0])
+        else:
+            scale = 0.0
+        idx = numpy.floor((v - vrange[0]) * scale + 0.5)
+        idx = numpy.clip(idx, 0, m - 1).astype(numpy.intp)
+
+        # map everything with alpha below threshold to transparent
+        transparent = vcolors[idx, 3] < self._OrthoPickThreshold * 255.0
+        transparent[0] = True
+        result[:, 0:3] = colors[:, 0:3]
+        result[:, 3] = numpy.where(transparent, 0, colors[:, 3])
+
+        # setting a value marks the table as having been filled in, so
+        # that vtkLookupTable::Build() does not overwrite it
+        table.SetTableValue(0, [c / 255.0 for c in result[0]])
+
+    def _GetStackActors(self, renderer, planeIndex, build=1):
+        """Get the actors for a view direction, building the stack.
+
+        The stack is marked as the most recently used.  If *build* is
+        false, an empty list is returned if the stack does not exist.
+        """
+        axis = planeIndex % 3
+        stacks = self._RendererStacks[renderer]
+        order = self._RendererStackOrder[renderer]
+        if axis not in stacks:
+            if not build:
+                return []
+            stacks[axis] = self._MakeStack(axis)
+            order.append(axis)
+            self._RenderStack(renderer, stacks[axis][0])
+            # release the stacks that have not been used for longest
+            while len(order) > max(self._MaximumNumberOfStacks, 1):
+                self._ReleaseStack(renderer, order[0])
+        elif build:
+            order.remove(axis)
+            order.append(axis)
+        return stacks[axis][planeIndex / 3]
+
+    def _RenderStack(self, renderer, actors):
+        # load the textures, then free the RGBA slices they came from
+        visibility = self._RendererVisibility[renderer]
+        i = 0
+        for actor in actors:
+            actor.SetVisibility(visibility)
+            if i % 3 == 0:
+                actor.GetTexture().Render(renderer)
+                actor.GetTexture().GetInput().ReleaseData()
+            i = i + 1
+
+    def _ReleaseStack(self, renderer, axis):
+        """Release the actors and textures of the stack for an axis."""
+        actors = self._RendererStacks[renderer][axis][0]
+        del self._RendererStacks[renderer][axis]
+        self._RendererStackOrder[renderer].remove(axis)
+
+        clips = (self._ImageClipsXY, self._ImageClipsYZ, self._ImageClipsZX)
+        planes = (self._PlanesXY, self._PlanesYZ, self._PlanesZX)
+        actorlist = (self._ActorsXY, self._ActorsYZ, self._ActorsZX)
+
+        window = renderer.GetRenderWindow()
+        for actor in actors:
+            for j in range(3):
+                if actor in actorlist[j]:
+                    k = actorlist[j].index(actor)
+                    del actorlist[j][k]
+                    del clips[j][k]
+                    del planes[j][k]
+            if actor in self._ActorSlices:
+                del self._ActorSlices[actor]
+            if window:
+                actor.GetTexture().ReleaseGraphicsResources(window)
+
+    def _ReleaseStacks(self, renderer):
+        """Remove the stack from the renderer, and release all stacks."""
+        assembly = self._RendererAssemblies[renderer]
+        assembly.GetParts().RemoveAllItems()
+        assembly.Modified()
+        for axis in list(self._RendererStackOrder[renderer]):
+            self._ReleaseStack(renderer, axis)
+        self._RendererCurrentIndex[renderer] = -1
+
+    def SetMaximumNumberOfStacks(self, n):
+        self._MaximumNumberOfStacks = n
+        for renderer, order in self._RendererStackOrder.items():
+            # the stack that is being shown is the most recently used,
+            # so it is never released
+            while len(order) > max(n, 1):
+                self._ReleaseStack(renderer, order[0])
+
+    def GetMaximumNumberOfStacks(self):
+        return self._MaximumNumberOfStacks
+
+    def SetMapColorsInTexture(self, i):
+        if i == self._MapColorsInTexture:
+            return
+        self._MapColorsInTexture = i
+        # the stacks are rebuilt for the new mode when next rendered
+        for renderer in self._RendererStacks.keys():
+            self._ReleaseStacks(renderer)
+            if not i:
+                self._ImageMapToColors.UpdateWholeExtent()
+                self._ImageToStructuredPoints.UpdateWholeExtent()
+        self.Modified()
+
+    def MapColorsInTextureOn(self):
+        self.SetMapColorsInTexture(1)
+
+    def MapColorsInTextureOff(self):
+        self.SetMapColorsInTexture(0)
+
+    def GetMapColorsInTexture(self):
+        return self._MapColorsInTexture
+
+    def GetTextureMemorySize(self):
+        # each stack is one RGBA copy of the resampled volume
+        x, y, z = self._VolumeResolution
+        n = 0
+        for order in self._RendererStackOrder.values():
+            n = n + len(order)
+        return n * x * y * z * 4
+
+    def _ComputeVisibleBricks(self, cached, table):
+        """Find the visible bricks, unless *cached* is still valid.
+
+        Returns (key, visible), or None if there is no index.
+        """
+        index = self._BrickIndex
+        if not index or not table:
+            return None
+        index.Update()
+        key = (index.GetBuildCount(), table, table.GetMTime())
+        if cached and cached[0] == key:
+            return cached
+        alpha, _range = BrickIndex.GetLookupTableAlpha(table)
+        return (key, index.ComputeVisibleBricks(alpha, _range))
+
+    def _UpdateVisibleSlices(self):
+        """Find the slices that only contain transparent bricks.
+
+        Returns true if the visible slices have changed.
+        """
+        cached = self._RenderBricks
+        if self._ImageTransform:
+            # the slices do not follow the voxels of the input
+            self._RenderBricks = None
+        else:
+            self._RenderBricks = self._ComputeVisibleBricks(
+                cached, self._LookupTable)
+        if self._RenderBricks is cached:
+            return 0
+        if self._RenderBricks:
+            visible = self._RenderBricks[1]
+            self._VisibleSlices = [
+                self._BrickIndex.GetVisibleSlices(visible, axis)
+                for axis in (0, 1, 2)]
+        else:
+            self._VisibleSlices = None
+        return 1
+
+    def _UpdateCubeBounds(self):
+        """Find the bounds of the clipping cube, if it is axis-aligned.
+
+        Returns true if the bounds have changed.
+        """
+        bounds = None
+        cube = self._ClippingCube
+        if not (self._OrthoPlanes and self._ShowOrthoPlanes):
+            bounds = ClippingCubeFactory.GetAxisAlignedBounds(
+                cube.GetClippingPlanes())
+        transform = cube.GetTransform()
+        if bounds and transform:
+            # the cube stays aligned if the transform only scales and
+            # translates the axes
+            m = transform.GetMatrix()
+            for i in range(3):
+                for j in range(3):
+                    if i != j and abs(m.GetElement(i, j)) > 1e-6:
+                        bounds = None
+        if bounds and transform:
+            b = list(bounds)
+            for i in range(3):
+                scale = m.GetElement(i, i)
+                offset = m.GetElement(i, 3)
+                lo, hi = bounds[2 * i:2 * i + 2]
+                if lo is not None:
+                    lo = scale * lo + offset
+                if hi is not None:
+                    hi = scale * hi + offset
+                if scale < 0:
+                    lo, hi = hi, lo
+                b[2 * i:2 * i + 2] = [lo, hi]
+            bounds = tuple(b)
+
+        if bounds == self._CubeBounds:
+            return 0
+        self._CubeBounds = bounds
+        return 1
+
+    def _IsSliceVisible(self, actor):
+        if actor not in self._ActorSlices:
+            return 1
+        axis, position = self._ActorSlices[actor]
+
+        # skip the slices that are outside of the clipping cube
+        bounds = self._CubeBounds
+        if bounds:
+            lo, hi = bounds[2 * axis:2 * axis + 2]
+            if (lo is not None and position < lo) or \
+                    (hi is not None and position > hi):
+                return 0
+
+        slices = self._VisibleSlices
+        if slices is None:
+            return 1
+        input = self._Input
+        k = int(round((position - input.GetOrigin()[axis]) /
+                      input.GetSpacing()[axis]))
+        k = k - input.GetWholeExtent()[2 * axis]
+        if k < 0 or k >= len(slices[axis]):
+            return 1
+        return slices[axis][k]
+
     def SetImageTransform(self, transform):
         self._ImageTransform = transform
+        self._SetImageTransform(transform, self._Input)
+
+    def _SetImageTransform(self, transform, input):
+        # a nonlinear transform is sampled once over the whole volume,
+        # by a field that is shared with the other factories
+        field = None
         if not transform:
-            self._ImageReslice.SetResliceTransform(None)
+            inverse = None
         elif transform.IsA('vtkLinearTransform'):
-            self._ImageReslice.SetResliceTransform(
-                transform.GetLinearInverse())
+            inverse = transform.GetLinearInverse()
         elif transform.IsA('vtkHomogeneousTransform'):
-            self._ImageReslice.SetResliceTransform(
-                transform.GetHomogeneousInverse())
+            inverse = transform.GetHomogeneousInverse()
+        elif input:
+            field = DeformationField.GetDeformationField(transform, input)
+            inverse = field.GetResliceTransform()
         else:
-            tgrid = self._TransformToGrid
-            tgrid.SetInput(transform.GetInverse())
-            gridt = vtk.vtkGridTransform()
-            gridt.SetInterpolationModeToCubic()
-            gridt.SetDisplacementGrid(tgrid.GetOutput())
-            self._ImageReslice.SetResliceTransform(transform.GetInverse())
+            inverse = transform.GetInverse()
 
-        self._ImplicitVolume.SetTransform(
-            self._ImageReslice.GetResliceTransform())
+        # acquire the new field before releasing the old one, in case
+        # they are the same
+        self._ReleaseDeformationField()
+        self._DeformationField = field
+
+        self._ImageReslice.SetResliceTransform(inverse)
+
+        self._ImplicitVolume.SetTransform(inverse)
+        self._StatusChange = 1
+
+    def _ReleaseDeformationField(self):
+        field = self._DeformationField
+        if field:
+            DeformationField.ReleaseDeformationField(field.GetTransform(),
+                                                     field.GetInput())
+            self._DeformationField = None
 
     def GetImageTransform(self, transform):
         return self._ImageTransform
@@ -608,6 +968,11 @@ class VolumePlanesFactory(ActorFactory.ActorFactory):
     def SetInput(self, input):
         # the input is the image data to slice through
         input.UpdateInformation()
+
+        # a nonlinear transform must be sampled over the new input
+        if self._ImageTransform and input is not self._Input:
+            self._SetImageTransform(self._ImageTransform, input)
+
         extent = input.GetWholeExtent()
         origin = input.GetOrigin()
         spacing = input.GetSpacing()
@@ -634,16 +999,16 @@ class VolumePlanesFactory(ActorFactory.ActorFactory):
                          bounds[4] + 0.5 * resliceSpacing[2])
 
         # first shrink the image & antialias
-        shrink = [1.0, 1.0, 1.0]
+        shrink = [1, 1, 1]
         for i in range(3):
-            s = abs(resliceSpacing[i] / spacing[i])
-            if s > 1.0:
+            s = int(abs(resliceSpacing[i] / spacing[i]))
+            if s > 1:
                 shrink[i] = s
 
-        self._ImagePrefilter.SetInput(input)
-        self._ImagePrefilter.SetShrinkFactors(shrink)
-        self._ImagePrefilter.MeanOn()
-        self._ImagePrefilter.ReleaseDataFlagOn()
+        volume = VolumeCache.GetReducedVolume(input, shrink)
+        if self._ReducedVolume:
+            VolumeCache.ReleaseReducedVolume(self._ReducedVolume)
+        self._ReducedVolume = volume
 
         # need to shift to correct the error in vtkImageShrink3D...
         matrix = vtk.vtkMatrix4x4()
@@ -655,7 +1020,7 @@ class VolumePlanesFactory(ActorFactory.ActorFactory):
         # apply the shift correction, resample to power of two
         # (if vtkImageReslice did antialiasing, there would be no need
         # for the vtkImageShrink3D)
-        self._ImageReslice.SetInput(self._ImagePrefilter.GetOutput())
+        self._ImageReslice.SetInput(volume.GetOutput())
         self._ImageReslice.SetResliceAxes(matrix)
         self._ImageReslice.SetOutputExtent(resliceExtent)
         self._ImageReslice.SetOutputOrigin(resliceOrigin)
@@ -672,13 +1037,6 @@ class VolumePlanesFactory(ActorFactory.ActorFactory):
             self._ImageMapToColors.GetOutput())
         self._ImageToStructuredPoints.ReleaseDataFlagOff()
 
-        # this is for if we want to warp the volume before renderering
-        self._TransformToGrid.SetGridSpacing(
-            map(lambda x: 4 * x, resliceSpacing))
-        self._TransformToGrid.SetGridOrigin(resliceOrigin)
-        self._TransformToGrid.SetGridExtent(
-            map(lambda x: x / 4, resliceExtent))
-
         # set opacity according to slice spacing (is this correct?)
         self._PropertyXY.SetOpacity(
             1.0 - math.exp(-1.0 * abs(resliceSpacing[2])))
@@ -699,6 +1057,16 @@ class VolumePlanesFactory(ActorFactory.ActorFactory):
         self._ImplicitVolume.SetVolume(input)
         self._ImplicitVolume.GetVolume().Update()
 
+        # find the empty regions of the input
+        index = BrickIndex.GetBrickIndex(input)
+        if self._BrickIndex:
+            BrickIndex.ReleaseBrickIndex(self._BrickIndex.GetInput())
+        self._BrickIndex = index
+        self._RenderBricks = None
+        self._PickBricks = None
+        self._VisibleSlices = None
+        self._StatusChange = 1
+
         self._Input = input
         self.Modified()
 
@@ -763,6 +1131,9 @@ class VolumePlanesFactory(ActorFactory.ActorFactory):
         # the lookup table associated with the data
         self._LookupTable = table
         self._ImageMapToColors.SetLookupTable(table)
+        if self._MapColorsInTexture:
+            for actor in self._ActorsXY + self._ActorsYZ + self._ActorsZX:
+                actor.GetTexture().SetLookupTable(table)
         self.Modified()
 
     def GetLookupTable(self):
@@ -816,6 +1187,19 @@ class VolumePlanesFactory(ActorFactory.ActorFactory):
     def GetPickThreshold(self, thresh):
         return self._PickThreshold
 
+    def _GetPickSteps(self, point, step, n, table):
+        """Get the numbers of the ray steps that are not transparent."""
+        if table is not self._LookupTable:
+            return range(n)
+        self._PickBricks = self._ComputeVisibleBricks(
+            self._PickBricks, table)
+        transform = self._ImplicitVolume.GetTransform()
+        if (not self._PickBricks or
+                (transform and not transform.IsA('vtkLinearTransform'))):
+            return range(n)
+        return self._BrickIndex.GetVisibleSteps(
+            self._PickBricks[1], transform, point, step, n)
+
     def GetPickList(self, event):
         # get a list of PickInformation objects, one for each picked actor
 
@@ -907,7 +1291,8 @@ class VolumePlanesFactory(ActorFactory.ActorFactory):
                 N = int(math.ceil(abs(pathlength / spacing)))
                 dx, dy, dz = (vec[0] / N, vec[1] / N, vec[2] / N)
                 x0, y0, z0 = point1
-                for i in range(N):
+                # skip the steps that are in transparent bricks
+                for i in self._GetPickSteps(point1, (dx, dy, dz), N, table):
                     x = x0 + i * dx
                     y = y0 + i * dy
                     z = z0 + i * dz
@@ -935,7 +1320,8 @@ class VolumePlanesFactory(ActorFactory.ActorFactory):
                 if hitVolume:
                     # cast a ray into the volume from the other side
                     x1, y1, z1 = point2
-                    for i in range(N):
+                    for i in self._GetPickSteps(point2, (-dx, -dy, -dz), N,
+                                                table):
                         x = x1 - i * dx
                         y = y1 - i * dy
                         z = z1 - i * dz
@@ -990,7 +1376,7 @@ class VolumePlanesFactory(ActorFactory.ActorFactory):
             plane.SetPoint2(bounds[0], bounds[3], z)
 
             imageClip = vtk.vtkExtractVOI()
-            imageClip.SetInput(self._ImageToStructuredPoints.GetOutput())
+            imageClip.SetInput(self._GetSliceSource())
             imageClip.SetVOI(extent[0], extent[1],
                              extent[2], extent[3],
                              reduce * sliceNumber, reduce * sliceNumber)
@@ -1001,7 +1387,7 @@ class VolumePlanesFactory(ActorFactory.ActorFactory):
             texture.SetInput(imageClip.GetOutput())
             texture.RepeatOff()
             texture.InterpolateOn()
-            texture.MapColorScalarsThroughLookupTableOff()
+            self._SetTextureColorMapping(texture)
 
             for i in range(3):
                 mapper = vtk.vtkPolyDataMapper()
@@ -1013,6 +1399,7 @@ class VolumePlanesFactory(ActorFactory.ActorFactory):
                 actor.SetTexture(texture)
                 actor.PickableOff()
                 actor.SetProperty(self._PropertyXY)
+                self._ActorSlices[actor] = (2, z)
 
                 self._PlanesXY.append(plane)
                 self._ImageClipsXY.append(imageClip)
@@ -1046,7 +1433,7 @@ class VolumePlanesFactory(ActorFactory.ActorFactory):
             plane.SetPoint2(x, bounds[2], bounds[5])
 
             imageClip = vtk.vtkExtractVOI()
-            imageClip.SetInput(self._ImageToStructuredPoints.GetOutput())
+            imageClip.SetInput(self._GetSliceSource())
             imageClip.SetVOI(reduce * sliceNumber, reduce * sliceNumber,
                              extent[2], extent[3],
                              extent[4], extent[5])
@@ -1057,7 +1444,7 @@ class VolumePlanesFactory(ActorFactory.ActorFactory):
             texture.SetInput(imageClip.GetOutput())
             texture.RepeatOff()
             texture.InterpolateOn()
-            texture.MapColorScalarsThroughLookupTableOff()
+            self._SetTextureColorMapping(texture)
 
             for i in range(3):
                 mapper = vtk.vtkPolyDataMapper()
@@ -1069,6 +1456,7 @@ class VolumePlanesFactory(ActorFactory.ActorFactory):
                 actor.SetTexture(texture)
                 actor.PickableOff()
                 actor.SetProperty(self._PropertyYZ)
+                self._ActorSlices[actor] = (0, x)
 
                 self._PlanesYZ.append(plane)
                 self._ImageClipsYZ.append(imageClip)
@@ -1102,7 +1490,7 @@ class VolumePlanesFactory(ActorFactory.ActorFactory):
             plane.SetPoint2(bounds[0], y, bounds[5])
 
             imageClip = vtk.vtkExtractVOI()
-            imageClip.SetInput(self._ImageToStructuredPoints.GetOutput())
+            imageClip.SetInput(self._GetSliceSource())
             imageClip.SetVOI(extent[0], extent[1],
                              reduce * sliceNumber, reduce * sliceNumber,
                              extent[4], extent[5])
@@ -1113,7 +1501,7 @@ class VolumePlanesFactory(ActorFactory.ActorFactory):
             texture.SetInput(imageClip.GetOutput())
             texture.RepeatOff()
             texture.InterpolateOn()
-            texture.MapColorScalarsThroughLookupTableOff()
+            self._SetTextureColorMapping(texture)
 
             for i in range(3):
                 mapper = vtk.vtkPolyDataMapper()
@@ -1125,6 +1513,7 @@ class VolumePlanesFactory(ActorFactory.ActorFactory):
                 actor.SetTexture(texture)
                 actor.PickableOff()
                 actor.SetProperty(self._PropertyZX)
+                self._ActorSlices[actor] = (1, y)
 
                 self._PlanesZX.append(plane)
                 self._ImageClipsZX.append(imageClip)
@@ -1133,28 +1522,33 @@ class VolumePlanesFactory(ActorFactory.ActorFactory):
         numberOfPlanes = (extent[3] - extent[2] + 1) / reduce * 3
         return self._ActorsZX[-numberOfPlanes:]
 
-    def _MakeAllActors(self):
-        planesXY = self._MakeXYActors()
-        planesYZ = self._MakeYZActors()
-        planesZX = self._MakeZXActors()
+    def _GetSliceSource(self):
+        # the image that the textures are extracted from
+        if self._MapColorsInTexture:
+            return self._ImageReslice.GetOutput()
+        return self._ImageToStructuredPoints.GetOutput()
 
-        reslice = self._ImageReslice
-        spacing = reslice.GetOutputSpacing()
+    def _SetTextureColorMapping(self, texture):
+        if self._MapColorsInTexture:
+            texture.SetLookupTable(self._LookupTable)
+            texture.MapColorScalarsThroughLookupTableOn()
+        else:
+            texture.MapColorScalarsThroughLookupTableOff()
 
-        if (spacing[2] < 0):
-            planesXY.reverse()
-        if (spacing[0] < 0):
-            planesYZ.reverse()
-        if (spacing[1] < 0):
-            planesZX.reverse()
+    def _MakeStack(self, axis):
+        # make the actors for the slices perpendicular to the axis
+        if axis == 0:
+            planes = self._MakeYZActors()
+        elif axis == 1:
+            planes = self._MakeZXActors()
+        else:
+            planes = self._MakeXYActors()
 
-        planesYX = list(planesXY)
-        planesZY = list(planesYZ)
-        planesXZ = list(planesZX)
+        spacing = self._ImageReslice.GetOutputSpacing()
+        if (spacing[axis] < 0):
+            planes.reverse()
 
-        planesYX.reverse()
-        planesZY.reverse()
-        planesXZ.reverse()
+        reverse = list(planes)
+        reverse.reverse()
 
-        return (planesYZ, planesZX, planesXY,
-                planesZY, planesXZ, planesYX)
+        return [planes, reverse]